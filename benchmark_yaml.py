@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Сравнение скорости C (libyaml) и Python реализаций YAML
+на сгенерированных прайс-листах
+
+Запуск:
+    python benchmark_yaml.py
+    python benchmark_yaml.py --sizes 10000 100000
+"""
+import argparse
+import time
+
+import yaml
+
+from shop.price_list_generator import generate_price_list
+from shop.yaml_backend import LIBYAML
+from shop.yaml_stream import iter_price_list
+
+
+def measure(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                        help='количество товаров в прайс-листах')
+    args = parser.parse_args()
+
+    if not LIBYAML:
+        print("PyYAML собран без libyaml, сравнивать не с чем")
+        return
+
+    backends = [
+        ('python', yaml.SafeLoader, yaml.SafeDumper),
+        ('libyaml', yaml.CSafeLoader, yaml.CSafeDumper),
+    ]
+
+    print(f"{'товаров':>8} {'операция':<16} {'python, с':>10} {'libyaml, с':>11} {'ускорение':>10}")
+    for size in args.sizes:
+        data = generate_price_list(size, categories=50)
+        text = yaml.dump(data, Dumper=yaml.CSafeDumper, allow_unicode=True, sort_keys=False)
+
+        operations = {
+            'load': lambda loader, dumper: yaml.load(text, Loader=loader),
+            'stream': lambda loader, dumper: sum(1 for _ in iter_price_list(text, loader)),
+            'dump': lambda loader, dumper: yaml.dump(data, Dumper=dumper, allow_unicode=True, sort_keys=False),
+        }
+        for name, operation in operations.items():
+            timings = [measure(lambda: operation(loader, dumper)) for _, loader, dumper in backends]
+            print(f"{size:>8} {name:<16} {timings[0]:>10.2f} {timings[1]:>11.2f} {timings[0] / timings[1]:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
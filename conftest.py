@@ -1,6 +1,7 @@
 import os
 import django
 from django.conf import settings
+from django.core.cache import cache
 import pytest
 
 def pytest_configure():
@@ -10,10 +11,28 @@ def pytest_configure():
     # Отключаем Celery для тестов
     settings.CELERY_TASK_ALWAYS_EAGER = True
     settings.CELERY_TASK_EAGER_PROPAGATES = True
+    settings.CELERY_RESULT_BACKEND = 'cache+memory://'
 
 @pytest.fixture(autouse=True)
 def enable_db_access_for_all_tests(db):
     """
     Дает доступ к базе данных для всех тестов
     """
-    pass
\ No newline at end of file
+    pass
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """
+    Сохраняет файлы, загруженные в тестах, во временную директорию
+    """
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Очищает кэш Django между тестами: блокировки импорта, прогресс
+    и кэши фасетов не должны переходить из одного теста в другой
+    """
+    cache.clear()
+    yield
+    cache.clear()
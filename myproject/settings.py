@@ -52,6 +52,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'rest_framework.authtoken', 
@@ -259,11 +260,22 @@ LOGGING = {
     },
 }
 # Настройки кэширования
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Прогресс импорта пишут воркеры Celery, а читает веб-приложение,
+# поэтому в общем окружении кэш должен быть общим (Redis)
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}
 
 # Настройки Celery
 CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
@@ -272,6 +284,46 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Периодические задачи (запускаются процессом celery beat)
+CELERY_BEAT_SCHEDULE = {
+    'cleanup-import-files': {
+        'task': 'shop.tasks.cleanup_import_files',
+        'schedule': 60 * 60,
+    },
+}
+
+# Настройки импорта товаров
+# Количество товаров в одной подзадаче параллельного импорта
+IMPORT_TASK_CHUNK_SIZE = int(os.environ.get('IMPORT_TASK_CHUNK_SIZE', 5000))
+# Как часто (в секундах) задачи импорта публикуют прогресс и сколько он хранится
+IMPORT_PROGRESS_INTERVAL = float(os.environ.get('IMPORT_PROGRESS_INTERVAL', 2))
+IMPORT_PROGRESS_TTL = 60 * 60 * 24
+# Максимальное время (в секундах) блокировки импорта поставщика
+# и пауза между попытками ожидающего импорта занять блокировку
+IMPORT_LOCK_TTL = int(os.environ.get('IMPORT_LOCK_TTL', 60 * 60))
+IMPORT_QUEUE_RETRY_DELAY = int(os.environ.get('IMPORT_QUEUE_RETRY_DELAY', 10))
+# Сколько ошибок импорта хранится в памяти и попадает в отчет об ошибках
+IMPORT_ERROR_LIMIT = int(os.environ.get('IMPORT_ERROR_LIMIT', 1000))
+# Допустимая доля ошибочных строк, при которой импорт в режиме replace заменяет каталог
+IMPORT_REPLACE_MAX_ERROR_RATE = float(os.environ.get('IMPORT_REPLACE_MAX_ERROR_RATE', 0.05))
+# Сколько секунд хранятся загруженные прайс-листы, отчеты об ошибках
+# и части прерванных импортов в MEDIA_ROOT/imports
+IMPORT_FILE_TTL = int(os.environ.get('IMPORT_FILE_TTL', IMPORT_PROGRESS_TTL))
+
+# Настройки экспорта товаров
+# На сколько секунд next_since выгрузки изменений отстает от ее начала: товары,
+# записанные еще не зафиксированными транзакциями, попадут в следующую выгрузку
+EXPORT_DELTA_OVERLAP = int(os.environ.get('EXPORT_DELTA_OVERLAP', 5 * 60))
+# Директория выгрузок каталогов всех поставщиков и количество процессов выгрузки
+EXPORT_SNAPSHOT_DIR = os.environ.get('EXPORT_SNAPSHOT_DIR', os.path.join(MEDIA_ROOT, 'exports', 'snapshots'))
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 4))
+
+# Настройки поиска товаров
+# Минимальное сходство запроса по триграммам с фрагментом названия товара
+# в нечетком поиске (search_mode=fuzzy), от 0 до 1
+SEARCH_FUZZY_THRESHOLD = float(os.environ.get('SEARCH_FUZZY_THRESHOLD', 0.3))
+# Сколько секунд хранятся в кэше фасеты характеристик для набора фильтров
+PRODUCT_FACETS_CACHE_TTL = int(os.environ.get('PRODUCT_FACETS_CACHE_TTL', 60 * 15))
 
 # Настройки для drf-yasg
 SWAGGER_USE_COMPAT_RENDERERS = False
\ No newline at end of file
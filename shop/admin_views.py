@@ -1,14 +1,15 @@
 
 from django.shortcuts import render, redirect
-from django.urls import path
+from django.urls import path, reverse
 from django.contrib import messages
 from django.http import HttpRequest, HttpResponse
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.decorators import method_decorator
 from django.views import View
 from .models import Supplier
-from .tasks import do_import
-import os
+from .feed_formats import FEED_EXTENSIONS, detect_feed_format
+from .import_engine import IMPORT_MODES
+from .import_files import start_import, store_import_file
 from typing import Any, List
 
 
@@ -32,6 +33,7 @@ class ImportProductsView(View):
         """
         supplier_id = request.POST.get('supplier')
         yaml_file = request.FILES.get('yaml_file')
+        mode = request.POST.get('mode', 'update')
 
         if not supplier_id:
             messages.error(request, "Необходимо выбрать поставщика")
@@ -41,25 +43,39 @@ class ImportProductsView(View):
             messages.error(request, "Необходимо выбрать YAML файл")
             return redirect('admin:import_products')
 
+        if mode not in IMPORT_MODES:
+            messages.error(request, "Неизвестный режим импорта")
+            return redirect('admin:import_products')
+
         try:
-            # Сохраняем файл во временную директорию
-            file_path = os.path.join('media', 'imports', yaml_file.name)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            supplier = Supplier.objects.get(id=supplier_id)
 
-            with open(file_path, 'wb+') as destination:
-                for chunk in yaml_file.chunks():
-                    destination.write(chunk)
+            # Сохраняем файл в MEDIA_ROOT/imports, задаче передаем только путь
+            feed_format = detect_feed_format(yaml_file.name, yaml_file.content_type)
+            file_path, digest = store_import_file(yaml_file.chunks(), FEED_EXTENSIONS[feed_format])
 
             # Запускаем задачу импорта асинхронно
-            task = do_import.delay(supplier_id, filename=file_path)
+            task_id, duplicate = start_import(supplier, file_path, digest, mode=mode)
 
-            messages.success(
-                request,
-                (
-                    f"Задача импорта запущена (ID: {task.id}). "
-                    f"Результаты будут доступны после завершения."
+            status_url = reverse('supplier-products-import-status', kwargs={'task_id': task_id})
+            if duplicate:
+                messages.warning(
+                    request,
+                    (
+                        f"Этот файл уже импортирован (ID задачи: {task_id}). "
+                        f"Прогресс доступен по адресу {status_url}"
+                    )
+                )
+            else:
+                messages.success(
+                    request,
+                    (
+                        f"Задача импорта запущена (ID: {task_id}). "
+                        f"Прогресс доступен по адресу {status_url}"
+                    )
                 )
-            )
+        except Supplier.DoesNotExist:
+            messages.error(request, "Поставщик не найден")
         except Exception as e:
             messages.error(request, f"Ошибка при импорте: {str(e)}")
 
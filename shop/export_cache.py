@@ -0,0 +1,315 @@
+import contextlib
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import zlib
+from datetime import datetime
+from django.conf import settings
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+from .models import Supplier
+from .utils import iter_products_yaml
+import logging
+
+# zstd доступен, только если установлен пакет zstandard
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Директория кэша экспорта внутри MEDIA_ROOT
+EXPORT_DIR = 'exports'
+
+# Размер частей, которыми кэшированный файл отдается клиенту
+EXPORT_READ_SIZE = 64 * 1024
+
+# Сжатые копии выгрузки в порядке предпочтения и их расширения
+COMPRESSION_SUFFIXES = {
+    'zstd': '.zst',
+    'gzip': '.gz',
+}
+COMPRESSION_CONTENT_TYPES = {
+    'zstd': 'application/zstd',
+    'gzip': 'application/gzip',
+}
+
+# Значения параметра compression, отключающие сжатие
+NO_COMPRESSION = ('', 'none', 'identity')
+
+# Уровни сжатия: выгрузка сжимается один раз на версию каталога
+EXPORT_GZIP_LEVEL = 6
+EXPORT_ZSTD_LEVEL = 10
+
+
+def available_compressions() -> Tuple[str, ...]:
+    """
+    Возвращает доступные способы сжатия выгрузки в порядке предпочтения
+    """
+    return tuple(encoding for encoding in COMPRESSION_SUFFIXES if encoding != 'zstd' or zstandard is not None)
+
+
+def negotiate_compression(accept_encoding: str = '', compression: Optional[str] = None) -> Optional[str]:
+    """
+    Выбирает способ сжатия выгрузки
+
+    Явно заданный параметр compression важнее заголовка Accept-Encoding.
+    Из заголовка выбирается доступное сжатие с наибольшим весом q,
+    при равных весах - zstd.
+
+    Args:
+        accept_encoding: значение заголовка Accept-Encoding
+        compression: значение параметра запроса compression (gzip, zstd или none)
+
+    Returns:
+        str: gzip, zstd или None, если выгрузку не нужно сжимать
+
+    Raises:
+        ValueError: если запрошено неизвестное или недоступное сжатие
+    """
+    available = available_compressions()
+    if compression is not None:
+        compression = compression.strip().lower()
+        if compression in NO_COMPRESSION:
+            return None
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(
+                f"Unknown compression '{compression}', expected one of: none, {', '.join(COMPRESSION_SUFFIXES)}"
+            )
+        if compression not in available:
+            raise ValueError(f"Compression '{compression}' is not available on this server")
+        return compression
+
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in available:
+        weight = weights.get(encoding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def export_filename(supplier: Supplier, compression: Optional[str] = None) -> str:
+    """
+    Возвращает имя файла экспорта из названия компании или имени пользователя
+    """
+    company_name = supplier.user.company_name or supplier.user.username
+    safe_filename = re.sub(r'[^\w\-_\.]', '_', company_name)
+    return f"{safe_filename}_products.yaml{_suffix(compression)}"
+
+
+def export_key(supplier: Supplier) -> str:
+    """
+    Возвращает ключ кэша экспорта поставщика
+
+    Ключ состоит из версии каталога и отпечатка названия магазина,
+    которое тоже входит в YAML, но хранится не в товарах.
+    """
+    shop = supplier.user.company_name or supplier.user.username
+    digest = hashlib.md5(shop.encode('utf-8')).hexdigest()[:8]
+    return f"{supplier.catalog_version}-{digest}"
+
+
+def export_etag(supplier: Supplier, compression: Optional[str] = None) -> str:
+    """
+    Возвращает ETag экспорта поставщика для заголовков ETag и If-None-Match
+
+    Сжатые и несжатая выгрузки - разные представления, поэтому ETag у них разный.
+    """
+    return f'"{supplier.pk}-{export_key(supplier)}{_suffix(compression)}"'
+
+
+def export_path(supplier: Supplier, compression: Optional[str] = None) -> str:
+    """
+    Возвращает путь к кэшированному файлу экспорта текущей версии каталога
+
+    Сжатые копии лежат рядом с YAML файлом и отличаются расширением.
+    """
+    return os.path.join(
+        settings.MEDIA_ROOT, EXPORT_DIR, str(supplier.pk), export_key(supplier),
+        export_filename(supplier, compression)
+    )
+
+
+def get_export_file(supplier: Supplier, compression: Optional[str] = None) -> str:
+    """
+    Возвращает файл экспорта поставщика, создавая его при необходимости
+
+    Если файл текущей версии каталога уже есть, запросов к товарам
+    не выполняется. Иначе YAML и его сжатые копии записываются
+    во временные файлы, которые атомарно переименовываются, а файлы
+    старых версий удаляются.
+
+    Args:
+        supplier: объект Supplier
+        compression: gzip или zstd, чтобы получить путь к сжатой копии
+
+    Returns:
+        str: путь к файлу экспорта
+    """
+    path = export_path(supplier, compression)
+    if os.path.exists(path):
+        return path
+
+    for _chunk in _iter_and_store(supplier, compression):
+        pass
+    return path
+
+
+def iter_export(supplier: Supplier, compression: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Потоково отдает экспорт поставщика из кэша
+
+    Кэшированный файл текущей версии каталога читается частями.
+    Если его нет, YAML строится iter_products_yaml и одновременно
+    сжимается и записывается в кэш вместе со всеми сжатыми копиями,
+    поэтому первые байты уходят клиенту сразу. Если кэш недоступен
+    для записи, выгрузка отдается без сохранения.
+
+    Args:
+        supplier: объект Supplier
+        compression: gzip, zstd или None для несжатого YAML
+
+    Yields:
+        bytes: часть выгрузки
+    """
+    try:
+        f = open(export_path(supplier, compression), 'rb')
+    except FileNotFoundError:
+        yield from _iter_and_store(supplier, compression)
+        return
+
+    with f:
+        while True:
+            chunk = f.read(EXPORT_READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_export_since(supplier: Supplier, since: datetime, compression: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Потоково отдает товары поставщика, измененные после since
+
+    Выгрузка изменений зависит от момента since, поэтому в кэш
+    не записывается, а сжимается на лету.
+
+    Args:
+        supplier: объект Supplier
+        since: момент, изменения после которого нужно выгрузить
+        compression: gzip, zstd или None для несжатого YAML
+
+    Yields:
+        bytes: часть выгрузки
+    """
+    return _compress(_iter_yaml_bytes(supplier, since), compression)
+
+
+def _suffix(compression: Optional[str]) -> str:
+    return COMPRESSION_SUFFIXES[compression] if compression else ''
+
+
+def _compressor(compression: str) -> Any:
+    # Оба объекта сжимают поток частями через compress() и завершают его flush()
+    if compression == 'gzip':
+        return zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return zstandard.ZstdCompressor(level=EXPORT_ZSTD_LEVEL).compressobj()
+
+
+def _compress(chunks: Iterable[bytes], compression: Optional[str]) -> Iterator[bytes]:
+    if not compression:
+        yield from chunks
+        return
+
+    compressor = _compressor(compression)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _iter_yaml_bytes(supplier: Supplier, since: Optional[datetime] = None) -> Iterator[bytes]:
+    for chunk in iter_products_yaml(supplier, since=since):
+        yield chunk.encode('utf-8')
+
+
+def _iter_and_store(supplier: Supplier, compression: Optional[str] = None) -> Iterator[bytes]:
+    path = export_path(supplier)
+    directory = os.path.dirname(path)
+    compressions = (None,) + available_compressions()
+
+    temp_paths: Dict[Optional[str], str] = {}
+    files = {}
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for encoding in compressions:
+            fd, temp_paths[encoding] = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            files[encoding] = os.fdopen(fd, 'wb')
+    except OSError as e:
+        logger.warning(f"Export cache for supplier {supplier.pk} is not writable: {str(e)}")
+        for f in files.values():
+            f.close()
+        _remove(temp_paths.values())
+        yield from _compress(_iter_yaml_bytes(supplier), compression)
+        return
+
+    stored = False
+    try:
+        compressors = {encoding: _compressor(encoding) for encoding in compressions if encoding}
+        with contextlib.ExitStack() as stack:
+            for f in files.values():
+                stack.enter_context(f)
+            for chunk in _iter_yaml_bytes(supplier):
+                for encoding, f in files.items():
+                    data = compressors[encoding].compress(chunk) if encoding else chunk
+                    if data:
+                        f.write(data)
+                        if encoding == compression:
+                            yield data
+            for encoding, compressor in compressors.items():
+                data = compressor.flush()
+                files[encoding].write(data)
+                if encoding == compression:
+                    yield data
+
+        # YAML файл переименовывается последним: если он есть,
+        # сжатые копии этой версии тоже уже на месте
+        for encoding in compressions[1:] + (None,):
+            os.replace(temp_paths[encoding], export_path(supplier, encoding))
+        stored = True
+    finally:
+        # Недописанные файлы (ошибка или обрыв соединения) не попадают в кэш
+        if not stored:
+            _remove(temp_paths.values())
+
+    _prune_versions(supplier, os.path.basename(directory))
+
+
+def _remove(paths: Iterable[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _prune_versions(supplier: Supplier, keep: str) -> None:
+    supplier_dir = os.path.join(settings.MEDIA_ROOT, EXPORT_DIR, str(supplier.pk))
+    for name in os.listdir(supplier_dir):
+        if name != keep:
+            shutil.rmtree(os.path.join(supplier_dir, name), ignore_errors=True)
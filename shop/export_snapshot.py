@@ -0,0 +1,165 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from typing import Any, Dict, Iterable, List, Optional, Union
+from .export_cache import export_filename
+from .models import Product, Supplier
+from .utils import iter_products_yaml
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def snapshot_dir() -> str:
+    """
+    Возвращает новую директорию для выгрузки каталогов всех поставщиков
+
+    Каждая выгрузка пишется в отдельную директорию с меткой времени
+    внутри settings.EXPORT_SNAPSHOT_DIR.
+    """
+    return os.path.join(settings.EXPORT_SNAPSHOT_DIR, timezone.now().strftime('%Y%m%d-%H%M%S'))
+
+
+def export_supplier_snapshot(supplier_id: int, output_dir: str) -> Dict[str, Any]:
+    """
+    Выгружает каталог поставщика в файл директории выгрузки
+
+    YAML пишется во временный файл, который переименовывается только
+    после полной записи, поэтому в директории не бывает недописанных
+    файлов. В PostgreSQL количество товаров и выгрузка читаются
+    в одной транзакции REPEATABLE READ и согласованы между собой.
+    Ошибка выгрузки не прерывает выгрузку остальных поставщиков,
+    а попадает в запись манифеста.
+
+    Args:
+        supplier_id: ID поставщика
+        output_dir: директория выгрузки
+
+    Returns:
+        dict: запись манифеста - файл, количество товаров, размер и время выгрузки
+    """
+    start = time.perf_counter()
+    entry: Dict[str, Any] = {"supplier_id": supplier_id}
+    temp_path = None
+    try:
+        supplier = Supplier.objects.select_related('user').get(pk=supplier_id)
+        entry["supplier"] = str(supplier)
+        path = os.path.join(output_dir, f"{supplier.pk}_{export_filename(supplier)}")
+
+        fd, temp_path = tempfile.mkstemp(dir=output_dir, suffix='.tmp')
+        # Уровень изоляции можно задать только для новой транзакции
+        repeatable_read = connection.vendor == 'postgresql' and not connection.in_atomic_block
+        with os.fdopen(fd, 'w', encoding='utf-8') as f, transaction.atomic():
+            if repeatable_read:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            rows = Product.objects.filter(supplier=supplier).count()
+            for chunk in iter_products_yaml(supplier):
+                f.write(chunk)
+        os.replace(temp_path, path)
+        temp_path = None
+
+        entry.update({
+            "file": os.path.basename(path),
+            "rows": rows,
+            "size": os.path.getsize(path),
+            "catalog_version": supplier.catalog_version,
+        })
+    except Exception as e:
+        logger.error(f"Export of supplier {supplier_id} failed: {str(e)}")
+        entry["error"] = str(e)
+    finally:
+        if temp_path is not None:
+            os.remove(temp_path)
+
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+    return entry
+
+
+def export_all_suppliers(output_dir: str, supplier_ids: Optional[Iterable[int]] = None,
+                         workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Выгружает каталоги поставщиков параллельно в пуле процессов
+
+    Каждый процесс пула выгружает поставщиков по одному через
+    export_supplier_snapshot со своим соединением с базой данных.
+    После выгрузки всех поставщиков в директорию пишется манифест.
+
+    Args:
+        output_dir: директория выгрузки
+        supplier_ids: ID поставщиков (по умолчанию все)
+        workers: количество процессов (по умолчанию settings.EXPORT_WORKERS)
+
+    Returns:
+        dict: манифест выгрузки
+    """
+    started_at = timezone.now()
+    workers = workers or settings.EXPORT_WORKERS
+    if supplier_ids is None:
+        supplier_ids = Supplier.objects.order_by('pk').values_list('pk', flat=True)
+    supplier_ids = list(supplier_ids)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Процессы пула не должны использовать соединения родителя
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+        entries = list(pool.map(export_supplier_snapshot, supplier_ids, [output_dir] * len(supplier_ids)))
+
+    return write_manifest(output_dir, entries, started_at, workers)
+
+
+def write_manifest(output_dir: str, entries: List[Dict[str, Any]], started_at: Union[datetime, str],
+                   workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Записывает манифест выгрузки в директорию выгрузки
+
+    Args:
+        output_dir: директория выгрузки
+        entries: записи export_supplier_snapshot
+        started_at: время начала выгрузки (datetime или строка ISO 8601)
+        workers: количество параллельных процессов
+
+    Returns:
+        dict: манифест - итоги выгрузки и записи по поставщикам
+    """
+    finished_at = timezone.now()
+    if isinstance(started_at, str):
+        started_at = datetime.fromisoformat(started_at)
+    manifest = {
+        "started_at": started_at.isoformat(),
+        "finished_at": finished_at.isoformat(),
+        "seconds": round((finished_at - started_at).total_seconds(), 3),
+        "workers": workers,
+        "suppliers": len(entries),
+        "rows": sum(entry.get("rows", 0) for entry in entries),
+        "size": sum(entry.get("size", 0) for entry in entries),
+        "errors": sum(1 for entry in entries if "error" in entry),
+        "files": entries,
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=output_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, os.path.join(output_dir, MANIFEST_NAME))
+
+    logger.info(
+        f"Exported {manifest['suppliers']} suppliers to {output_dir} "
+        f"in {manifest['seconds']}s, {manifest['errors']} failed"
+    )
+    return manifest
+
+
+def _init_worker() -> None:
+    # Соединение открывается заново при первом запросе в процессе пула
+    connections.close_all()
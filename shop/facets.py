@@ -0,0 +1,128 @@
+import hashlib
+import json
+import math
+from django.db import connections
+from django.db.models import Q, QuerySet
+from typing import Any, Dict, List, Mapping
+from .models import Product
+
+# Префикс параметров запроса фильтров по характеристикам: ?attr.Цвет=черный
+ATTRIBUTE_PARAM_PREFIX = 'attr.'
+
+# Параметры запроса, от которых зависит набор товаров (кроме фильтров по характеристикам)
+FACET_FILTER_PARAMS = ('category', 'search', 'search_mode')
+
+FACETS_CACHE_PREFIX = 'product_facets'
+
+
+def attribute_filters(query_params: Mapping[str, Any]) -> Dict[str, List[Any]]:
+    """
+    Возвращает фильтры по характеристикам из параметров запроса
+
+    Значение, записанное как число или логическое значение JSON,
+    ищется и как строка, и как число, потому что в характеристиках
+    из YAML встречаются оба типа: 512 и "2688x1242".
+
+    Args:
+        query_params: параметры запроса (QueryDict)
+
+    Returns:
+        dict: {характеристика: [допустимые значения]}
+    """
+    filters: Dict[str, List[Any]] = {}
+    for param in query_params:
+        key = param[len(ATTRIBUTE_PARAM_PREFIX):]
+        if not param.startswith(ATTRIBUTE_PARAM_PREFIX) or not key:
+            continue
+        values: List[Any] = []
+        for value in query_params.getlist(param):
+            values.append(value)
+            try:
+                parsed = json.loads(value)
+            except ValueError:
+                continue
+            # NaN и Infinity json.loads разбирает, но в jsonb их не записать
+            if isinstance(parsed, (bool, int)) or (isinstance(parsed, float) and math.isfinite(parsed)):
+                values.append(parsed)
+        filters[key] = values
+    return filters
+
+
+def filter_by_attributes(queryset: QuerySet, filters: Dict[str, List[Any]]) -> QuerySet:
+    """
+    Отбирает товары по характеристикам
+
+    Каждое условие - оператор @> по GIN индексу jsonb_path_ops
+    характеристик. Разные характеристики должны совпасть все,
+    из значений одной характеристики - любое.
+
+    Args:
+        queryset: QuerySet товаров
+        filters: результат attribute_filters
+
+    Returns:
+        QuerySet: отобранные товары
+    """
+    for key, values in filters.items():
+        condition = Q()
+        for value in values:
+            condition |= Q(characteristics__contains={key: value})
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def facets_cache_key(query_params: Mapping[str, Any]) -> str:
+    """
+    Возвращает ключ кэша фасетов для набора фильтров
+
+    Ключ зависит только от параметров, которые меняют набор товаров,
+    поэтому страница и сортировка на него не влияют, а порядок
+    параметров в запросе не важен.
+
+    Args:
+        query_params: параметры запроса (QueryDict)
+
+    Returns:
+        str: ключ кэша
+    """
+    signature = sorted(
+        (param, sorted(query_params.getlist(param)))
+        for param in query_params
+        if param in FACET_FILTER_PARAMS or param.startswith(ATTRIBUTE_PARAM_PREFIX)
+    )
+    digest = hashlib.md5(json.dumps(signature, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return f"{FACETS_CACHE_PREFIX}:{digest}"
+
+
+def facet_counts(queryset: QuerySet) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Считает товары по значениям характеристик
+
+    Характеристики отобранных товаров разворачиваются jsonb_each
+    и группируются одним запросом.
+
+    Args:
+        queryset: QuerySet отобранных товаров
+
+    Returns:
+        dict: {характеристика: [{"value": значение, "count": количество товаров}]},
+            значения упорядочены по убыванию количества
+    """
+    table = Product._meta.db_table
+    ids_sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    sql = (
+        f"SELECT facet.key, facet.value::text, COUNT(*) FROM {table} "
+        # Характеристики, записанные не объектом, не участвуют в фасетах
+        f"CROSS JOIN LATERAL jsonb_each(CASE WHEN jsonb_typeof({table}.characteristics) = 'object' "
+        f"THEN {table}.characteristics ELSE '{{}}'::jsonb END) AS facet "
+        f"WHERE {table}.id IN ({ids_sql}) "
+        f"GROUP BY facet.key, facet.value "
+        f"ORDER BY facet.key, COUNT(*) DESC, facet.value"
+    )
+
+    facets: Dict[str, List[Dict[str, Any]]] = {}
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        for key, value, count in cursor.fetchall():
+            facets.setdefault(key, []).append({"value": json.loads(value), "count": count})
+    return facets
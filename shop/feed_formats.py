@@ -0,0 +1,257 @@
+from typing import Any, Dict, IO, Iterable, Iterator, Optional, Tuple, Union
+import csv
+import io
+import json
+import os
+import xml.etree.ElementTree as ElementTree
+
+# Форматы прайс-листов и расширения, под которыми они сохраняются
+FEED_EXTENSIONS = {
+    'yaml': '.yaml',
+    'csv': '.csv',
+    'jsonl': '.jsonl',
+    'yml': '.xml',
+}
+FEED_FORMATS = tuple(FEED_EXTENSIONS)
+
+# Расширения и типы содержимого, по которым определяется формат
+EXTENSION_FORMATS = {
+    '.yaml': 'yaml',
+    '.yml': 'yaml',
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.xml': 'yml',
+}
+CONTENT_TYPE_FORMATS = {
+    'application/x-yaml': 'yaml',
+    'application/yaml': 'yaml',
+    'text/yaml': 'yaml',
+    'text/x-yaml': 'yaml',
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'application/jsonl': 'jsonl',
+    'application/x-jsonlines': 'jsonl',
+    'application/x-ndjson': 'jsonl',
+    'application/xml': 'yml',
+    'text/xml': 'yml',
+}
+
+# Форматы, файлы которых открываются в двоичном режиме:
+# кодировку YML парсер берет из XML декларации (часто windows-1251)
+BINARY_FORMATS = ('yml',)
+
+# Поля товара из раздела goods; остальные колонки CSV попадают в parameters
+GOODS_FIELDS = ('id', 'category', 'model', 'name', 'price', 'price_rrc', 'quantity', 'parameters')
+
+# Разделители, которые пробуются при определении диалекта CSV
+CSV_DELIMITERS = ',;\t'
+
+
+def detect_feed_format(filename: Optional[str] = None, content_type: Optional[str] = None,
+                       default: str = 'yaml') -> str:
+    """
+    Определяет формат прайс-листа по типу содержимого или расширению файла
+
+    Args:
+        filename: имя файла
+        content_type: MIME тип содержимого (например, из UploadedFile)
+        default: формат, если ни тип, ни расширение не известны
+
+    Returns:
+        str: формат из FEED_FORMATS
+    """
+    if content_type:
+        feed_format = CONTENT_TYPE_FORMATS.get(content_type.split(';')[0].strip().lower())
+        if feed_format:
+            return feed_format
+
+    if filename:
+        feed_format = EXTENSION_FORMATS.get(os.path.splitext(filename)[1].lower())
+        if feed_format:
+            return feed_format
+
+    return default
+
+
+def iter_csv_price_list(source: Union[str, IO]) -> Iterator[Tuple[str, Any]]:
+    """
+    Потоково читает прайс-лист в формате CSV
+
+    Первая строка содержит названия колонок. Колонки id, category, model,
+    name, price, price_rrc и quantity соответствуют полям товара из раздела
+    goods, колонка parameters может содержать JSON словарь, а остальные
+    непустые колонки добавляются в parameters. Колонка category содержит
+    название категории: перед первым товаром каждой новой категории
+    отдается элемент раздела categories.
+
+    Args:
+        source: строка с CSV данными или файл, открытый с newline=''
+
+    Yields:
+        tuple: (название раздела, элемент), как iter_price_list
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source, newline='')
+
+    # Диалект определяется по началу файла; разделитель по умолчанию - запятая
+    sample = source.read(64 * 1024)
+    source.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        dialect = csv.excel
+
+    categories = set()
+    for row in csv.DictReader(source, dialect=dialect):
+        item = _csv_item(row)
+        category = item.get('category')
+        if category and category not in categories:
+            categories.add(category)
+            yield 'categories', {'id': category, 'name': category}
+        yield 'goods', item
+
+
+def iter_jsonl_price_list(source: Union[str, IO]) -> Iterator[Tuple[str, Any]]:
+    """
+    Потоково читает прайс-лист в формате JSON Lines
+
+    Каждая непустая строка - JSON объект товара с полями раздела goods,
+    category содержит название категории, как в CSV. Строка, которая
+    не является JSON, отдается как есть и попадает в отчет об ошибках
+    импорта как неверный товар.
+
+    Args:
+        source: строка с JSONL данными или открытый файл
+
+    Yields:
+        tuple: (название раздела, элемент), как iter_price_list
+    """
+    lines: Iterable[str] = source.splitlines() if isinstance(source, str) else source
+
+    categories = set()
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield 'goods', line
+            continue
+
+        category = item.get('category') if isinstance(item, dict) else None
+        if category and category not in categories:
+            categories.add(category)
+            yield 'categories', {'id': category, 'name': str(category)}
+        yield 'goods', item
+
+
+def iter_yml_price_list(source: Union[str, IO]) -> Iterator[Tuple[str, Any]]:
+    """
+    Потоково читает каталог в формате Яндекс.Маркета (YML)
+
+    Файл разбирается через ElementTree.iterparse, а обработанные элементы
+    category и offer удаляются из дерева, поэтому память не зависит
+    от размера каталога. Элемент category отдается как элемент раздела
+    categories, offer - как товар раздела goods: id из атрибута id,
+    category из categoryId, name (или typePrefix, vendor и model для
+    предложений типа vendor.model), price, quantity из count, quantity
+    или stock_quantity (0 для available="false"), parameters из param
+    и description.
+
+    Args:
+        source: строка с XML данными или файл, открытый в двоичном режиме
+
+    Yields:
+        tuple: (название раздела, элемент), как iter_price_list
+
+    Raises:
+        xml.etree.ElementTree.ParseError: если файл не является корректным XML
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+
+    container = None
+    for event, elem in ElementTree.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            # Обработанные category и offer удаляются из родителя
+            if elem.tag in ('categories', 'offers'):
+                container = elem
+            continue
+
+        if elem.tag == 'category':
+            yield 'categories', {'id': elem.get('id'), 'name': (elem.text or '').strip()}
+        elif elem.tag == 'offer':
+            yield 'goods', _yml_item(elem)
+        else:
+            continue
+
+        elem.clear()
+        if container is not None:
+            del container[:]
+
+
+def _yml_item(offer: ElementTree.Element) -> Dict[str, Any]:
+    item: Dict[str, Any] = {'id': offer.get('id')}
+
+    name = _text(offer, 'name')
+    if not name:
+        name = ' '.join(filter(None, (_text(offer, tag) for tag in ('typePrefix', 'vendor', 'model'))))
+    for field, value in (('category', _text(offer, 'categoryId')), ('model', _text(offer, 'model')),
+                         ('name', name), ('price', _text(offer, 'price'))):
+        if value:
+            item[field] = value
+
+    quantity = _text(offer, 'count') or _text(offer, 'quantity') or _text(offer, 'stock_quantity')
+    if quantity:
+        item['quantity'] = quantity
+    elif offer.get('available') == 'false':
+        item['quantity'] = 0
+
+    parameters: Dict[str, Any] = {}
+    for param in offer.iter('param'):
+        param_name = param.get('name')
+        if param_name and param.text:
+            unit = param.get('unit')
+            parameters[f'{param_name} ({unit})' if unit else param_name] = param.text.strip()
+    description = _text(offer, 'description')
+    if description:
+        parameters['description'] = description
+    if parameters:
+        item['parameters'] = parameters
+    return item
+
+
+def _text(elem: ElementTree.Element, tag: str) -> Optional[str]:
+    value = elem.findtext(tag)
+    return value.strip() if value else None
+
+
+def _csv_item(row: Dict[Optional[str], Any]) -> Dict[str, Any]:
+    item: Dict[str, Any] = {}
+    parameters: Dict[str, Any] = {}
+    for column, value in row.items():
+        # Лишние значения строки без колонки DictReader кладет под ключ None
+        if column is None or value is None:
+            continue
+        column = column.strip()
+        value = value.strip()
+        if not column or value == '':
+            continue
+
+        if column == 'parameters':
+            try:
+                value = json.loads(value)
+            except ValueError:
+                value = None
+            if isinstance(value, dict):
+                parameters.update(value)
+        elif column in GOODS_FIELDS:
+            item[column] = value
+        else:
+            parameters[column] = value
+
+    if parameters:
+        item['parameters'] = parameters
+    return item
@@ -0,0 +1,490 @@
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+import hashlib
+import json
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
+from django.db import connection, transaction, DatabaseError
+from django.utils import timezone
+from .models import Product, Supplier, Category
+from .import_errors import ImportErrorReport, INVALID_VALUE, INVALID_ITEM, DATABASE_ERROR
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Количество товаров, записываемых в одной транзакции
+DEFAULT_CHUNK_SIZE = 1000
+
+# Поля, которые перезаписываются у существующего товара при импорте
+UPDATE_FIELDS = [
+    'name', 'description', 'price', 'supplier', 'category',
+    'stock', 'is_active', 'characteristics', 'import_hash', 'updated_at'
+]
+
+
+# Режимы импорта: update - создает и обновляет товары из прайс-листа,
+# sync - дополнительно деактивирует товары поставщика, которых в нем нет,
+# replace - загружает прайс-лист в таблицу загрузки и заменяет им каталог
+# поставщика в одной короткой транзакции
+IMPORT_MODES = ('update', 'sync', 'replace')
+
+
+class InvalidRowError(ValueError):
+    """
+    Ошибка в данных товара прайс-листа
+    """
+
+    def __init__(self, message: str, field: Optional[str] = None, code: str = INVALID_VALUE):
+        super().__init__(message)
+        self.field = field
+        self.code = code
+
+
+def iter_chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """
+    Разбивает последовательность на списки длиной не более size
+    """
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def resolve_categories(categories_data: Iterable[Dict[str, Any]]) -> Dict[Any, Category]:
+    """
+    Создает словарь категорий {id из YAML: Category}
+
+    Все категории находятся и создаются через Category.resolve_ids,
+    то есть не более чем тремя запросами на весь список.
+
+    Args:
+        categories_data: список категорий из раздела categories
+
+    Returns:
+        dict: категории по их идентификаторам в файле
+    """
+    names = {}
+    for cat_data in categories_data:
+        cat_name = cat_data.get('name', 'Без категории')
+        cat_id = cat_data.get('id')
+        if cat_id and cat_name:
+            names[cat_id] = cat_name
+
+    category_ids = Category.resolve_ids(names.values())
+    return {
+        cat_id: Category(pk=category_ids[cat_name], name=cat_name)
+        for cat_id, cat_name in names.items()
+    }
+
+
+def iter_goods(entries: Iterable[Tuple[str, Any]], categories: Dict[Any, Category]) -> Iterator[Dict[str, Any]]:
+    """
+    Отдает товары из потока (раздел, элемент) от iter_price_list
+
+    Встреченные по пути категории накапливаются и создаются одним
+    вызовом resolve_categories перед первым товаром, после чего
+    добавляются в categories. Категории идут в файле перед товарами,
+    поэтому словарь успевает заполниться до того, как до него дойдут товары.
+    """
+    pending = []
+    for section, value in entries:
+        if section == 'categories':
+            if isinstance(value, dict):
+                pending.append(value)
+            continue
+
+        if pending:
+            categories.update(resolve_categories(pending))
+            pending = []
+        if section == 'goods':
+            yield value
+
+    if pending:
+        categories.update(resolve_categories(pending))
+
+
+def product_fields_from_item(item: Dict[str, Any],
+                             categories: Dict[Any, Category]) -> Optional[Dict[str, Any]]:
+    """
+    Преобразует товар из раздела goods в поля модели Product
+
+    Args:
+        item: товар из YAML
+        categories: словарь категорий из resolve_categories
+
+    Returns:
+        dict: поля товара или None, если у товара нет названия или цены
+
+    Raises:
+        InvalidRowError: если цена или количество имеют неверный формат
+    """
+    name = item.get('name')
+    price = item.get('price')
+
+    if not name or not price:
+        return None
+
+    try:
+        price = Decimal(str(price))
+    except (InvalidOperation, TypeError, ValueError):
+        raise InvalidRowError(f"Неверная цена у товара {item.get('id', name)}: {price!r}", field='price')
+    # NaN и бесконечность Decimal принимает, а DecimalField - нет
+    if not price.is_finite():
+        raise InvalidRowError(f"Неверная цена у товара {item.get('id', name)}: {item.get('price')!r}", field='price')
+
+    try:
+        stock = int(item.get('quantity', 0) or 0)
+    except (TypeError, ValueError):
+        raise InvalidRowError(
+            f"Неверное количество у товара {item.get('id', name)}: {item.get('quantity')!r}", field='quantity'
+        )
+
+    # Получаем категорию
+    category = None
+    cat_id = item.get('category')
+    try:
+        if cat_id and cat_id in categories:
+            category = categories[cat_id]
+    except TypeError:
+        # Список или словарь вместо идентификатора категории
+        raise InvalidRowError(f"Неверная категория у товара {item.get('id', name)}: {cat_id!r}", field='category')
+
+    # Получаем описание и характеристики
+    description = ""
+    characteristics = {}
+    if 'parameters' in item and isinstance(item['parameters'], dict):
+        if 'description' in item['parameters']:
+            # Сохраняем описание отдельно от характеристик
+            characteristics = item['parameters'].copy()
+            description = characteristics.pop('description')
+        else:
+            # Если нет отдельного описания, создаем его из параметров
+            description = "\n".join(f"{key}: {value}" for key, value in item['parameters'].items())
+            characteristics = item['parameters']
+        # Даты и другие типы YAML сохраняем строками, как в частях импорта (write_chunk_file)
+        characteristics = json_safe(characteristics)
+
+    return {
+        'sku': item_sku(item),
+        'name': name,
+        'description': description,
+        'price': price,
+        'category': category,
+        'stock': stock,
+        'is_active': True,
+        'characteristics': characteristics
+    }
+
+
+def json_safe(value: Any) -> Any:
+    """
+    Приводит значение к виду, в котором оно сохраняется в JSON
+
+    Значения, которых нет в JSON, становятся строками, а ключи словарей -
+    строками JSON, так же как при записи частей импорта в файлы.
+    """
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+def item_sku(item: Dict[str, Any]) -> Optional[str]:
+    """
+    Возвращает SKU товара из раздела goods
+    """
+    return str(item.get('id', '')) or None
+
+
+def collect_skus(items: Iterable[Any]) -> Set[str]:
+    """
+    Собирает SKU товаров прайс-листа, включая строки с ошибками
+    """
+    return {sku for sku in (item_sku(item) for item in items if isinstance(item, dict)) if sku}
+
+
+def deactivate_missing_products(supplier_id: int, skus: Set[str]) -> int:
+    """
+    Деактивирует товары поставщика, SKU которых нет в прайс-листе
+
+    Разница множеств считается в базе одним UPDATE. Товары без SKU
+    не затрагиваются: их нельзя сопоставить с прайс-листом. Если в
+    прайс-листе нет ни одного SKU, ничего не деактивируется, чтобы
+    пустой файл не скрыл весь каталог.
+
+    Args:
+        supplier_id: ID поставщика
+        skus: SKU товаров из прайс-листа
+
+    Returns:
+        int: количество деактивированных товаров
+    """
+    if not skus:
+        logger.warning(f"Sync for supplier {supplier_id} skipped: price list has no SKUs")
+        return 0
+
+    deactivated = (
+        Product.objects
+        .filter(supplier_id=supplier_id, is_active=True, sku__isnull=False)
+        .exclude(sku__in=skus)
+        .update(is_active=False, import_hash=None, updated_at=timezone.now())
+    )
+    if deactivated:
+        Supplier.bump_catalog_version(supplier_id)
+    return deactivated
+
+
+def write_error_code(error: Exception) -> str:
+    """
+    Возвращает тип ошибки записи товара для отчета об ошибках
+    """
+    return DATABASE_ERROR if isinstance(error, DatabaseError) else INVALID_VALUE
+
+
+def product_fingerprint(fields: Dict[str, Any], supplier_id: int) -> str:
+    """
+    Вычисляет отпечаток данных товара для инкрементального импорта
+
+    Args:
+        fields: поля товара из product_fields_from_item
+        supplier_id: ID поставщика
+
+    Returns:
+        str: md5 от записываемых полей товара
+    """
+    category = fields.get('category')
+    price = fields.get('price')
+    payload = {
+        'supplier': supplier_id,
+        'name': fields.get('name'),
+        'description': fields.get('description'),
+        'price': str(Decimal(str(price)).quantize(Decimal('0.01'))) if price is not None else None,
+        'category': category.pk if category is not None else None,
+        'stock': fields.get('stock'),
+        'is_active': fields.get('is_active'),
+        'characteristics': fields.get('characteristics'),
+    }
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.md5(data.encode('utf-8')).hexdigest()
+
+
+class ProductImporter:
+    """
+    Пакетная запись товаров поставщика
+
+    Товары накапливаются и записываются пачками по chunk_size штук:
+    существующие SKU пачки определяются одним запросом, а запись идет
+    через bulk_create(update_conflicts=True) в отдельной транзакции.
+    Если пачка не записалась целиком, товары пишутся по одному,
+    чтобы одна ошибочная строка не отменяла импорт остальных.
+
+    Вместе с товаром сохраняется отпечаток его данных. В инкрементальном
+    режиме (incremental=True) товары, отпечаток которых не изменился,
+    не перезаписываются.
+
+    Если передан progress (ImportProgress), счетчики публикуются
+    после записи каждой пачки.
+
+    Ошибочные строки не логируются по одной, а собираются
+    в error_report (ImportErrorReport); row_offset - номер товара
+    в прайс-листе, с которого начинаются переданные товары.
+    """
+
+    def __init__(self, supplier: Supplier, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 update_fields: Optional[List[str]] = None, incremental: bool = False,
+                 progress: Optional[Any] = None, row_offset: int = 0):
+        self.supplier = supplier
+        self.chunk_size = chunk_size
+        self.update_fields = update_fields or UPDATE_FIELDS
+        self.incremental = incremental
+        self.progress = progress
+        self.row_offset = row_offset
+        self.processed = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = 0
+        self.error_report = ImportErrorReport()
+        # Последняя ошибка при записи товаров по одному
+        self.last_error: Optional[Exception] = None
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_rows: List[Optional[int]] = []
+
+    def add(self, fields: Dict[str, Any], row: Optional[int] = None) -> None:
+        """
+        Добавляет товар в очередь на запись
+        """
+        self._pending.append(fields)
+        self._pending_rows.append(row)
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+
+    def add_error(self, reason: str, row: Optional[int] = None, sku: Optional[str] = None,
+                  field: Optional[str] = None, code: str = INVALID_VALUE) -> None:
+        """
+        Учитывает товар, который не удалось импортировать
+        """
+        self.errors += 1
+        self.error_report.add(reason, row=row, sku=sku, field=field, code=code)
+
+    def import_items(self, items: Iterable[Dict[str, Any]], categories: Dict[Any, Category]) -> 'ProductImporter':
+        """
+        Импортирует товары из раздела goods и записывает остаток очереди
+        """
+        for item in items:
+            self.processed += 1
+            row = self.row_offset + self.processed
+            try:
+                fields = product_fields_from_item(item, categories)
+            except InvalidRowError as e:
+                self.add_error(str(e), row=row, sku=item_sku(item), field=e.field, code=e.code)
+                continue
+            except (ValueError, AttributeError, TypeError) as e:
+                self.add_error(str(e), row=row, code=INVALID_ITEM)
+                continue
+            if fields is not None:
+                self.add(fields, row)
+        self.flush()
+        if self.progress is not None:
+            self.progress.update(self, force=True)
+        if self.errors:
+            logger.warning(
+                f"{self.errors} products of supplier {self.supplier.pk} were not imported: "
+                f"{self.error_report.counts}"
+            )
+        return self
+
+    def import_price_list(self, entries: Iterable[Tuple[str, Any]]) -> 'ProductImporter':
+        """
+        Импортирует прайс-лист из потока (раздел, элемент) от iter_price_list
+        """
+        categories: Dict[Any, Category] = {}
+        return self.import_items(iter_goods(entries, categories), categories)
+
+    def flush(self) -> None:
+        """
+        Записывает накопленные товары в базу данных
+        """
+        rows, self._pending = self._pending, []
+        row_numbers, self._pending_rows = self._pending_rows, []
+        if not rows:
+            return
+
+        for fields in rows:
+            fields['import_hash'] = product_fingerprint(fields, self.supplier.pk)
+
+        try:
+            with transaction.atomic():
+                created, updated, unchanged = self._write_chunk(rows)
+        except (DatabaseError, TypeError, ValueError) as e:
+            logger.warning(f"Bulk import of {len(rows)} products failed, retrying one by one: {str(e)}")
+            created, updated = self._write_rows(rows, row_numbers)
+            unchanged = 0
+
+        self.created += created
+        self.updated += updated
+        self.unchanged += unchanged
+        if created or updated:
+            Supplier.bump_catalog_version(self.supplier.pk)
+
+        if self.progress is not None:
+            self.progress.update(self)
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Возвращает счетчики импорта
+
+        Если были ошибки, в error_summary возвращается их количество
+        по типам. В инкрементальном режиме дополнительно возвращает количество
+        новых (new), измененных (changed) и неизмененных (unchanged) товаров.
+        """
+        result = {
+            "created": self.created,
+            "updated": self.updated,
+            "errors": self.errors,
+        }
+        if self.errors:
+            result["error_summary"] = dict(self.error_report.counts)
+        if self.incremental:
+            result.update({
+                "new": self.created,
+                "changed": self.updated,
+                "unchanged": self.unchanged,
+            })
+        return result
+
+    def _build(self, fields: Dict[str, Any]) -> Product:
+        # bulk_update не заполняет auto_now поля, поэтому время изменения задаем сами
+        return Product(supplier=self.supplier, updated_at=timezone.now(), **fields)
+
+    def _write_chunk(self, rows: List[Dict[str, Any]]) -> Tuple[int, int, int]:
+        # Товары без SKU всегда создаются заново
+        without_sku = [self._build(fields) for fields in rows if not fields['sku']]
+
+        # Повторы SKU внутри пачки схлопываем: побеждает последний,
+        # остальные считаются обновлениями, как при последовательном импорте
+        by_sku = {}
+        for fields in rows:
+            if fields['sku']:
+                by_sku[fields['sku']] = fields
+        duplicates = len(rows) - len(without_sku) - len(by_sku)
+
+        existing = {}
+        unchanged = 0
+        for sku, pk, import_hash in Product.objects.filter(
+            sku__in=list(by_sku)
+        ).values_list('sku', 'id', 'import_hash'):
+            # Неизмененные товары в инкрементальном режиме пропускаем
+            if self.incremental and import_hash == by_sku[sku]['import_hash']:
+                del by_sku[sku]
+                unchanged += 1
+            else:
+                existing[sku] = pk
+
+        if connection.features.supports_update_conflicts_with_target:
+            Product.objects.bulk_create(
+                [self._build(fields) for fields in by_sku.values()] + without_sku,
+                update_conflicts=True,
+                unique_fields=['sku'],
+                update_fields=self.update_fields,
+            )
+        else:
+            to_update = []
+            to_create = list(without_sku)
+            for sku, fields in by_sku.items():
+                product = self._build(fields)
+                if sku in existing:
+                    product.pk = existing[sku]
+                    to_update.append(product)
+                else:
+                    to_create.append(product)
+            Product.objects.bulk_create(to_create)
+            Product.objects.bulk_update(to_update, self.update_fields)
+
+        new_count = len(by_sku) - len(existing)
+        return new_count + len(without_sku), len(existing) + duplicates, unchanged
+
+    def _write_rows(self, rows: List[Dict[str, Any]], row_numbers: List[Optional[int]]) -> Tuple[int, int]:
+        created_count = 0
+        updated_count = 0
+        for fields, row in zip(rows, row_numbers):
+            try:
+                with transaction.atomic():
+                    if fields['sku']:
+                        defaults = {key: fields[key] for key in self.update_fields if key in fields}
+                        defaults['supplier'] = self.supplier
+                        product, created = Product.objects.update_or_create(sku=fields['sku'], defaults=defaults)
+                    else:
+                        product = self._build(fields)
+                        product.save()
+                        created = True
+                    # save() сбрасывает отпечаток, поэтому записываем его отдельно
+                    Product.objects.filter(pk=product.pk).update(import_hash=fields['import_hash'])
+            except (DatabaseError, TypeError, ValueError) as e:
+                self.last_error = e
+                self.add_error(str(e).strip(), row=row, sku=fields['sku'], code=write_error_code(e))
+                continue
+
+            if created:
+                created_count += 1
+            else:
+                updated_count += 1
+        return created_count, updated_count
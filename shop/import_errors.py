@@ -0,0 +1,96 @@
+from django.conf import settings
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional
+import json
+import os
+
+from .import_files import imports_dir
+
+# Типы ошибок импорта
+INVALID_VALUE = 'invalid_value'
+INVALID_ITEM = 'invalid_item'
+DATABASE_ERROR = 'database_error'
+CHUNK_FAILED = 'chunk_failed'
+
+
+class ImportErrorReport:
+    """
+    Ошибки импорта, собранные в памяти
+
+    Хранится не больше limit ошибок (settings.IMPORT_ERROR_LIMIT),
+    остальные только учитываются в счетчиках по типам. Поэтому
+    прайс-лист с систематической ошибкой не занимает память и не засыпает
+    логи сообщениями: отчет записывается в файл один раз после импорта.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = settings.IMPORT_ERROR_LIMIT if limit is None else limit
+        self.errors: List[Dict[str, Any]] = []
+        self.counts: Dict[str, int] = {}
+
+    def add(self, reason: str, row: Optional[int] = None, sku: Optional[str] = None,
+            field: Optional[str] = None, code: str = INVALID_VALUE) -> None:
+        """
+        Учитывает ошибку в строке прайс-листа
+
+        Args:
+            reason: описание ошибки
+            row: номер товара в разделе goods (с единицы)
+            sku: SKU товара
+            field: поле товара, в котором ошибка
+            code: тип ошибки
+        """
+        self.counts[code] = self.counts.get(code, 0) + 1
+        if len(self.errors) < self.limit:
+            self.errors.append({"row": row, "sku": sku, "field": field, "code": code, "reason": reason})
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def write(self, path: str) -> str:
+        """
+        Записывает собранные ошибки в JSONL файл, по одной на строку
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            for error in self.errors:
+                f.write(json.dumps(error, ensure_ascii=False) + '\n')
+        return path
+
+
+def error_report_path(run_id: str, filename: Optional[str] = None) -> str:
+    """
+    Возвращает путь к отчету об ошибках импорта
+
+    Отчет сохраняется рядом с импортируемым файлом, а для импорта
+    из строки - в MEDIA_ROOT/imports.
+    """
+    if filename:
+        return f"{os.path.splitext(filename)[0]}.{run_id}.errors.jsonl"
+    return os.path.join(imports_dir(), f"{run_id}.errors.jsonl")
+
+
+def merge_error_reports(paths: Iterable[str], path: str, limit: Optional[int] = None) -> str:
+    """
+    Объединяет отчеты частей импорта в один, сохраняя не больше limit ошибок
+    """
+    remaining = settings.IMPORT_ERROR_LIMIT if limit is None else limit
+    with open(path, 'w', encoding='utf-8') as report:
+        for part in paths:
+            if remaining <= 0:
+                break
+            with open(part, 'r', encoding='utf-8') as f:
+                lines = list(islice(f, remaining))
+            report.writelines(lines)
+            remaining -= len(lines)
+    return path
+
+
+def error_report_url(path: str) -> str:
+    """
+    Возвращает URL отчета, если он лежит в MEDIA_ROOT, иначе путь к файлу
+    """
+    relative = os.path.relpath(path, settings.MEDIA_ROOT)
+    if relative.startswith(os.pardir):
+        return path
+    return settings.MEDIA_URL + relative.replace(os.sep, '/')
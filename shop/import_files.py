@@ -0,0 +1,241 @@
+from django.conf import settings
+from django.core.cache import cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# Директория в MEDIA_ROOT, где хранятся загруженные прайс-листы
+IMPORTS_DIR = 'imports'
+
+# Директория частей импорта внутри IMPORTS_DIR
+CHUNKS_DIR = 'chunks'
+
+# Файл со списком SKU прайс-листа в директории частей импорта
+SKUS_FILE = 'skus.json'
+
+
+def imports_dir(*parts: str) -> str:
+    """
+    Возвращает (и создает) директорию для файлов импорта
+    """
+    path = os.path.join(settings.MEDIA_ROOT, IMPORTS_DIR, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def store_import_file(chunks: Iterable[Union[bytes, str]], extension: str = '.yaml') -> Tuple[str, str]:
+    """
+    Потоково сохраняет прайс-лист в MEDIA_ROOT/imports под именем sha256 содержимого
+
+    Файл пишется во временный файл и переименовывается только после
+    подсчета хеша, поэтому одинаковые файлы хранятся в одном экземпляре.
+
+    Args:
+        chunks: части файла (например, UploadedFile.chunks())
+        extension: расширение сохраняемого файла
+
+    Returns:
+        tuple: (путь к файлу, sha256 содержимого)
+    """
+    directory = imports_dir()
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                digest.update(chunk)
+                f.write(chunk)
+
+        path = os.path.join(directory, digest.hexdigest() + extension)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            # Повторно загруженный файл не должен удалить cleanup_import_files
+            os.utime(path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return path, digest.hexdigest()
+
+
+def store_import_text(text: str, extension: str = '.yaml') -> Tuple[str, str]:
+    """
+    Сохраняет прайс-лист, переданный строкой, как store_import_file
+    """
+    return store_import_file([text.encode('utf-8')], extension)
+
+
+def start_import(supplier: Any, path: str, digest: str, force: bool = False,
+                 **options: Any) -> Tuple[str, bool]:
+    """
+    Запускает do_import для сохраненного прайс-листа
+
+    Повторная загрузка того же файла тем же поставщиком не запускает
+    новый импорт, а возвращает ID уже запущенного, если тот не завершился
+    ошибкой и не был отменен более новым импортом. Параметр force
+    отключает эту проверку.
+
+    Args:
+        supplier: объект Supplier
+        path: путь к файлу из store_import_file
+        digest: sha256 содержимого файла
+        force: запустить импорт, даже если такой файл уже импортировался
+        options: дополнительные параметры do_import
+
+    Returns:
+        tuple: (ID задачи, True если импорт этого файла уже был запущен)
+    """
+    from .tasks import do_import
+    from .import_progress import get_import_progress
+
+    # Тот же файл с другими параметрами (например, mode) импортируется заново
+    params = ','.join(f"{name}={value}" for name, value in sorted(options.items()))
+    key = f"import_file:{supplier.id}:{digest}:{params}"
+    if not force:
+        task_id = cache.get(key)
+        if task_id:
+            progress = get_import_progress(task_id)
+            if progress is None or progress['status'] not in ('failed', 'superseded'):
+                return task_id, True
+
+    # Файл удаляется, когда завершатся все запущенные по нему импорты
+    refs_key = _refs_key(path)
+    cache.add(refs_key, 0, settings.IMPORT_PROGRESS_TTL)
+    cache.incr(refs_key)
+    try:
+        task = do_import.delay(supplier.id, filename=path, **options)
+    except BaseException:
+        release_import_file(path, delete=False)
+        raise
+    cache.set(key, task.id, settings.IMPORT_PROGRESS_TTL)
+    return task.id, False
+
+
+def release_import_file(path: Optional[str], delete: bool = True) -> bool:
+    """
+    Отмечает, что импорт прайс-листа, запущенный start_import, завершен
+
+    Файл удаляется, если по нему не осталось незавершенных импортов
+    и delete=True (импорт прошел успешно). Файлы, импорт которых
+    запущен не через start_import, не удаляются никогда. Отчет
+    об ошибках остается до очистки cleanup_import_files.
+
+    Args:
+        path: путь к файлу из store_import_file
+        delete: удалить файл, если это последний импорт по нему
+
+    Returns:
+        bool: True, если файл удален
+    """
+    if not path:
+        return False
+    try:
+        refs = cache.decr(_refs_key(path))
+    except ValueError:
+        return False
+    if refs > 0 or not delete:
+        return False
+
+    cache.delete(_refs_key(path))
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    return True
+
+
+def cleanup_import_files(max_age: Optional[int] = None) -> int:
+    """
+    Удаляет старые файлы импорта из MEDIA_ROOT/imports
+
+    Удаляются прайс-листы, отчеты об ошибках, недописанные файлы
+    и директории частей, которые не менялись дольше max_age секунд.
+    По умолчанию это settings.IMPORT_FILE_TTL - столько же хранятся
+    прогресс импорта и защита от повторного импорта файла, поэтому
+    ссылка на отчет в результате импорта остается рабочей.
+
+    Args:
+        max_age: возраст файла в секундах, после которого он удаляется
+
+    Returns:
+        int: количество удаленных файлов и директорий
+    """
+    max_age = settings.IMPORT_FILE_TTL if max_age is None else max_age
+    deadline = time.time() - max_age
+    root = imports_dir()
+    chunks = os.path.join(root, CHUNKS_DIR)
+
+    removed = 0
+    for directory in (root, chunks):
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            if entry.path == chunks:
+                continue
+            try:
+                if entry.stat().st_mtime > deadline:
+                    continue
+                if entry.is_dir():
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+    return removed
+
+
+def _refs_key(path: str) -> str:
+    return f"import_file_refs:{os.path.basename(path)}"
+
+
+def write_chunk_file(directory: str, index: int, items: List[Dict[str, Any]]) -> str:
+    """
+    Сохраняет часть товаров для подзадачи импорта в JSON файл
+    """
+    path = os.path.join(directory, f"{index:06d}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(items, f, ensure_ascii=False, default=str)
+    return path
+
+
+def read_chunk_file(path: str) -> List[Dict[str, Any]]:
+    """
+    Читает часть товаров, сохраненную write_chunk_file
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_skus_file(directory: str, skus: Iterable[str]) -> str:
+    """
+    Сохраняет SKU товаров прайс-листа для режима sync
+    """
+    path = os.path.join(directory, SKUS_FILE)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(sorted(skus), f, ensure_ascii=False)
+    return path
+
+
+def read_skus_file(directory: str) -> List[str]:
+    """
+    Читает SKU, сохраненные write_skus_file
+    """
+    with open(os.path.join(directory, SKUS_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def remove_chunk_dir(directory: str) -> None:
+    """
+    Удаляет директорию с частями импорта
+    """
+    shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,148 @@
+from django.conf import settings
+from django.core.cache import cache
+from typing import Any, Dict, Optional
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Счетчики прогресса, которые задачи импорта увеличивают независимо друг от друга
+COUNTERS = ('processed', 'created', 'updated', 'unchanged', 'errors')
+
+
+def _key(task_id: str, name: Optional[str] = None) -> str:
+    key = f"import_progress:{task_id}"
+    return f"{key}:{name}" if name else key
+
+
+class ImportProgress:
+    """
+    Прогресс импорта товаров в кэше Django
+
+    Описание импорта хранится одной записью, а счетчики - отдельными
+    ключами, которые увеличиваются через cache.incr. Поэтому части
+    параллельного импорта могут публиковать прогресс в одну запись,
+    не перезаписывая друг друга. Публикация ограничена по частоте
+    параметром interval (settings.IMPORT_PROGRESS_INTERVAL секунд).
+    Вместе с публикацией продлевается блокировка поставщика lock
+    (SupplierImportQueue), чтобы долгий импорт не потерял ее.
+    """
+
+    def __init__(self, task_id: str, interval: Optional[float] = None, lock: Optional[Any] = None):
+        self.task_id = task_id
+        self.lock = lock
+        self.interval = settings.IMPORT_PROGRESS_INTERVAL if interval is None else interval
+        self.timeout = settings.IMPORT_PROGRESS_TTL
+        self._published: Dict[str, int] = {}
+        self._last_publish = 0.0
+
+    def start(self, supplier_id: int, total: Optional[int] = None) -> None:
+        """
+        Создает запись о начале импорта
+        """
+        cache.set(_key(self.task_id), {
+            "supplier_id": supplier_id,
+            "status": "running",
+            "total": total,
+            "started_at": time.time(),
+        }, self.timeout)
+        cache.set_many({_key(self.task_id, name): 0 for name in COUNTERS}, self.timeout)
+
+    def queue(self, supplier_id: int) -> None:
+        """
+        Создает запись об импорте, который ждет завершения предыдущего
+        """
+        cache.set(_key(self.task_id), {
+            "supplier_id": supplier_id,
+            "status": "queued",
+            "total": None,
+            "started_at": time.time(),
+        }, self.timeout)
+
+    def set_total(self, total: int) -> None:
+        """
+        Сохраняет общее количество товаров, когда оно стало известно
+        """
+        meta = cache.get(_key(self.task_id))
+        if meta is not None:
+            meta["total"] = total
+            cache.set(_key(self.task_id), meta, self.timeout)
+
+    def update(self, importer: Any, force: bool = False) -> None:
+        """
+        Публикует изменения счетчиков импортера с прошлой публикации
+        """
+        now = time.monotonic()
+        if not force and now - self._last_publish < self.interval:
+            return
+
+        for name in COUNTERS:
+            value = getattr(importer, name, 0)
+            delta = value - self._published.get(name, 0)
+            if delta:
+                self._incr(name, delta)
+            self._published[name] = value
+        self._last_publish = now
+
+        if self.lock is not None and not self.lock.renew():
+            logger.warning(f"Import {self.task_id} lost the supplier lock to another import")
+
+    def finish(self, result: Dict[str, Any], status: Optional[str] = None) -> None:
+        """
+        Отмечает импорт завершенным и сохраняет его результат
+
+        Args:
+            result: результат импорта
+            status: итоговый статус (по умолчанию failed при ошибке, иначе finished)
+        """
+        meta = cache.get(_key(self.task_id)) or {"started_at": time.time()}
+        meta.update({
+            "status": status or ("failed" if "error" in result else "finished"),
+            "finished_at": time.time(),
+            "result": result,
+        })
+        cache.set(_key(self.task_id), meta, self.timeout)
+
+    def _incr(self, name: str, delta: int) -> None:
+        key = _key(self.task_id, name)
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            cache.add(key, 0, self.timeout)
+            cache.incr(key, delta)
+
+
+def get_import_progress(task_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Возвращает прогресс импорта из кэша
+
+    Args:
+        task_id: ID задачи do_import
+
+    Returns:
+        dict: статус, счетчики, скорость (товаров в секунду) и оценка
+              оставшегося времени в секундах, или None, если импорта нет
+    """
+    meta = cache.get(_key(task_id))
+    if meta is None:
+        return None
+
+    counters = cache.get_many([_key(task_id, name) for name in COUNTERS])
+    progress = dict(meta)
+    for name in COUNTERS:
+        progress[name] = counters.get(_key(task_id, name), 0)
+
+    elapsed = (meta.get('finished_at') or time.time()) - meta['started_at']
+    rate = progress['processed'] / elapsed if elapsed > 0 else 0.0
+    total = meta.get('total')
+
+    eta = None
+    if progress['status'] == 'running' and total and rate:
+        eta = round(max(total - progress['processed'], 0) / rate, 1)
+
+    progress.update({
+        "elapsed": round(elapsed, 1),
+        "rate": round(rate, 1),
+        "eta": eta,
+    })
+    return progress
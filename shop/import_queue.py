@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _lock_key(supplier_id: int) -> str:
+    return f"import_lock:{supplier_id}"
+
+
+def _counter_key(supplier_id: int) -> str:
+    return f"import_queue:{supplier_id}"
+
+
+def _ticket_key(owner: str) -> str:
+    return f"import_ticket:{owner}"
+
+
+class SupplierImportQueue:
+    """
+    Очередь импортов поставщика в кэше Django
+
+    Одновременно выполняется не больше одного импорта поставщика: импорт
+    держит блокировку import_lock:<supplier_id>, пока не запишет все товары.
+    Каждый новый импорт получает номер больше номеров предыдущих.
+    Импорт, которому блокировка не досталась, ждет своей очереди, но если
+    за ним поставлен более новый импорт, ожидающий отменяется - его данные
+    все равно были бы перезаписаны. Импорты разных поставщиков
+    не блокируют друг друга.
+
+    Блокировка хранится settings.IMPORT_LOCK_TTL секунд с последнего
+    продления (renew): его выполняют публикация прогресса и задачи частей
+    импорта. Поэтому долгий импорт не теряет блокировку, а упавший воркер
+    не блокирует поставщика навсегда.
+    """
+
+    def __init__(self, supplier_id: int, owner: str):
+        self.supplier_id = supplier_id
+        self.owner = owner
+        self.timeout = settings.IMPORT_LOCK_TTL
+
+    def submit(self) -> int:
+        """
+        Ставит импорт в очередь и возвращает его номер
+        """
+        key = _counter_key(self.supplier_id)
+        cache.add(key, 0, None)
+        ticket = cache.incr(key)
+        cache.set(_ticket_key(self.owner), ticket, settings.IMPORT_PROGRESS_TTL)
+        return ticket
+
+    def is_superseded(self) -> bool:
+        """
+        Проверяет, поставлен ли после этого импорта более новый
+        """
+        ticket = cache.get(_ticket_key(self.owner))
+        latest = cache.get(_counter_key(self.supplier_id))
+        return ticket is not None and latest is not None and ticket < latest
+
+    def acquire(self) -> bool:
+        """
+        Занимает блокировку поставщика, если она свободна
+        """
+        key = _lock_key(self.supplier_id)
+        return cache.add(key, self.owner, self.timeout) or cache.get(key) == self.owner
+
+    def renew(self) -> bool:
+        """
+        Продлевает блокировку этого импорта еще на settings.IMPORT_LOCK_TTL секунд
+
+        Если блокировка истекла и ее никто не занял, она занимается заново.
+
+        Returns:
+            bool: False, если блокировку занял другой импорт
+        """
+        key = _lock_key(self.supplier_id)
+        if cache.get(key) == self.owner and cache.touch(key, self.timeout):
+            return True
+        return self.acquire()
+
+    def release(self) -> None:
+        """
+        Освобождает блокировку, если ее держит этот импорт
+        """
+        key = _lock_key(self.supplier_id)
+        if cache.get(key) == self.owner:
+            cache.delete(key)
+        cache.delete(_ticket_key(self.owner))
+
@@ -0,0 +1,200 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from django.conf import settings
+from django.db import connection, transaction, DatabaseError
+from django.utils import timezone
+from .models import Product, StagedProduct, Supplier
+from .import_engine import ProductImporter, write_error_code
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Поля, которые переносятся из таблицы загрузки в Product
+MERGE_FIELDS = [
+    'supplier_id', 'name', 'description', 'price', 'category_id',
+    'stock', 'is_active', 'characteristics', 'import_hash'
+]
+
+
+class ReplaceValidationError(ValueError):
+    """
+    Загруженный каталог не прошел проверку и не заменяет текущий
+    """
+
+
+class StagingImporter(ProductImporter):
+    """
+    Пакетная загрузка товаров в StagedProduct для режима replace
+
+    Строки проверяются так же, как в ProductImporter, но товары
+    записываются в таблицу загрузки простым bulk_create, без поиска
+    существующих SKU. Каталог поставщика не меняется, пока загруженные
+    товары не перенесет swap_staged_products.
+    """
+
+    def __init__(self, supplier: Supplier, run_id: str, **kwargs: Any):
+        super().__init__(supplier, **kwargs)
+        self.run_id = run_id
+        self.staged = 0
+
+    def add(self, fields: Dict[str, Any], row: Optional[int] = None) -> None:
+        # Номер строки нужен, чтобы из повторов SKU победил последний
+        super().add(dict(fields, row=row), row)
+
+    def result(self) -> Dict[str, Any]:
+        """
+        Возвращает количество загруженных и ошибочных товаров
+        """
+        result = {"staged": self.staged, "errors": self.errors}
+        if self.errors:
+            result["error_summary"] = dict(self.error_report.counts)
+        return result
+
+    def _build(self, fields: Dict[str, Any]) -> StagedProduct:
+        return StagedProduct(run_id=self.run_id, supplier=self.supplier, **fields)
+
+    def _write_chunk(self, rows: List[Dict[str, Any]]) -> Tuple[int, int, int]:
+        StagedProduct.objects.bulk_create([self._build(fields) for fields in rows])
+        self.staged += len(rows)
+        return 0, 0, 0
+
+    def _write_rows(self, rows: List[Dict[str, Any]], row_numbers: List[Optional[int]]) -> Tuple[int, int]:
+        for fields, row in zip(rows, row_numbers):
+            try:
+                with transaction.atomic():
+                    self._build(fields).save()
+            except (DatabaseError, TypeError, ValueError) as e:
+                self.add_error(str(e).strip(), row=row, sku=fields['sku'], code=write_error_code(e))
+                continue
+            self.staged += 1
+        return 0, 0
+
+
+def validate_staged_products(staged: int, errors: int, failed: int = 0) -> None:
+    """
+    Проверяет, что загруженным каталогом можно заменить текущий
+
+    Raises:
+        ReplaceValidationError: если часть прайс-листа не загрузилась целиком,
+                                каталог пуст или доля ошибочных строк
+                                больше settings.IMPORT_REPLACE_MAX_ERROR_RATE
+    """
+    # Неполным каталогом нельзя заменять текущий, иначе товары
+    # незагруженной части будут деактивированы
+    if failed:
+        raise ReplaceValidationError(
+            f"{failed} products were not loaded because an import chunk failed, catalog was not replaced"
+        )
+
+    if not staged:
+        raise ReplaceValidationError("Price list has no valid products, catalog was not replaced")
+
+    error_rate = errors / (staged + errors)
+    if error_rate > settings.IMPORT_REPLACE_MAX_ERROR_RATE:
+        raise ReplaceValidationError(
+            f"{errors} of {staged + errors} products are invalid, catalog was not replaced"
+        )
+
+
+def swap_staged_products(supplier_id: int, run_id: str, errors: int = 0, failed: int = 0) -> Dict[str, int]:
+    """
+    Заменяет каталог поставщика товарами из таблицы загрузки
+
+    Загруженный каталог проверяется (validate_staged_products), после чего
+    в одной транзакции несколькими запросами над множествами:
+    товары с SKU переносятся через INSERT ... ON CONFLICT (из повторов
+    SKU побеждает последняя строка, неизменившиеся товары не
+    перезаписываются), остальные товары поставщика деактивируются,
+    а товары без SKU создаются. Покупатели видят либо старый, либо новый
+    каталог целиком, а строки товаров блокируются только на время этой
+    транзакции. Строки загрузки удаляются в любом случае.
+
+    Args:
+        supplier_id: ID поставщика
+        run_id: ID импорта, под которым загружены товары
+        errors: количество строк прайс-листа, которые не удалось загрузить
+        failed: количество строк частей прайс-листа, которые не загрузились
+                целиком (CHUNK_FAILED)
+
+    Returns:
+        dict: количество созданных, обновленных, неизмененных
+              и деактивированных товаров
+
+    Raises:
+        ReplaceValidationError: если загруженный каталог не прошел проверку
+    """
+    staged = StagedProduct.objects.filter(run_id=run_id)
+    try:
+        validate_staged_products(staged.count(), errors, failed)
+
+        staged_skus = staged.filter(sku__isnull=False).values('sku')
+        now = timezone.now()
+        with transaction.atomic():
+            existing = Product.objects.filter(sku__in=staged_skus).count()
+            new_skus = staged_skus.distinct().count() - existing
+            with connection.cursor() as cursor:
+                cursor.execute(*_merge_sql(run_id, now))
+                merged = cursor.rowcount
+
+            # Товары, которых нет в новом каталоге, скрываем до переноса
+            # товаров без SKU, чтобы не задеть только что созданные
+            deactivated = (
+                Product.objects
+                .filter(supplier_id=supplier_id, is_active=True)
+                .exclude(sku__in=staged_skus)
+                .update(is_active=False, import_hash=None, updated_at=now)
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(*_insert_without_sku_sql(run_id, now))
+                without_sku = cursor.rowcount
+            Supplier.bump_catalog_version(supplier_id)
+    finally:
+        staged.delete()
+
+    updated = merged - new_skus
+    logger.info(f"Catalog of supplier {supplier_id} replaced by import {run_id}")
+    return {
+        "created": new_skus + without_sku,
+        "updated": updated,
+        "unchanged": existing - updated,
+        "deactivated": deactivated,
+    }
+
+
+def discard_staged_products(supplier_id: int, keep_run_id: Optional[str] = None) -> int:
+    """
+    Удаляет строки загрузки поставщика, оставшиеся от прерванных импортов
+    """
+    staged = StagedProduct.objects.filter(supplier_id=supplier_id)
+    if keep_run_id:
+        staged = staged.exclude(run_id=keep_run_id)
+    return staged.delete()[0]
+
+
+def _merge_sql(run_id: str, updated_at: datetime) -> Tuple[str, List[Any]]:
+    qn = connection.ops.quote_name
+    product = qn(Product._meta.db_table)
+    columns = ', '.join(qn(column) for column in ['sku'] + MERGE_FIELDS)
+    updates = ', '.join(f'{qn(column)} = EXCLUDED.{qn(column)}' for column in MERGE_FIELDS + ['updated_at'])
+    sql = (
+        f'INSERT INTO {product} ({columns}, {qn("updated_at")}) '
+        f'SELECT {columns}, %s FROM ('
+        f'SELECT *, ROW_NUMBER() OVER (PARTITION BY {qn("sku")} ORDER BY {qn("row")} DESC, {qn("id")} DESC) '
+        f'AS {qn("position")} '
+        f'FROM {qn(StagedProduct._meta.db_table)} WHERE {qn("run_id")} = %s AND {qn("sku")} IS NOT NULL'
+        f') AS {qn("staged")} WHERE {qn("position")} = 1 '
+        f'ON CONFLICT ({qn("sku")}) DO UPDATE SET {updates} '
+        f'WHERE {product}.{qn("import_hash")} IS DISTINCT FROM EXCLUDED.{qn("import_hash")}'
+    )
+    return sql, [updated_at, run_id]
+
+
+def _insert_without_sku_sql(run_id: str, updated_at: datetime) -> Tuple[str, List[Any]]:
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(column) for column in MERGE_FIELDS)
+    sql = (
+        f'INSERT INTO {qn(Product._meta.db_table)} ({columns}, {qn("updated_at")}) '
+        f'SELECT {columns}, %s FROM {qn(StagedProduct._meta.db_table)} '
+        f'WHERE {qn("run_id")} = %s AND {qn("sku")} IS NULL ORDER BY {qn("row")}, {qn("id")}'
+    )
+    return sql, [updated_at, run_id]
@@ -0,0 +1,159 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .models import Category, Product, Supplier
+from .import_engine import (
+    DEFAULT_CHUNK_SIZE, InvalidRowError, item_sku, iter_chunks, product_fields_from_item, product_fingerprint
+)
+from .import_errors import ImportErrorReport, INVALID_ITEM
+
+# Типы ошибок, которые находит только проверка прайс-листа
+MISSING_FIELD = 'missing_field'
+UNKNOWN_CATEGORY = 'unknown_category'
+DUPLICATE_SKU = 'duplicate_sku'
+
+# Поля товара, из которых считается отпечаток сохраненного товара
+FINGERPRINT_FIELDS = (
+    'sku', 'supplier_id', 'name', 'description', 'price', 'category_id', 'stock', 'is_active', 'characteristics'
+)
+
+
+def validate_item(item: Any, categories: Dict[Any, Category], seen_skus: Set[str]) -> Dict[str, Any]:
+    """
+    Проверяет товар прайс-листа и возвращает его поля
+
+    Кроме проверок product_fields_from_item проверяет обязательные
+    поля, ссылку на категорию и повтор SKU в прайс-листе.
+
+    Raises:
+        InvalidRowError: если товар не пройдет импорт или содержит ошибку
+    """
+    if not isinstance(item, dict):
+        raise InvalidRowError("Товар должен быть словарем", code=INVALID_ITEM)
+
+    for field in ('name', 'price'):
+        if not item.get(field):
+            raise InvalidRowError(f"Не указано поле {field} у товара {item.get('id')}", field=field,
+                                  code=MISSING_FIELD)
+
+    fields = product_fields_from_item(item, categories)
+    if fields['price'] < 0:
+        raise InvalidRowError(f"Отрицательная цена у товара {item.get('id')}", field='price')
+    if fields['stock'] < 0:
+        raise InvalidRowError(f"Отрицательное количество у товара {item.get('id')}", field='quantity')
+
+    cat_id = item.get('category')
+    if cat_id is not None and cat_id not in categories:
+        raise InvalidRowError(f"Категория {cat_id} не найдена в разделе categories", field='category',
+                              code=UNKNOWN_CATEGORY)
+
+    sku = fields['sku']
+    if sku:
+        if sku in seen_skus:
+            raise InvalidRowError(f"SKU {sku} повторяется в прайс-листе", field='id', code=DUPLICATE_SKU)
+        seen_skus.add(sku)
+    return fields
+
+
+def validate_price_list(supplier: Supplier, entries: Iterable[Tuple[str, Any]],
+                        chunk_size: int = DEFAULT_CHUNK_SIZE,
+                        error_report: Optional[ImportErrorReport] = None) -> Dict[str, Any]:
+    """
+    Проверяет прайс-лист без записи в базу данных
+
+    Прайс-лист читается потоково, товары сравниваются с сохраненными
+    пачками: существующие SKU пачки находятся одним запросом, а их данные
+    сравниваются по отпечатку, как при инкрементальном импорте.
+
+    Args:
+        supplier: объект Supplier
+        entries: поток (раздел, элемент) от iter_price_list
+        chunk_size: количество товаров, сравниваемых одним запросом
+        error_report: отчет, в который собираются ошибки товаров
+
+    Returns:
+        dict: valid, количество товаров total, new, changed, unchanged
+              и invalid, количество товаров поставщика, которых нет
+              в прайс-листе (missing), новых и существующих категорий
+              и количество ошибок по типам (error_summary)
+    """
+    report = error_report if error_report is not None else ImportErrorReport()
+    counts = {"new": 0, "changed": 0, "unchanged": 0}
+    category_names: Dict[Any, str] = {}
+    categories: Dict[Any, Category] = {}
+    seen_skus: Set[str] = set()
+    total = 0
+
+    def goods() -> Iterable[Any]:
+        for section, value in entries:
+            if section == 'categories':
+                if isinstance(value, dict) and value.get('id') and value.get('name'):
+                    category_names[value['id']] = value['name']
+            elif section == 'goods':
+                # Категории CSV и JSONL встречаются между товарами
+                if category_names:
+                    categories.update(_existing_categories(category_names))
+                    category_names.clear()
+                yield value
+
+    for chunk in iter_chunks(goods(), chunk_size):
+        rows = []
+        for item in chunk:
+            total += 1
+            try:
+                rows.append(validate_item(item, categories, seen_skus))
+            except InvalidRowError as e:
+                sku = item_sku(item) if isinstance(item, dict) else None
+                report.add(str(e), row=total, sku=sku, field=e.field, code=e.code)
+        _compare_chunk(supplier, rows, counts)
+
+    if category_names:
+        categories.update(_existing_categories(category_names))
+    new_categories = sum(1 for category in categories.values() if category.pk is None)
+
+    missing = 0
+    if seen_skus:
+        missing = (
+            Product.objects
+            .filter(supplier=supplier, is_active=True, sku__isnull=False)
+            .exclude(sku__in=seen_skus)
+            .count()
+        )
+
+    return {
+        "valid": report.total == 0,
+        "total": total,
+        **counts,
+        "invalid": report.total,
+        "missing": missing,
+        "categories": {"new": new_categories, "existing": len(categories) - new_categories},
+        "error_summary": report.counts,
+    }
+
+
+def _existing_categories(category_names: Dict[Any, str]) -> Dict[Any, Category]:
+    # Одним запросом находим существующие категории; новые остаются без pk
+    ids = dict(Category.objects.filter(name__in=set(category_names.values())).values_list('name', 'id'))
+    return {cat_id: Category(pk=ids.get(name), name=name) for cat_id, name in category_names.items()}
+
+
+def _compare_chunk(supplier: Supplier, rows: List[Dict[str, Any]], counts: Dict[str, int]) -> None:
+    by_sku = {fields['sku']: fields for fields in rows if fields['sku']}
+    counts["new"] += len(rows) - len(by_sku)
+
+    stored = {}
+    for values in Product.objects.filter(sku__in=list(by_sku)).values(*FINGERPRINT_FIELDS):
+        category_id = values.pop('category_id')
+        values['category'] = Category(pk=category_id) if category_id else None
+        stored[values['sku']] = product_fingerprint(values, values['supplier_id'])
+
+    for sku, fields in by_sku.items():
+        if sku not in stored:
+            counts["new"] += 1
+        elif _is_new_category(fields.get('category')) or product_fingerprint(fields, supplier.pk) != stored[sku]:
+            counts["changed"] += 1
+        else:
+            counts["unchanged"] += 1
+
+
+def _is_new_category(category: Optional[Category]) -> bool:
+    return category is not None and category.pk is None
@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+import time
+import tracemalloc
+import uuid
+
+from shop.import_engine import ProductImporter
+from shop.models import Product, Supplier
+from shop.price_list_generator import generate_goods, generate_categories
+from shop.utils import iter_products_yaml
+from shop.yaml_backend import safe_dump
+
+
+def naive_export(supplier):
+    """
+    Экспорт до оптимизации: объекты моделей и отдельный запрос категории на каждый товар
+    """
+    products = Product.objects.filter(supplier=supplier).order_by('name', 'id')
+    data = {'shop': supplier.user.company_name or supplier.user.username, 'categories': [], 'goods': []}
+
+    categories = {}
+    for product in products:
+        if product.category and product.category.id not in categories:
+            categories[product.category.id] = product.category.name
+    for cat_id, cat_name in categories.items():
+        data['categories'].append({'id': cat_id, 'name': cat_name})
+
+    for product in products:
+        parameters = {'description': product.description}
+        if product.characteristics:
+            parameters.update(product.characteristics)
+        data['goods'].append({
+            'id': product.sku or str(product.id),
+            'category': product.category.id if product.category else None,
+            'name': product.name,
+            'price': float(product.price),
+            'quantity': product.stock,
+            'parameters': parameters
+        })
+    return safe_dump(data, allow_unicode=True, sort_keys=False)
+
+
+# Функции экспорта, производительность которых измеряется; каждая отдает YAML частями
+RUNNERS = {
+    'naive': lambda supplier: [naive_export(supplier)],
+    'iter_products_yaml': iter_products_yaml,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Измеряет скорость экспорта товаров в YAML: время, количество SQL запросов "
+        "и пиковый объем памяти Python, и проверяет, что результаты совпадают"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--goods', type=int, nargs='+', default=[1000, 10000],
+                            help="количество товаров поставщика")
+        parser.add_argument('--categories', type=int, default=10, help="количество категорий")
+        parser.add_argument('--runners', nargs='+', choices=list(RUNNERS), default=list(RUNNERS),
+                            help="измеряемые функции экспорта")
+
+    def handle(self, *args, **options):
+        header = f"{'функция':<20} {'товаров':>8} {'время, с':>9} {'товаров/с':>10} {'запросов':>9} {'память, МБ':>11}"
+        self.stdout.write(header)
+
+        for goods in options['goods']:
+            outputs = {}
+            # Товары создаются в транзакции, которая откатывается после замеров
+            with transaction.atomic():
+                supplier = self._create_supplier(goods, options['categories'])
+                for runner in options['runners']:
+                    elapsed, queries, output = self._measure(RUNNERS[runner], supplier)
+                    peak = self._measure_memory(RUNNERS[runner], supplier)
+                    outputs[runner] = output
+                    self.stdout.write(
+                        f"{runner:<20} {goods:>8} {elapsed:>9.2f} {goods / elapsed:>10.0f} "
+                        f"{queries:>9} {peak / 1024 / 1024:>11.1f}"
+                    )
+                transaction.set_rollback(True)
+
+            if len(set(outputs.values())) > 1:
+                raise CommandError(f"Результаты экспорта {goods} товаров различаются")
+
+    def _create_supplier(self, goods, categories):
+        user = get_user_model().objects.create(
+            username=f'benchmark-{uuid.uuid4().hex[:12]}', user_type='supplier', company_name='Тестовый магазин'
+        )
+        supplier, _ = Supplier.objects.get_or_create(user=user)
+        importer = ProductImporter(supplier, chunk_size=5000)
+        importer.import_price_list(
+            [('categories', category) for category in generate_categories(categories)]
+            + [('goods', item) for item in generate_goods(goods, categories, seed=uuid.uuid4().int)]
+        )
+        return supplier
+
+    def _measure(self, export, supplier):
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        # Объект поставщика загружается заново, чтобы не переиспользовать кэш связей
+        supplier = Supplier.objects.get(pk=supplier.pk)
+        with connection.execute_wrapper(count_queries):
+            start = time.perf_counter()
+            output = ''.join(export(supplier))
+            elapsed = time.perf_counter() - start
+        return elapsed, queries, output
+
+    def _measure_memory(self, export, supplier):
+        supplier = Supplier.objects.get(pk=supplier.pk)
+        tracemalloc.start()
+        try:
+            # Части отбрасываются сразу, как при отправке клиенту
+            for _chunk in export(supplier):
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import uuid
+
+from shop.models import Supplier
+from shop.price_list_generator import write_price_list
+from shop.simple_import import simple_import_from_yaml
+from shop.tasks import do_import
+from shop.utils import import_products_from_yaml
+
+# Функции импорта, производительность которых измеряется
+RUNNERS = {
+    'do_import': lambda supplier, path, chunk_size: do_import(supplier.id, filename=path, chunk_size=chunk_size),
+    'import_products_from_yaml': lambda supplier, path, chunk_size: import_products_from_yaml(supplier, filename=path),
+    'simple_import_from_yaml': lambda supplier, path, chunk_size: simple_import_from_yaml(supplier.user, filename=path),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Измеряет скорость импорта сгенерированных прайс-листов: товаров в секунду, "
+        "количество SQL запросов и пиковое потребление памяти"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--goods', type=int, nargs='+', default=[1000, 10000],
+                            help="размеры прайс-листов")
+        parser.add_argument('--categories', type=int, default=10, help="количество категорий")
+        parser.add_argument('--runners', nargs='+', choices=list(RUNNERS), default=list(RUNNERS),
+                            help="измеряемые функции импорта")
+        parser.add_argument('--passes', type=int, default=2,
+                            help="количество импортов подряд (первый создает товары, следующие обновляют)")
+        parser.add_argument('--duplicates', type=float, default=0.0,
+                            help="доля строк, повторяющих SKU одного из предыдущих товаров")
+        parser.add_argument('--chunk-size', type=int, default=None, help="размер части для do_import")
+
+    def handle(self, *args, **options):
+        header = f"{'функция':<26} {'товаров':>8} {'проход':>6} {'время, с':>9} {'товаров/с':>10} {'запросов':>9} {'RSS, МБ':>8}"
+        self.stdout.write(header)
+
+        with tempfile.TemporaryDirectory() as directory:
+            for goods in options['goods']:
+                path = os.path.join(directory, f'price_{goods}.yaml')
+                with open(path, 'w', encoding='utf-8') as f:
+                    write_price_list(f, goods, options['categories'], duplicates=options['duplicates'])
+
+                for runner in options['runners']:
+                    for number, (elapsed, queries, rss) in enumerate(self._run(runner, path, options), 1):
+                        self.stdout.write(
+                            f"{runner:<26} {goods:>8} {number:>6} {elapsed:>9.2f} "
+                            f"{goods / elapsed:>10.0f} {queries:>9} {rss / 1024:>8.1f}"
+                        )
+
+    def _run(self, runner, path, options):
+        """
+        Запускает импорт в отдельном процессе, чтобы измерить его пиковую память
+        """
+        # Дочерний процесс не должен использовать соединение родителя
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_measure, args=(sender, runner, path, options))
+        process.start()
+        result = receiver.recv()
+        process.join()
+
+        if isinstance(result, str):
+            raise CommandError(f"{runner}: {result}")
+        return result
+
+
+def _measure(sender, runner, path, options):
+    """
+    Выполняет импорт несколько раз подряд и отправляет замеры родителю
+
+    Все изменения откатываются, поэтому база данных остается прежней.
+    """
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    try:
+        results = []
+        with transaction.atomic():
+            user = get_user_model().objects.create(username=f'benchmark-{uuid.uuid4().hex[:12]}', user_type='supplier')
+            supplier, _ = Supplier.objects.get_or_create(user=user)
+
+            with connection.execute_wrapper(count_queries):
+                for _ in range(options['passes']):
+                    queries = 0
+                    start = time.perf_counter()
+                    result = RUNNERS[runner](supplier, path, options['chunk_size'])
+                    elapsed = time.perf_counter() - start
+                    if isinstance(result, dict) and 'error' in result:
+                        raise CommandError(result['error'])
+                    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                    results.append((elapsed, queries, rss))
+
+            transaction.set_rollback(True)
+        sender.send(results)
+    except Exception as e:
+        sender.send(str(e))
+    finally:
+        connection.close()
+        sender.close()
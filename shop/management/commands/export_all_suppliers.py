@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import os
+
+from shop.export_snapshot import MANIFEST_NAME, export_all_suppliers, snapshot_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает каталоги всех поставщиков в YAML файлы параллельно в пуле процессов "
+        "и записывает манифест с количеством товаров, размером файлов и временем выгрузки"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None,
+                            help="директория выгрузки (по умолчанию новая директория в EXPORT_SNAPSHOT_DIR)")
+        parser.add_argument('--workers', type=int, default=settings.EXPORT_WORKERS,
+                            help="количество параллельных процессов")
+        parser.add_argument('--suppliers', type=int, nargs='+', default=None,
+                            help="ID поставщиков (по умолчанию все)")
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers должно быть положительным числом")
+
+        output_dir = options['output_dir'] or snapshot_dir()
+        manifest = export_all_suppliers(output_dir, options['suppliers'], options['workers'])
+
+        header = f"{'поставщик':>9} {'товаров':>8} {'размер, КБ':>11} {'время, с':>9}"
+        self.stdout.write(header)
+        for entry in manifest['files']:
+            if 'error' in entry:
+                self.stdout.write(f"{entry['supplier_id']:>9} ошибка: {entry['error']}")
+                continue
+            self.stdout.write(
+                f"{entry['supplier_id']:>9} {entry['rows']:>8} {entry['size'] / 1024:>11.1f} {entry['seconds']:>9.2f}"
+            )
+
+        self.stdout.write(
+            f"Выгружено поставщиков: {manifest['suppliers'] - manifest['errors']} из {manifest['suppliers']}, "
+            f"товаров: {manifest['rows']}, время: {manifest['seconds']:.2f} с"
+        )
+        self.stdout.write(f"Манифест: {os.path.join(output_dir, MANIFEST_NAME)}")
+
+        if manifest['errors']:
+            raise CommandError(f"Не удалось выгрузить поставщиков: {manifest['errors']}")
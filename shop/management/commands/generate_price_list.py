@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from shop.price_list_generator import write_price_list
+
+
+class Command(BaseCommand):
+    help = "Генерирует прайс-лист в формате shop1.yaml для проверки производительности импорта"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="путь к создаваемому YAML файлу")
+        parser.add_argument('--goods', type=int, default=10000, help="количество товаров")
+        parser.add_argument('--categories', type=int, default=10, help="количество категорий")
+        parser.add_argument('--seed', type=int, default=0, help="начальное значение генератора")
+        parser.add_argument('--duplicates', type=float, default=0.0,
+                            help="доля строк, повторяющих SKU одного из предыдущих товаров")
+        parser.add_argument('--changed', type=float, default=0.0,
+                            help="доля товаров, цена и остаток которых меняются между версиями")
+        parser.add_argument('--revision', type=int, default=0, help="номер версии прайс-листа")
+
+    def handle(self, *args, **options):
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            written = write_price_list(
+                f, options['goods'], options['categories'],
+                seed=options['seed'], duplicates=options['duplicates'],
+                changed=options['changed'], revision=options['revision']
+            )
+        self.stdout.write(self.style.SUCCESS(f"Записано {written} товаров в {options['output']}"))
@@ -0,0 +1,17 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_rename_shop_cartitem_user_product_idx_shop_cartit_user_id_9f8c61_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Отпечаток данных товара из последнего импорта',
+                                   max_length=32, null=True, verbose_name='Отпечаток импорта'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_categories(apps, schema_editor):
+    """
+    Переносит товары дублирующихся категорий в категорию с наименьшим ID
+    и удаляет дубликаты перед добавлением уникального индекса
+    """
+    Category = apps.get_model('shop', 'Category')
+    Product = apps.get_model('shop', 'Product')
+
+    duplicates = (
+        Category.objects.values('name')
+        .annotate(keep_id=Min('id'), count=Count('id'))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        extra = Category.objects.filter(name=duplicate['name']).exclude(id=duplicate['keep_id'])
+        Product.objects.filter(category__in=extra).update(category_id=duplicate['keep_id'], import_hash=None)
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_product_import_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_categories, migrations.RunPython.noop),
+    ]
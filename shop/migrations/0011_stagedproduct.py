@@ -0,0 +1,44 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_unlogged(apps, schema_editor):
+    """
+    Таблица загрузки временная, поэтому в PostgreSQL ее не нужно писать в WAL
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE shop_stagedproduct SET UNLOGGED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_category_name_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StagedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_id', models.CharField(max_length=64, verbose_name='ID импорта')),
+                ('row', models.PositiveIntegerField(null=True, verbose_name='Строка прайс-листа')),
+                ('sku', models.CharField(blank=True, max_length=100, null=True, verbose_name='Артикул')),
+                ('name', models.CharField(max_length=200, verbose_name='Наименование')),
+                ('description', models.TextField(verbose_name='Описание')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена')),
+                ('stock', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('characteristics', models.JSONField(blank=True, default=dict, null=True, verbose_name='Характеристики')),
+                ('import_hash', models.CharField(blank=True, max_length=32, null=True, verbose_name='Отпечаток импорта')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shop.category', verbose_name='Категория')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.supplier', verbose_name='Поставщик')),
+            ],
+            options={
+                'verbose_name': 'Загружаемый товар',
+                'verbose_name_plural': 'Загружаемые товары',
+                'indexes': [models.Index(fields=['run_id', 'sku'], name='shop_staged_run_id_7f2bf1_idx')],
+            },
+        ),
+        migrations.RunPython(set_unlogged, migrations.RunPython.noop),
+    ]
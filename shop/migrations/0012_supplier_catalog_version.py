@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0011_stagedproduct'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supplier',
+            name='catalog_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Увеличивается при каждой записи товаров поставщика', verbose_name='Версия каталога'),
+        ),
+    ]
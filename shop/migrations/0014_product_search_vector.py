@@ -0,0 +1,64 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce({row}name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce({row}description, '')), 'B')"
+)
+
+
+def create_search_trigger(apps, schema_editor):
+    """
+    Поисковый вектор заполняет триггер, поэтому он актуален при любой записи:
+    save(), bulk_create импорта и SQL запросах замены каталога
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE FUNCTION shop_product_search_vector() RETURNS trigger AS $$ "
+        "BEGIN NEW.search_vector := " + SEARCH_VECTOR_SQL.format(row='NEW.') + "; RETURN NEW; END "
+        "$$ LANGUAGE plpgsql"
+    )
+    schema_editor.execute(
+        "CREATE TRIGGER shop_product_search_vector_insert BEFORE INSERT ON shop_product "
+        "FOR EACH ROW EXECUTE FUNCTION shop_product_search_vector()"
+    )
+    # Изменение остатка или цены не пересчитывает вектор
+    schema_editor.execute(
+        "CREATE TRIGGER shop_product_search_vector_update BEFORE UPDATE ON shop_product "
+        "FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name "
+        "OR OLD.description IS DISTINCT FROM NEW.description "
+        "OR NEW.search_vector IS NULL) "
+        "EXECUTE FUNCTION shop_product_search_vector()"
+    )
+    schema_editor.execute("UPDATE shop_product SET search_vector = " + SEARCH_VECTOR_SQL.format(row=''))
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP TRIGGER IF EXISTS shop_product_search_vector_update ON shop_product")
+    schema_editor.execute("DROP TRIGGER IF EXISTS shop_product_search_vector_insert ON shop_product")
+    schema_editor.execute("DROP FUNCTION IF EXISTS shop_product_search_vector()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0013_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        # Вектор заполняется до построения индекса, так индекс строится один раз
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='shop_product_search_gin'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+TRIGRAM_INDEX = 'shop_product_name_trgm'
+
+
+def create_trigram_index(apps, schema_editor):
+    """
+    Создает расширение pg_trgm и GIN индекс триграмм названия товара
+
+    Если расширение недоступно на сервере, индекс не создается,
+    а нечеткий поиск выполняется как полнотекстовый. Поэтому индекса
+    нет в состоянии миграций и в Product.Meta.indexes: иначе состояние
+    описывало бы индекс, которого нет в базе данных.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON shop_product USING gin (name gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0014_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
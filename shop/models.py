@@ -1,6 +1,12 @@
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import AbstractUser
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import uuid
 
 
 class User(AbstractUser):
@@ -27,28 +33,150 @@ class Supplier(models.Model):
     )
     description = models.TextField(blank=True, null=True, verbose_name="Описание")
     logo = models.ImageField(upload_to='suppliers/', blank=True, null=True, verbose_name="Логотип")
+    catalog_version = models.PositiveBigIntegerField(
+        default=0, editable=False,
+        help_text="Увеличивается при каждой записи товаров поставщика",
+        verbose_name="Версия каталога"
+    )
 
     def __str__(self):
         return self.user.company_name or self.user.username
 
+    @classmethod
+    def bump_catalog_version(cls, *supplier_ids: int) -> None:
+        """
+        Увеличивает версию каталога поставщиков
+
+        Версия служит ключом кэша экспорта, поэтому ее нужно увеличивать
+        при любой записи товаров. Запрос выполняется после фиксации
+        транзакции: строка поставщика не блокируется до конца импорта
+        или оформления заказа, а экспорт, запущенный до фиксации,
+        не сохранит старые данные под новой версией.
+
+        Args:
+            supplier_ids: ID поставщиков, товары которых изменились
+        """
+        supplier_ids = {supplier_id for supplier_id in supplier_ids if supplier_id}
+        if supplier_ids:
+            transaction.on_commit(
+                lambda: cls.objects.filter(pk__in=supplier_ids).update(catalog_version=models.F('catalog_version') + 1)
+            )
+
     class Meta:
         verbose_name = "Поставщик"
         verbose_name_plural = "Поставщики"
         ordering = ['user__company_name', 'user__username']
 
 
+# Конфигурация полнотекстового поиска PostgreSQL для названий и описаний товаров
+SEARCH_CONFIG = 'russian'
+
+# Кэш соответствия названий категорий их ID в пределах процесса
+_category_ids: Dict[str, int] = {}
+CATEGORY_CACHE_SIZE = 10000
+# Версия категорий в общем кэше Django: меняется при любом изменении
+# или удалении категории, и кэши процессов с другой версией сбрасываются
+CATEGORY_VERSION_KEY = 'category_ids_version'
+_category_ids_version: Optional[str] = None
+
+
 class Category(models.Model):
-    name = models.CharField(max_length=100, verbose_name="Название")
+    name = models.CharField(max_length=100, unique=True, verbose_name="Название")
 
     def __str__(self):
         return self.name
 
+    def _supplier_ids(self) -> List[int]:
+        return list(Product.objects.filter(category=self).values_list('supplier_id', flat=True).distinct())
+
+    @classmethod
+    def resolve_ids(cls, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Возвращает ID категорий по названиям, создавая недостающие
+
+        Известные названия берутся из кэша процесса, остальные находятся
+        одним запросом, а отсутствующие создаются одним
+        INSERT ... ON CONFLICT DO NOTHING, поэтому параллельные импорты
+        не создают дубликатов. Кэш процесса сбрасывается, если категории
+        изменили или удалили в другом процессе (см. CATEGORY_VERSION_KEY).
+
+        Args:
+            names: названия категорий
+
+        Returns:
+            dict: {название: ID категории}
+        """
+        _sync_category_ids()
+        names = set(names)
+        ids = {name: _category_ids[name] for name in names if name in _category_ids}
+        missing = names - ids.keys()
+        if not missing:
+            return ids
+
+        found = dict(cls.objects.filter(name__in=missing).values_list('name', 'id'))
+        new_names = missing - found.keys()
+        if new_names:
+            cls.objects.bulk_create([cls(name=name) for name in new_names], ignore_conflicts=True)
+            found.update(cls.objects.filter(name__in=new_names).values_list('name', 'id'))
+
+        # Кэшируем только зафиксированные категории, иначе после отката
+        # транзакции в кэше останутся ID несуществующих строк
+        transaction.on_commit(lambda: cls._remember_ids(found))
+        ids.update(found)
+        return ids
+
+    @staticmethod
+    def _remember_ids(ids: Dict[str, int]) -> None:
+        if len(_category_ids) + len(ids) > CATEGORY_CACHE_SIZE:
+            _category_ids.clear()
+        _category_ids.update(ids)
+
     class Meta:
         verbose_name = "Категория"
         verbose_name_plural = "Категории"
         ordering = ['name']
 
 
+def _sync_category_ids() -> None:
+    global _category_ids_version
+    version = cache.get(CATEGORY_VERSION_KEY)
+    if version != _category_ids_version:
+        _category_ids.clear()
+        _category_ids_version = version
+
+
+def _bump_category_ids_version() -> None:
+    cache.set(CATEGORY_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    """
+    Сбрасывает кэши названий категорий при изменении или удалении категории
+
+    Сигналы отправляются и при удалении через QuerySet, в том числе
+    каскадном и из админки. Кэш этого процесса сбрасывается сразу,
+    а остальных процессов - после фиксации транзакции.
+    """
+    _category_ids.clear()
+    transaction.on_commit(_bump_category_ids_version)
+
+
+@receiver(post_save, sender=Category)
+def category_renamed(sender, instance, created, **kwargs):
+    # Название категории входит в экспорт ее товаров
+    if not created:
+        Supplier.bump_catalog_version(*instance._supplier_ids())
+
+
+@receiver(pre_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # После удаления у товаров уже не будет ссылки на категорию,
+    # поэтому поставщиков находим до удаления
+    Supplier.bump_catalog_version(*instance._supplier_ids())
+
+
 class Product(models.Model):
     name = models.CharField(max_length=200, db_index=True, verbose_name="Наименование")
     description = models.TextField(verbose_name="Описание")
@@ -69,14 +197,38 @@ class Product(models.Model):
         db_index=True, verbose_name="Артикул"
     )
     characteristics = models.JSONField(blank=True, null=True, default=dict, verbose_name="Характеристики")
+    import_hash = models.CharField(
+        max_length=32, blank=True, null=True, editable=False,
+        help_text="Отпечаток данных товара из последнего импорта",
+        verbose_name="Отпечаток импорта"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    # Заполняется триггером базы данных из name (вес A) и description (вес B),
+    # поэтому остается актуальным при save(), пакетном импорте и SQL запросах
+    search_vector = SearchVectorField(null=True, editable=False, verbose_name="Поисковый вектор")
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Товар изменен не импортом, поэтому следующий
+        # инкрементальный импорт должен перезаписать его
+        self.import_hash = None
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
         ordering = ['name']
+        indexes = [
+            # Выгрузка изменений поставщика с заданного момента (?since=)
+            models.Index(fields=['supplier', 'updated_at']),
+            GinIndex(fields=['search_vector'], name='shop_product_search_gin'),
+            # GIN индекс триграмм названия для нечеткого поиска создает миграция
+            # 0015, только если в базе данных доступно расширение pg_trgm
+            # Фильтры по характеристикам (@>)
+            GinIndex(fields=['characteristics'], name='shop_product_chars_gin', opclasses=['jsonb_path_ops']),
+        ]
 
     def to_dict(self) -> Dict[str, Any]:
         """Преобразует объект товара в словарь для экспорта"""
@@ -94,34 +246,96 @@ class Product(models.Model):
     @classmethod
     def from_dict(cls, data: Dict[str, Any], supplier: 'Supplier') -> 'Product':
         """Создает или обновляет товар из словаря"""
-        category, _ = Category.objects.get_or_create(name=data.get('category', 'Без категории'))
-
-        # Ищем товар по SKU или создаем новый
-        if data.get('sku'):
-            product, created = cls.objects.update_or_create(
-                sku=data['sku'],
-                defaults={
-                    'name': data['name'],
-                    'description': data.get('description', ''),
-                    'price': data['price'],
-                    'supplier': supplier,
-                    'category': category,
-                    'stock': data.get('stock', 0),
-                    'is_active': data.get('is_active', True)
-                }
-            )
-        else:
-            product = cls.objects.create(
-                name=data['name'],
-                description=data.get('description', ''),
-                price=data['price'],
-                supplier=supplier,
-                category=category,
-                stock=data.get('stock', 0),
-                is_active=data.get('is_active', True)
-            )
+        if not data.get('sku'):
+            cat_name = data.get('category', 'Без категории')
+            category_id = Category.resolve_ids([cat_name])[cat_name]
+            return cls.objects.create(supplier=supplier, category_id=category_id, **cls._fields_from_dict(data))
+
+        # Ошибку записи товара пробрасываем, как при обычном сохранении
+        importer = cls._import_dicts([data], supplier)
+        if importer.last_error is not None:
+            raise importer.last_error
+        return cls.objects.get(sku=data['sku'])
+
+    @classmethod
+    def from_dicts(cls, data_list: List[Dict[str, Any]], supplier: 'Supplier') -> Tuple[int, int]:
+        """
+        Создает или обновляет товары из списка словарей пакетной записью
+
+        Returns:
+            tuple: (количество созданных товаров, количество обновленных товаров)
+        """
+        importer = cls._import_dicts(data_list, supplier)
+        return importer.created, importer.updated
+
+    @classmethod
+    def _import_dicts(cls, data_list: List[Dict[str, Any]], supplier: 'Supplier') -> Any:
+        from .import_engine import ProductImporter, UPDATE_FIELDS
+
+        # Характеристики в этом формате не передаются, поэтому не затираем их
+        update_fields = [field for field in UPDATE_FIELDS if field != 'characteristics']
+
+        category_ids = Category.resolve_ids(data.get('category', 'Без категории') for data in data_list)
+        importer = ProductImporter(supplier, update_fields=update_fields)
+        for data in data_list:
+            cat_name = data.get('category', 'Без категории')
+            fields = cls._fields_from_dict(data)
+            fields['sku'] = data.get('sku') or None
+            fields['category'] = Category(pk=category_ids[cat_name], name=cat_name)
+            importer.add(fields)
+        importer.flush()
+        return importer
+
+    @staticmethod
+    def _fields_from_dict(data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'name': data['name'],
+            'description': data.get('description', ''),
+            'price': data['price'],
+            'stock': data.get('stock', 0),
+            'is_active': data.get('is_active', True)
+        }
 
-        return product
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    """
+    Увеличивает версию каталога поставщика при изменении или удалении товара
+
+    Сигналы отправляются и при удалении через QuerySet, в том числе
+    каскадном и из админки. Пакетная запись импорта сигналов
+    не отправляет и увеличивает версию сама.
+    """
+    Supplier.bump_catalog_version(instance.supplier_id)
+
+
+class StagedProduct(models.Model):
+    """
+    Товар прайс-листа, загруженный для замены каталога (режим импорта replace)
+
+    Строки одного импорта (run_id) переносятся в Product одним
+    запросом в короткой транзакции и удаляются.
+    """
+    run_id = models.CharField(max_length=64, verbose_name="ID импорта")
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='+', verbose_name="Поставщик")
+    row = models.PositiveIntegerField(null=True, verbose_name="Строка прайс-листа")
+    sku = models.CharField(max_length=100, blank=True, null=True, verbose_name="Артикул")
+    name = models.CharField(max_length=200, verbose_name="Наименование")
+    description = models.TextField(verbose_name="Описание")
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена")
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, related_name='+', verbose_name="Категория"
+    )
+    stock = models.PositiveIntegerField(default=0, verbose_name="Количество")
+    is_active = models.BooleanField(default=True, verbose_name="Активен")
+    characteristics = models.JSONField(blank=True, null=True, default=dict, verbose_name="Характеристики")
+    import_hash = models.CharField(max_length=32, blank=True, null=True, verbose_name="Отпечаток импорта")
+
+    class Meta:
+        verbose_name = "Загружаемый товар"
+        verbose_name_plural = "Загружаемые товары"
+        indexes = [models.Index(fields=['run_id', 'sku'])]
 
 
 class DeliveryAddress(models.Model):
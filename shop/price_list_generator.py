@@ -0,0 +1,126 @@
+from typing import Any, Dict, IO, Iterator, List
+import random
+
+from .yaml_backend import safe_dump
+
+# Модели товаров: (бренд, модель, тип, диагональ, разрешение)
+MODELS = [
+    ('Apple', 'iPhone XS Max', 'Смартфон', 6.5, '2688x1242'),
+    ('Apple', 'iPhone XR', 'Смартфон', 6.1, '1792x828'),
+    ('Samsung', 'Galaxy S10', 'Смартфон', 6.1, '3040x1440'),
+    ('Xiaomi', 'Redmi Note 8', 'Смартфон', 6.3, '2340x1080'),
+    ('LG', 'OLED55C9', 'Телевизор', 55, '3840x2160'),
+    ('Sony', 'KD-49XG8096', 'Телевизор', 49, '3840x2160'),
+]
+MEMORY = [32, 64, 128, 256, 512]
+COLORS = ['черный', 'белый', 'золотистый', 'красный', 'синий', 'серебристый']
+
+
+def generate_categories(count: int) -> List[Dict[str, Any]]:
+    """
+    Генерирует раздел categories
+    """
+    return [{'id': i, 'name': f'Категория {i}'} for i in range(1, count + 1)]
+
+
+def generate_goods(count: int, categories_count: int, seed: int = 0, duplicates: float = 0.0,
+                   changed: float = 0.0, revision: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Генерирует товары в формате раздела goods из shop1.yaml
+
+    Данные товара зависят только от его номера, поэтому прайс-листы
+    с одинаковыми параметрами содержат одни и те же SKU и при повторном
+    импорте обновляют существующие товары.
+
+    Args:
+        count: количество товаров
+        categories_count: количество категорий
+        seed: начальное значение генератора случайных чисел
+        duplicates: доля строк, повторяющих SKU одного из предыдущих товаров
+        changed: доля товаров, цена и остаток которых зависят от revision
+        revision: номер версии прайс-листа
+
+    Yields:
+        dict: товар
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        number = rng.randrange(i) if i and rng.random() < duplicates else i
+        item_rng = random.Random(f'{seed}:{number}')
+
+        brand, model, kind, diagonal, resolution = item_rng.choice(MODELS)
+        memory = item_rng.choice(MEMORY)
+        color = item_rng.choice(COLORS)
+        price = item_rng.randrange(5000, 150000, 100)
+        quantity = item_rng.randrange(0, 50)
+        if revision and item_rng.random() < changed:
+            price += revision * 100
+            quantity = (quantity + revision) % 50
+
+        yield {
+            'id': 1000000 + number,
+            'category': number % categories_count + 1 if categories_count else None,
+            'model': f'{brand}/{model}'.lower().replace(' ', '-'),
+            'name': f'{kind} {brand} {model} {memory}GB ({color})',
+            'price': price,
+            'price_rrc': price + price // 10,
+            'quantity': quantity,
+            'parameters': {
+                'Диагональ (дюйм)': diagonal,
+                'Разрешение (пикс)': resolution,
+                'Встроенная память (Гб)': memory,
+                'Цвет': color,
+            },
+        }
+
+
+def generate_price_list(goods: int, categories: int = 10, **kwargs: Any) -> Dict[str, Any]:
+    """
+    Генерирует прайс-лист целиком в памяти
+
+    Args:
+        goods: количество товаров
+        categories: количество категорий
+        kwargs: параметры generate_goods
+
+    Returns:
+        dict: прайс-лист с разделами shop, categories и goods
+    """
+    return {
+        'shop': 'Тестовый магазин',
+        'categories': generate_categories(categories),
+        'goods': list(generate_goods(goods, categories, **kwargs)),
+    }
+
+
+def write_price_list(stream: IO, goods: int, categories: int = 10, **kwargs: Any) -> int:
+    """
+    Потоково записывает прайс-лист в открытый текстовый файл
+
+    Товары выгружаются по одному, поэтому память не зависит от их количества.
+
+    Args:
+        stream: файл, открытый на запись
+        goods: количество товаров
+        categories: количество категорий
+        kwargs: параметры generate_goods
+
+    Returns:
+        int: количество записанных товаров
+    """
+    stream.write(safe_dump({'shop': 'Тестовый магазин'}, allow_unicode=True))
+    stream.write('categories:\n')
+    for category in generate_categories(categories):
+        _write_item(stream, category)
+
+    stream.write('goods:\n')
+    written = 0
+    for item in generate_goods(goods, categories, **kwargs):
+        _write_item(stream, item)
+        written += 1
+    return written
+
+
+def _write_item(stream: IO, item: Dict[str, Any]) -> None:
+    text = safe_dump([item], allow_unicode=True, sort_keys=False)
+    stream.write(''.join(f'  {line}' for line in text.splitlines(keepends=True)))
@@ -0,0 +1,112 @@
+from contextlib import contextmanager
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections, transaction
+from django.db.models import F, QuerySet
+from typing import Dict, Iterator
+from .models import SEARCH_CONFIG
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Режимы поиска товаров: полнотекстовый и нечеткий (с опечатками)
+SEARCH_MODE_FULLTEXT = 'fulltext'
+SEARCH_MODE_FUZZY = 'fuzzy'
+
+# Наличие расширения pg_trgm по соединениям с базой данных
+_trigram_available: Dict[str, bool] = {}
+
+
+def trigram_available(using: str = 'default') -> bool:
+    """
+    Проверяет, установлено ли в базе данных расширение pg_trgm
+
+    Результат запоминается на время жизни процесса.
+
+    Args:
+        using: алиас соединения с базой данных
+
+    Returns:
+        bool: True, если нечеткий поиск по триграммам доступен
+    """
+    if using not in _trigram_available:
+        connection = connections[using]
+        available = False
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                available = cursor.fetchone() is not None
+        _trigram_available[using] = available
+    return _trigram_available[using]
+
+
+def full_text_search(queryset: QuerySet, search: str) -> QuerySet:
+    """
+    Полнотекстовый поиск товаров по названию и описанию
+
+    Выполняется по GIN индексу поискового вектора, поддерживает
+    синтаксис веб-поиска. Совпадения в названии важнее совпадений в описании.
+
+    Args:
+        queryset: QuerySet товаров
+        search: поисковый запрос
+
+    Returns:
+        QuerySet: найденные товары с релевантностью в поле rank
+    """
+    query = SearchQuery(search, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(search_vector=query).annotate(rank=SearchRank(F('search_vector'), query))
+
+
+def fuzzy_search(queryset: QuerySet, search: str) -> QuerySet:
+    """
+    Нечеткий поиск товаров по названию с учетом опечаток
+
+    Товар подходит, если сходство запроса по триграммам с каким-либо
+    фрагментом названия не меньше settings.SEARCH_FUZZY_THRESHOLD.
+    Отбор выполняется оператором %> по GIN индексу триграмм названия,
+    а порог оператора задает fuzzy_search_threshold, внутри которого
+    нужно выполнять запрос. Вне его действует порог pg_trgm по умолчанию
+    (0.6), а условие на сходство не пропускает товары ниже
+    SEARCH_FUZZY_THRESHOLD при любом пороге оператора. Если расширение
+    pg_trgm не установлено, выполняется полнотекстовый поиск.
+
+    Args:
+        queryset: QuerySet товаров
+        search: поисковый запрос
+
+    Returns:
+        QuerySet: найденные товары со сходством с запросом в поле rank
+    """
+    if not trigram_available(queryset.db):
+        logger.warning("pg_trgm extension is not installed, falling back to full-text search")
+        return full_text_search(queryset, search)
+
+    return (
+        queryset
+        .filter(name__trigram_word_similar=search)
+        .annotate(rank=TrigramWordSimilarity(search, 'name'))
+        .filter(rank__gte=settings.SEARCH_FUZZY_THRESHOLD)
+    )
+
+
+@contextmanager
+def fuzzy_search_threshold(using: str = 'default') -> Iterator[None]:
+    """
+    Транзакция, в которой оператор %> использует порог SEARCH_FUZZY_THRESHOLD
+
+    Порог задается параметром pg_trgm.word_similarity_threshold только
+    для этой транзакции (SET LOCAL), поэтому не остается в соединении,
+    которое затем используют другие запросы.
+
+    Args:
+        using: алиас соединения с базой данных
+    """
+    with transaction.atomic(using=using):
+        if trigram_available(using):
+            with connections[using].cursor() as cursor:
+                cursor.execute(
+                    "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                    [str(settings.SEARCH_FUZZY_THRESHOLD)]
+                )
+        yield
@@ -2,11 +2,14 @@ import yaml
 import os
 from django.conf import settings
 from .models import Product, Category, Supplier
+from .yaml_stream import iter_price_list
 
 
-def simple_import_from_yaml(supplier_user):
+def simple_import_from_yaml(supplier_user, filename=None):
     """
     Простая функция для импорта товаров из YAML файла
+
+    По умолчанию читает shop1.yaml из корня проекта.
     """
     # Получаем профиль поставщика
     try:
@@ -15,47 +18,64 @@ def simple_import_from_yaml(supplier_user):
         return {"error": "Профиль поставщика не найден"}
 
     # Путь к файлу shop1.yaml
-    yaml_file = os.path.join(settings.BASE_DIR, 'shop1.yaml')
+    yaml_file = filename or os.path.join(settings.BASE_DIR, 'shop1.yaml')
 
     if not os.path.exists(yaml_file):
         return {"error": f"Файл {yaml_file} не найден"}
 
-    # Чтение файла
+    # Потоковое чтение и импорт товаров
+    keys = set()
     try:
         with open(yaml_file, 'r', encoding='utf-8') as f:
-            yaml_content = f.read()
-    except Exception as e:
+            created_count, updated_count, errors = _import_entries(supplier, iter_price_list(f, keys=keys))
+    except OSError as e:
         return {"error": f"Ошибка чтения файла: {str(e)}"}
-
-    # Парсинг YAML
-    try:
-        data = yaml.safe_load(yaml_content)
-    except Exception as e:
+    except yaml.YAMLError as e:
         return {"error": f"Ошибка парсинга YAML: {str(e)}"}
 
-    # Проверка структуры данных
-    if not isinstance(data, dict) or 'goods' not in data:
+    # Проверка структуры данных: пустой раздел goods допустим
+    if 'goods' not in keys:
         return {"error": "Неверный формат YAML файла"}
 
-    # Создание категорий
+    result = {
+        "created": created_count,
+        "updated": updated_count,
+        "message": (
+            f"Импортировано товаров: {created_count} создано, "
+            f"{updated_count} обновлено"
+        )
+    }
+
+    if errors:
+        result["errors"] = errors
+
+    return result
+
+
+def _import_entries(supplier, entries):
+    """
+    Создает категории и товары из потока (раздел, элемент) прайс-листа
+    """
     categories = {}
-    if 'categories' in data:
-        for cat_data in data['categories']:
+    created_count = 0
+    updated_count = 0
+    errors = []
+
+    for section, item in entries:
+        if section == 'categories':
+            # Создание категории
             try:
-                cat_name = cat_data.get('name', 'Без категории')
-                cat_id = cat_data.get('id')
+                cat_name = item.get('name', 'Без категории')
+                cat_id = item.get('id')
                 if cat_id is not None and cat_name:
-                    category, _ = Category.objects.get_or_create(name=cat_name)
-                    categories[cat_id] = category
+                    categories[cat_id] = Category(pk=Category.resolve_ids([cat_name])[cat_name], name=cat_name)
             except Exception as e:
                 print(f"Ошибка при создании категории: {str(e)}")
+            continue
 
-    # Импорт товаров
-    created_count = 0
-    updated_count = 0
-    errors = []
+        if section != 'goods':
+            continue
 
-    for item in data['goods']:
         try:
             # Получаем основные данные
             name = item.get('name')
@@ -104,16 +124,4 @@ def simple_import_from_yaml(supplier_user):
         except Exception as e:
             errors.append(f"Ошибка при импорте товара {item.get('name', 'Unknown')}: {str(e)}")
 
-    result = {
-        "created": created_count,
-        "updated": updated_count,
-        "message": (
-            f"Импортировано товаров: {created_count} создано, "
-            f"{updated_count} обновлено"
-        )
-    }
-
-    if errors:
-        result["errors"] = errors
-
-    return result
+    return created_count, updated_count, errors
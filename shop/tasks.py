@@ -1,10 +1,13 @@
-from celery import shared_task
+from celery import shared_task, chord
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
-from typing import Dict, Any, List, Optional
-import yaml
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import glob
+import itertools
 import logging
+import os
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -149,134 +152,534 @@ def send_supplier_order_notification(order_id: int) -> bool:
         return False
 
 
-@shared_task
-def do_import(supplier_id: int, yaml_data: Optional[str] = None, filename: Optional[str] = None) -> Dict[str, Any]:
+@shared_task(bind=True)
+def do_import(self, supplier_id: int, yaml_data: Optional[str] = None, filename: Optional[str] = None,
+              chunk_size: Optional[int] = None, incremental: bool = False,
+              mode: str = 'update', dry_run: bool = False,
+              feed_format: Optional[str] = None) -> Dict[str, Any]:
     """
-    Импортирует товары из YAML файла или строки
+    Импортирует товары из файла или строки в формате YAML, CSV или JSON Lines
+
+    Категории создаются один раз до начала записи товаров. Если товаров
+    больше, чем chunk_size, они разбиваются на части, которые сохраняются
+    в JSON файлы в MEDIA_ROOT/imports/chunks и параллельно
+    импортируются задачами import_products_chunk, а итог собирает
+    finalize_import. Результат этой задачи подменяется результатом
+    finalize_import, поэтому task_id остается прежним.
+
+    В инкрементальном режиме перезаписываются только товары, данные
+    которых изменились с прошлого импорта.
+
+    В режиме sync после записи товаров деактивируются товары поставщика,
+    SKU которых нет в прайс-листе (см. deactivate_missing_products).
+
+    В режиме replace товары сначала загружаются в таблицу StagedProduct
+    (StagingImporter), а после загрузки всех частей finalize_import
+    проверяет их и заменяет каталог поставщика в одной транзакции
+    (swap_staged_products). До этого покупатели видят старый каталог.
+
+    Прогресс импорта публикуется в кэш по task_id и доступен
+    через get_import_progress.
+
+    С dry_run=True прайс-лист только проверяется (validate_price_list):
+    товары не записываются, а в результате возвращается количество новых,
+    измененных, неизмененных и ошибочных товаров.
+
+    Импорты одного поставщика выполняются по очереди (SupplierImportQueue):
+    если поставщик занят, задача повторяется каждые
+    settings.IMPORT_QUEUE_RETRY_DELAY секунд и отменяется со статусом
+    superseded, если за ней поставлен более новый импорт.
 
     Args:
         supplier_id: ID поставщика
         yaml_data: строка с YAML данными (если None, читает из filename)
         filename: путь к файлу для чтения (если yaml_data=None)
+        chunk_size: количество товаров в одной подзадаче
+                    (по умолчанию settings.IMPORT_TASK_CHUNK_SIZE)
+        incremental: пропускать товары, которые не изменились
+        mode: режим импорта из IMPORT_MODES (update, sync или replace)
+        dry_run: только проверить прайс-лист, ничего не записывая
+        feed_format: формат прайс-листа из FEED_FORMATS (по умолчанию
+                     определяется по расширению filename, иначе YAML)
 
     Returns:
         dict: Результат импорта с количеством созданных
-              и обновленных товаров
+              и обновленных товаров (в инкрементальном режиме также
+              new, changed и unchanged, в режиме sync - deactivated,
+              в режиме replace - unchanged и deactivated)
     """
-    from .models import Supplier, Product, Category
-
+    from .models import Supplier
+    from .import_engine import IMPORT_MODES, iter_chunks, iter_goods
+    from .import_files import release_import_file
+    from .import_progress import ImportProgress
+    from .import_queue import SupplierImportQueue
+    from .import_staging import discard_staged_products
+    from .yaml_stream import open_price_list
+
+    chunk_size = chunk_size or settings.IMPORT_TASK_CHUNK_SIZE
+    task_id = self.request.id
+    run_id = task_id or uuid.uuid4().hex
+    replace = mode == 'replace'
+
+    if mode not in IMPORT_MODES:
+        release_import_file(filename, delete=False)
+        return _import_failed(task_id, f"Unknown import mode: {mode}")
+
+    # Проверка ничего не записывает, поэтому не ждет очереди поставщика
+    if dry_run:
+        result = _validate_import(task_id, run_id, supplier_id, yaml_data, filename, feed_format)
+        release_import_file(filename, delete="error" not in result)
+        return result
+
+    # Импорты одного поставщика выполняются по очереди
+    queue = SupplierImportQueue(supplier_id, run_id)
+    if not self.request.retries:
+        queue.submit()
+    elif queue.is_superseded():
+        logger.info(f"Import {run_id} for supplier {supplier_id} superseded by a newer import")
+        release_import_file(filename, delete=False)
+        return _import_failed(task_id, "Superseded by a newer import", status='superseded')
+
+    if not queue.acquire():
+        if self.request.called_directly or self.request.is_eager:
+            release_import_file(filename, delete=False)
+            return _import_failed(task_id, "Another import for this supplier is running")
+        if not self.request.retries:
+            ImportProgress(task_id).queue(supplier_id)
+        raise self.retry(countdown=settings.IMPORT_QUEUE_RETRY_DELAY, max_retries=None)
+
+    release_lock = True
     try:
         supplier = Supplier.objects.get(id=supplier_id)
 
-        # Получаем данные YAML
-        if yaml_data is None and filename:
-            with open(filename, 'r', encoding='utf-8') as f:
-                yaml_data = f.read()
+        progress = None
+        if task_id:
+            progress = ImportProgress(task_id, lock=queue)
+            progress.start(supplier.id)
 
-        if not yaml_data:
-            return {"error": "Необходимо указать yaml_data или filename"}
+        if replace:
+            # Строки прерванных импортов поставщика больше не нужны
+            discard_staged_products(supplier.id, keep_run_id=run_id)
 
-        data = yaml.safe_load(yaml_data)
+        # Читаем прайс-лист потоково: категории создаем сразу, товары делим на части
+        categories_dict = {}
+        with open_price_list(yaml_data, filename, feed_format) as entries:
+            chunks = iter_chunks(iter_goods(entries, categories_dict), chunk_size)
+            first_chunk = next(chunks, [])
+            second_chunk = next(chunks, None)
+
+            # Небольшой прайс-лист импортируем в этой же задаче
+            if second_chunk is None:
+                return _import_in_task(
+                    supplier, first_chunk, categories_dict, task_id=task_id, run_id=run_id, mode=mode,
+                    incremental=incremental, progress=progress, filename=filename
+                )
+
+            workflow, chunk_count = _chunked_import_workflow(
+                supplier, itertools.chain([first_chunk, second_chunk], chunks), categories_dict,
+                task_id=task_id, run_id=run_id, mode=mode, incremental=incremental,
+                progress=progress, filename=filename
+            )
+
+        # Блокировку освободит finalize_import после записи всех частей
+        release_lock = False
+    except Supplier.DoesNotExist:
+        logger.error(f"Supplier with ID {supplier_id} not found")
+        release_import_file(filename, delete=False)
+        return _import_failed(task_id, "Supplier not found")
+    except Exception as e:
+        logger.error(f"Error importing products: {str(e)}")
+        release_import_file(filename, delete=False)
+        return _import_failed(task_id, str(e))
+    finally:
+        if release_lock:
+            queue.release()
 
-        created_count = 0
-        updated_count = 0
+    logger.info(f"Import for supplier {supplier_id} split into {chunk_count} chunks")
+    if self.request.called_directly:
+        return workflow.apply().get()
+    return self.replace(workflow)
 
-        # Создаем словарь категорий
-        categories_dict = {}
-        if 'categories' in data:
-            for cat_data in data['categories']:
-                cat_name = cat_data.get('name', 'Без категории')
-                cat_id = cat_data.get('id')
-                if cat_id and cat_name:
-                    category, _ = Category.objects.get_or_create(name=cat_name)
-                    categories_dict[cat_id] = category
-
-        # Импортируем товары
-        if 'goods' in data:
-            for item in data['goods']:
-                try:
-                    # Получаем основные данные
-                    name = item.get('name')
-                    price = item.get('price')
-
-                    if not name or not price:
-                        continue
-
-                    # Получаем категорию
-                    category = None
-                    cat_id = item.get('category')
-                    if cat_id and cat_id in categories_dict:
-                        category = categories_dict[cat_id]
-
-                    # Получаем описание и характеристики
-                    description = ""
-                    characteristics = {}
-                    if 'parameters' in item and isinstance(item['parameters'], dict):
-                        # Сохраняем описание отдельно
-                        if 'description' in item['parameters']:
-                            description = item['parameters']['description']
-                            # Удаляем описание из характеристик
-                            parameters = item['parameters'].copy()
-                            parameters.pop('description', None)
-                            characteristics = parameters
-                        else:
-                            # Если нет отдельного описания,
-                            # создаем его из параметров
-                            params = []
-                            for key, value in item['parameters'].items():
-                                params.append(f"{key}: {value}")
-                            description = "\n".join(params)
-                            characteristics = item['parameters']
-
-                    # Получаем или создаем SKU
-                    sku = str(item.get('id', ''))
-
-                    # Проверяем, существует ли товар с таким SKU
-                    if sku:
-                        product, created = Product.objects.update_or_create(
-                            sku=sku,
-                            defaults={
-                                'name': name,
-                                'description': description,
-                                'price': price,
-                                'supplier': supplier,
-                                'category': category,
-                                'stock': item.get('quantity', 0),
-                                'is_active': True,
-                                'characteristics': characteristics
-                            }
-                        )
-
-                        if created:
-                            created_count += 1
-                        else:
-                            updated_count += 1
-                    else:
-                        # Создаем новый товар без SKU
-                        Product.objects.create(
-                            name=name,
-                            description=description,
-                            price=price,
-                            supplier=supplier,
-                            category=category,
-                            stock=item.get('quantity', 0),
-                            is_active=True,
-                            characteristics=characteristics
-                        )
-                        created_count += 1
-                except Exception as e:
-                    logger.error(f"Error importing product: {str(e)}")
-                    continue
-
-        return {
+
+@shared_task
+def import_products_chunk(supplier_id: int, chunk_file: str, categories: List[List[Any]],
+                          incremental: bool = False, progress_id: Optional[str] = None,
+                          row_offset: int = 0, staging_run_id: Optional[str] = None,
+                          row_count: Optional[int] = None, lock: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """
+    Импортирует часть товаров прайс-листа
+
+    Ошибки строк сохраняются в отчет рядом с файлом части,
+    finalize_import объединяет отчеты всех частей.
+
+    Args:
+        supplier_id: ID поставщика
+        chunk_file: JSON файл с частью товаров из раздела goods
+        categories: пары [id категории в файле, ID категории в базе]
+        incremental: пропускать товары, которые не изменились
+        progress_id: ID задачи do_import, в прогресс которой добавляются счетчики
+        row_offset: номер первого товара части в прайс-листе минус один
+        staging_run_id: ID импорта, под которым товары загружаются
+                        в таблицу StagedProduct (режим replace)
+        row_count: количество товаров в части - если часть не удалось
+                   импортировать, все они считаются ошибочными
+        lock: [ID поставщика, ID импорта] - блокировка поставщика, которую
+              часть продлевает при запуске и публикации прогресса
+
+    Returns:
+        dict: количество созданных, обновленных и ошибочных товаров
+    """
+    from .models import Supplier, Category
+    from .import_engine import ProductImporter
+    from .import_errors import CHUNK_FAILED
+    from .import_files import read_chunk_file
+    from .import_progress import ImportProgress
+    from .import_queue import SupplierImportQueue
+    from .import_staging import StagingImporter
+
+    # Части могут долго ждать своей очереди у воркеров, поэтому
+    # блокировка поставщика продлевается при запуске каждой части
+    queue = SupplierImportQueue(*lock) if lock else None
+    if queue is not None and not queue.renew():
+        logger.warning(f"Import chunk {chunk_file} runs without the supplier lock")
+
+    items = []
+    try:
+        items = read_chunk_file(chunk_file)
+        supplier = Supplier.objects.get(id=supplier_id)
+        categories_dict = {cat_id: Category(pk=pk) for cat_id, pk in categories}
+
+        progress = ImportProgress(progress_id, lock=queue) if progress_id else None
+        if staging_run_id:
+            importer = StagingImporter(supplier, staging_run_id, progress=progress, row_offset=row_offset)
+        else:
+            importer = ProductImporter(supplier, incremental=incremental, progress=progress, row_offset=row_offset)
+        importer.import_items(items, categories_dict)
+        if importer.errors:
+            importer.error_report.write(f"{os.path.splitext(chunk_file)[0]}.errors.jsonl")
+        return importer.result()
+    except Exception as e:
+        logger.error(f"Error importing products chunk: {str(e)}")
+        # Файл части мог не прочитаться, поэтому размер части берем из do_import
+        failed = row_count or len(items) or 1
+        return {"created": 0, "updated": 0, "errors": failed, "error_summary": {CHUNK_FAILED: failed}}
+
+
+@shared_task
+def finalize_import(results: List[Dict[str, int]], progress_id: Optional[str] = None,
+                    chunk_dir: Optional[str] = None, sync_supplier_id: Optional[int] = None,
+                    lock: Optional[List[Any]] = None, report_path: Optional[str] = None,
+                    replace_run: Optional[List[Any]] = None, source: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Собирает результаты частей импорта в итоговый результат do_import
+
+    Args:
+        results: результаты import_products_chunk
+        progress_id: ID задачи do_import, прогресс которой нужно завершить
+        chunk_dir: директория с файлами частей, которую нужно удалить
+        sync_supplier_id: ID поставщика, у которого нужно деактивировать
+                          товары, отсутствующие в прайс-листе (режим sync)
+        lock: [ID поставщика, ID импорта] - блокировка, которую нужно освободить
+        report_path: путь, по которому сохраняется общий отчет об ошибках частей
+        replace_run: [ID поставщика, ID импорта] - загруженные товары,
+                     которыми нужно заменить каталог поставщика (режим replace)
+        source: прайс-лист, сохраненный start_import, который удаляется
+                после успешного импорта (см. release_import_file)
+
+    Returns:
+        dict: Результат импорта с количеством созданных
+              и обновленных товаров, в total - всех записанных
+              товаров, включая неизмененные
+    """
+    totals = {"created": 0, "updated": 0, "errors": 0}
+    error_summary = {}
+    error_report = None
+    for result in results:
+        for key, value in result.items():
+            if key == "error_summary":
+                for code, count in value.items():
+                    error_summary[code] = error_summary.get(code, 0) + count
+            elif key == "error_report":
+                error_report = value
+            else:
+                totals[key] = totals.get(key, 0) + value
+
+    # Отчеты об ошибках частей объединяем в один рядом с прайс-листом
+    if chunk_dir and report_path:
+        from .import_errors import error_report_url, merge_error_reports
+
+        parts = sorted(glob.glob(os.path.join(chunk_dir, '*.errors.jsonl')))
+        if parts:
+            error_report = error_report_url(merge_error_reports(parts, report_path))
+
+    if sync_supplier_id:
+        from .import_engine import deactivate_missing_products
+        from .import_files import read_skus_file
+
+        try:
+            totals["deactivated"] = deactivate_missing_products(sync_supplier_id, set(read_skus_file(chunk_dir)))
+        except Exception as e:
+            logger.error(f"Error deactivating missing products: {str(e)}")
+            totals["deactivated"] = 0
+            totals["errors"] += 1
+
+    replace_error = None
+    if replace_run:
+        from .import_errors import CHUNK_FAILED
+        from .import_staging import swap_staged_products
+
+        totals.pop("staged", None)
+        try:
+            totals.update(swap_staged_products(
+                *replace_run, errors=totals["errors"], failed=error_summary.get(CHUNK_FAILED, 0)
+            ))
+        except Exception as e:
+            logger.error(f"Error replacing catalog: {str(e)}")
+            replace_error = str(e)
+
+    if replace_error:
+        result = {"error": replace_error, "errors": totals["errors"]}
+    else:
+        result = {
             "success": True,
-            "created": created_count,
-            "updated": updated_count,
-            "total": created_count + updated_count
+            **totals,
+            "total": totals["created"] + totals["updated"] + totals.get("unchanged", 0)
         }
+    if error_summary:
+        result["error_summary"] = error_summary
+    if error_report:
+        result["error_report"] = error_report
+
+    from .import_files import release_import_file, remove_chunk_dir
+    if chunk_dir:
+        remove_chunk_dir(chunk_dir)
+    release_import_file(source, delete="error" not in result)
+
+    if lock:
+        from .import_queue import SupplierImportQueue
+        SupplierImportQueue(*lock).release()
+
+    if progress_id:
+        from .import_progress import ImportProgress
+        ImportProgress(progress_id).finish(result)
+
+    return result
+
+
+@shared_task
+def cleanup_import_files() -> int:
+    """
+    Удаляет старые прайс-листы, отчеты об ошибках и части импорта
+
+    Запускается периодически Celery beat (CELERY_BEAT_SCHEDULE).
+
+    Returns:
+        int: количество удаленных файлов и директорий
+    """
+    from .import_files import cleanup_import_files as cleanup
+
+    removed = cleanup()
+    if removed:
+        logger.info(f"Removed {removed} expired import files")
+    return removed
+
+
+@shared_task(bind=True)
+def export_all_suppliers(self, output_dir: Optional[str] = None,
+                         supplier_ids: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Выгружает каталоги всех поставщиков в файлы параллельно
+
+    Каждый поставщик выгружается отдельной подзадачей export_supplier,
+    поэтому выгрузки идут параллельно в процессах воркеров Celery
+    и ограничены их количеством (--concurrency). Манифест пишет
+    finalize_export после выгрузки всех поставщиков.
+
+    Args:
+        output_dir: директория выгрузки (по умолчанию новая директория
+                    в settings.EXPORT_SNAPSHOT_DIR)
+        supplier_ids: ID поставщиков (по умолчанию все)
+
+    Returns:
+        dict: манифест выгрузки
+    """
+    from django.utils import timezone
+    from .models import Supplier
+    from .export_snapshot import snapshot_dir, write_manifest
+
+    output_dir = output_dir or snapshot_dir()
+    started_at = timezone.now().isoformat()
+    if supplier_ids is None:
+        supplier_ids = list(Supplier.objects.order_by('pk').values_list('pk', flat=True))
+    os.makedirs(output_dir, exist_ok=True)
+
+    if not supplier_ids:
+        return write_manifest(output_dir, [], started_at)
+
+    workflow = chord(
+        (export_supplier.s(supplier_id, output_dir) for supplier_id in supplier_ids),
+        finalize_export.s(output_dir, started_at)
+    )
+    logger.info(f"Export of {len(supplier_ids)} suppliers to {output_dir} started")
+    if self.request.called_directly:
+        return workflow.apply().get()
+    return self.replace(workflow)
+
+
+@shared_task
+def export_supplier(supplier_id: int, output_dir: str) -> Dict[str, Any]:
+    """
+    Выгружает каталог поставщика в файл директории выгрузки
+
+    Returns:
+        dict: запись манифеста (см. export_supplier_snapshot)
+    """
+    from .export_snapshot import export_supplier_snapshot
+
+    return export_supplier_snapshot(supplier_id, output_dir)
+
+
+@shared_task
+def finalize_export(entries: List[Dict[str, Any]], output_dir: str, started_at: str) -> Dict[str, Any]:
+    """
+    Записывает манифест выгрузки каталогов всех поставщиков
+
+    Returns:
+        dict: манифест выгрузки
+    """
+    from .export_snapshot import write_manifest
+
+    return write_manifest(output_dir, entries, started_at)
+
+
+def _import_in_task(supplier: Any, items: List[Dict[str, Any]], categories_dict: Dict[str, Any],
+                    task_id: Optional[str], run_id: str, mode: str, incremental: bool,
+                    progress: Optional[Any], filename: Optional[str]) -> Dict[str, Any]:
+    """
+    Импортирует небольшой прайс-лист в задаче do_import, без разбиения на части
+    """
+    from .import_engine import ProductImporter, collect_skus, deactivate_missing_products
+    from .import_errors import error_report_path, error_report_url
+    from .import_staging import StagingImporter
+
+    replace = mode == 'replace'
+    if progress is not None:
+        progress.set_total(len(items))
+    if replace:
+        importer = StagingImporter(supplier, run_id, progress=progress)
+    else:
+        importer = ProductImporter(supplier, incremental=incremental, progress=progress)
+    importer.import_items(items, categories_dict)
+    result = importer.result()
+    if mode == 'sync':
+        result["deactivated"] = deactivate_missing_products(supplier.id, collect_skus(items))
+    if importer.errors:
+        report = importer.error_report.write(error_report_path(run_id, filename))
+        result["error_report"] = error_report_url(report)
+    return finalize_import(
+        [result], progress_id=task_id, replace_run=[supplier.id, run_id] if replace else None, source=filename
+    )
+
+
+def _chunked_import_workflow(supplier: Any, chunks: Iterable[List[Dict[str, Any]]],
+                             categories_dict: Dict[str, Any], task_id: Optional[str], run_id: str,
+                             mode: str, incremental: bool, progress: Optional[Any],
+                             filename: Optional[str]) -> Tuple[Any, int]:
+    """
+    Сохраняет части прайс-листа в файлы и собирает chord их импорта
+
+    Returns:
+        tuple: (chord из import_products_chunk и finalize_import, количество частей)
+    """
+    from .import_engine import collect_skus
+    from .import_errors import error_report_path
+    from .import_files import CHUNKS_DIR, imports_dir, write_chunk_file, write_skus_file
+
+    sync = mode == 'sync'
+    replace = mode == 'replace'
+    lock = [supplier.id, run_id]
+
+    # Части сохраняем в файлы, чтобы товары не передавались через брокер
+    chunk_dir = imports_dir(CHUNKS_DIR, run_id)
+    chunk_args = []
+    skus = set()
+    total = 0
+    for chunk in chunks:
+        path = write_chunk_file(chunk_dir, len(chunk_args), chunk)
+        chunk_args.append((path, total, len(chunk)))
+        total += len(chunk)
+        if sync:
+            skus.update(collect_skus(chunk))
+
+    # В CSV и JSON Lines категория может встретиться перед любым товаром,
+    # поэтому словарь категорий полон только после чтения всех частей
+    categories = [[cat_id, category.pk] for cat_id, category in categories_dict.items()]
+    signatures = [
+        import_products_chunk.s(
+            supplier_id=supplier.id, chunk_file=path, categories=categories, incremental=incremental,
+            progress_id=task_id, row_offset=offset, staging_run_id=run_id if replace else None,
+            row_count=size, lock=lock
+        )
+        for path, offset, size in chunk_args
+    ]
+
+    # SKU прайс-листа нужны finalize_import, когда все части записаны
+    if sync:
+        write_skus_file(chunk_dir, skus)
+
+    if progress is not None:
+        progress.set_total(total)
+
+    workflow = chord(signatures, finalize_import.s(
+        progress_id=task_id, chunk_dir=chunk_dir, sync_supplier_id=supplier.id if sync else None, lock=lock,
+        report_path=error_report_path(run_id, filename), replace_run=lock if replace else None, source=filename
+    ))
+    return workflow, len(signatures)
+
+
+def _validate_import(task_id: Optional[str], run_id: str, supplier_id: int,
+                     yaml_data: Optional[str], filename: Optional[str],
+                     feed_format: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Проверяет прайс-лист для do_import(dry_run=True)
+    """
+    from .models import Supplier
+    from .import_errors import ImportErrorReport, error_report_path, error_report_url
+    from .import_progress import ImportProgress
+    from .import_validation import validate_price_list
+    from .yaml_stream import open_price_list
+
+    try:
+        supplier = Supplier.objects.get(id=supplier_id)
+        if task_id:
+            ImportProgress(task_id).start(supplier.id)
+
+        report = ImportErrorReport()
+        with open_price_list(yaml_data, filename, feed_format) as entries:
+            summary = validate_price_list(supplier, entries, error_report=report)
+
+        result = {"success": True, "dry_run": True, **summary}
+        if report.total:
+            result["error_report"] = error_report_url(report.write(error_report_path(run_id, filename)))
     except Supplier.DoesNotExist:
         logger.error(f"Supplier with ID {supplier_id} not found")
-        return {"error": "Supplier not found"}
+        return _import_failed(task_id, "Supplier not found")
     except Exception as e:
-        logger.error(f"Error importing products: {str(e)}")
-        return {"error": str(e)}
+        logger.error(f"Error validating products: {str(e)}")
+        return _import_failed(task_id, str(e))
+
+    if task_id:
+        ImportProgress(task_id).finish(result)
+    return result
+
+
+def _import_failed(task_id: Optional[str], message: str, status: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Возвращает результат неудачного импорта и отмечает его в прогрессе
+    """
+    from .import_progress import ImportProgress
+
+    result = {"error": message}
+    if task_id:
+        ImportProgress(task_id).finish(result, status)
+    return result
@@ -1,10 +1,18 @@
+import gzip
+import os
 import pytest
+import yaml
 from decimal import Decimal
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from shop.models import Product, CartItem, Order
+from shop.search import trigram_available
+from shop.tasks import do_import
 from .factories import (
     UserFactory, SupplierFactory, CategoryFactory, ProductFactory,
     DeliveryAddressFactory, OrderFactory, OrderItemFactory, CartItemFactory
@@ -95,6 +103,111 @@ class TestProductAPI:
         assert product3.id in response_ids
         assert product2.id not in response_ids
 
+    def test_search_products_ranked(self, api_client):
+        in_description = ProductFactory(name='Чехол', description='Подходит для смартфонов Samsung')
+        in_name = ProductFactory(name='Смартфон Samsung Galaxy', description='Черный')
+        ProductFactory(name='Ноутбук', description='Серый')
+
+        # Совпадение в названии выше совпадения в описании, словоформы не важны
+        response = api_client.get(reverse('products-list'), {'search': 'смартфон samsung'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [product['id'] for product in response.data['results']] == [in_name.id, in_description.id]
+
+        response = api_client.get(reverse('products-list'), {'search': 'смартфон -чехол', 'ordering': 'price'})
+        assert [product['id'] for product in response.data['results']] == [in_name.id]
+
+    def test_fuzzy_search_tolerates_typos(self, api_client):
+        if not trigram_available():
+            pytest.skip("pg_trgm extension is not installed")
+        closest = ProductFactory(name='Смартфон Apple iPhone 15')
+        similar = ProductFactory(name='Смартфон Apple iPad Air')
+        ProductFactory(name='Ноутбук Lenovo')
+
+        # Опечатка в запросе, ближайшее название первым
+        response = api_client.get(reverse('products-list'), {'search': 'iphnoe', 'search_mode': 'fuzzy'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [product['id'] for product in response.data['results']] == [closest.id]
+
+        response = api_client.get(reverse('products-list'), {'search': 'смартфон apple ipone', 'search_mode': 'fuzzy'})
+        assert [product['id'] for product in response.data['results']] == [closest.id, similar.id]
+
+    def test_fuzzy_search_without_pg_trgm(self, api_client):
+        product = ProductFactory(name='Смартфон Samsung Galaxy')
+        ProductFactory(name='Ноутбук')
+
+        # Без расширения pg_trgm выполняется полнотекстовый поиск
+        with patch('shop.search.trigram_available', return_value=False):
+            response = api_client.get(reverse('products-list'), {'search': 'смартфоны', 'search_mode': 'fuzzy'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [product['id'] for product in response.data['results']] == [product.id]
+
+    @pytest.mark.parametrize('value', ['NaN', 'Infinity', '-Infinity'])
+    def test_filter_by_non_finite_characteristic(self, api_client, value):
+        product = ProductFactory(characteristics={'Размер': value})
+        ProductFactory(characteristics={'Размер': 1})
+
+        # Значение ищется только как строка
+        response = api_client.get(reverse('products-list'), {'attr.Размер': value})
+        assert response.status_code == status.HTTP_200_OK
+        assert [item['id'] for item in response.data['results']] == [product.id]
+
+        response = api_client.get(reverse('products-facets'), {'attr.Размер': value})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['facets'] == {'Размер': [{'value': value, 'count': 1}]}
+
+    def test_filter_by_characteristics(self, api_client):
+        black_256 = ProductFactory(name='A', characteristics={'Цвет': 'черный', 'Встроенная память (Гб)': 256})
+        white_256 = ProductFactory(name='B', characteristics={'Цвет': 'белый', 'Встроенная память (Гб)': 256})
+        ProductFactory(name='C', characteristics={'Цвет': 'черный', 'Встроенная память (Гб)': 128})
+        ProductFactory(name='D', characteristics=None)
+
+        # Число из строки запроса совпадает с числом в характеристиках
+        response = api_client.get(reverse('products-list'), {'attr.Встроенная память (Гб)': '256', 'ordering': 'name'})
+        assert [product['id'] for product in response.data['results']] == [black_256.id, white_256.id]
+
+        # Разные характеристики должны совпасть все
+        response = api_client.get(reverse('products-list'), {'attr.Встроенная память (Гб)': '256', 'attr.Цвет': 'черный'})
+        assert [product['id'] for product in response.data['results']] == [black_256.id]
+
+        # Из значений одной характеристики подходит любое
+        response = api_client.get('/api/products/?attr.Цвет=белый&attr.Цвет=красный')
+        assert [product['id'] for product in response.data['results']] == [white_256.id]
+
+    def test_facets(self, api_client, django_assert_num_queries):
+        cache.clear()
+        phones = CategoryFactory(name='Смартфоны')
+        ProductFactory(category=phones, characteristics={'Цвет': 'черный', 'Встроенная память (Гб)': 256})
+        ProductFactory(category=phones, characteristics={'Цвет': 'черный', 'Встроенная память (Гб)': 128})
+        ProductFactory(category=phones, characteristics={'Цвет': 'белый', 'Встроенная память (Гб)': 256})
+        ProductFactory(category=phones, characteristics=['не объект'])
+        ProductFactory(category=phones, characteristics={'Цвет': 'черный'}, is_active=False)
+        ProductFactory(characteristics={'Цвет': 'красный'})
+
+        url = reverse('products-facets')
+        with django_assert_num_queries(1):
+            response = api_client.get(url, {'category': phones.id})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['facets'] == {
+            'Встроенная память (Гб)': [{'value': 256, 'count': 2}, {'value': 128, 'count': 1}],
+            'Цвет': [{'value': 'черный', 'count': 2}, {'value': 'белый', 'count': 1}],
+        }
+
+        # Фасеты учитывают фильтры по характеристикам
+        response = api_client.get(url, {'category': phones.id, 'attr.Цвет': 'белый'})
+        assert response.data['facets'] == {
+            'Встроенная память (Гб)': [{'value': 256, 'count': 1}],
+            'Цвет': [{'value': 'белый', 'count': 1}],
+        }
+
+        # Тот же набор фильтров берется из кэша, страница и сортировка не важны
+        with django_assert_num_queries(0):
+            cached = api_client.get(url, {'page': 2, 'ordering': 'price', 'category': phones.id})
+        assert cached.data['facets']['Цвет'] == [{'value': 'черный', 'count': 2}, {'value': 'белый', 'count': 1}]
+
 
 @pytest.mark.django_db
 class TestCartAPI:
@@ -319,3 +432,248 @@ class TestSupplierAPI:
         product.refresh_from_db()
         assert product.name == data['name']
         assert product.price == Decimal('299.99')
+
+    def test_export_products(self, supplier_client):
+        client, user, supplier = supplier_client
+        ProductFactory(supplier=supplier, sku='SKU-EXPORT-1', name='Product 1')
+        ProductFactory(sku='SKU-OTHER')
+
+        response = client.get(reverse('supplier-products-export-products'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response['Content-Type'] == 'application/x-yaml'
+        data = yaml.safe_load(b''.join(response.streaming_content).decode('utf-8'))
+        assert [item['id'] for item in data['goods']] == ['SKU-EXPORT-1']
+
+    def test_export_products_etag(self, supplier_client, django_capture_on_commit_callbacks):
+        client, user, supplier = supplier_client
+        product = ProductFactory(supplier=supplier, sku='SKU-EXPORT-1')
+        url = reverse('supplier-products-export-products')
+
+        response = client.get(url)
+        etag = response['ETag']
+        first = b''.join(response.streaming_content)
+
+        # Каталог не менялся: ответ 304 без тела, затем та же выгрузка из кэша
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response['ETag'] == etag
+        assert b''.join(client.get(url).streaming_content) == first
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product.price = 1
+            product.save()
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != etag
+        data = yaml.safe_load(b''.join(response.streaming_content).decode('utf-8'))
+        assert data['goods'][0]['price'] == 1
+
+    def test_export_products_compressed(self, supplier_client):
+        client, user, supplier = supplier_client
+        ProductFactory(supplier=supplier, sku='SKU-EXPORT-1')
+        url = reverse('supplier-products-export-products')
+
+        # Сжатие по Accept-Encoding: тип содержимого остается YAML
+        response = client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        assert response['Content-Encoding'] == 'gzip'
+        assert response['Content-Type'] == 'application/x-yaml'
+        assert 'Accept-Encoding' in response['Vary']
+        data = yaml.safe_load(gzip.decompress(b''.join(response.streaming_content)))
+        assert [item['id'] for item in data['goods']] == ['SKU-EXPORT-1']
+        etag = response['ETag']
+
+        # Явно запрошенный сжатый файл скачивается без Content-Encoding
+        response = client.get(url, {'compression': 'gzip'})
+        assert response['Content-Type'] == 'application/gzip'
+        assert not response.has_header('Content-Encoding')
+        assert response['Content-Disposition'].endswith('_products.yaml.gz"')
+        assert response['ETag'] == etag
+        assert gzip.decompress(b''.join(response.streaming_content))
+
+        response = client.get(url, {'compression': 'rar'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_export_products_since(self, supplier_client):
+        client, user, supplier = supplier_client
+        ProductFactory(supplier=supplier, sku='SKU-OLD')
+        Product.objects.update(updated_at='2026-01-01T00:00:00Z')
+        ProductFactory(supplier=supplier, sku='SKU-NEW')
+        url = reverse('supplier-products-export-products')
+
+        response = client.get(url, {'since': '2026-01-02T00:00:00+00:00'})
+        assert response.status_code == status.HTTP_200_OK
+        assert not response.has_header('ETag')
+        data = yaml.safe_load(b''.join(response.streaming_content).decode('utf-8'))
+        assert [item['id'] for item in data['goods']] == ['SKU-NEW']
+        assert data['next_since']
+
+        response = client.get(url, {'since': 'yesterday'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_export_to_file_etag(self, supplier_client):
+        client, user, supplier = supplier_client
+        ProductFactory(supplier=supplier)
+        url = reverse('supplier-export-export-to-file')
+
+        response = client.post(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['catalog_version'] == 0
+        assert os.path.exists(response.data['file_path'])
+        assert response.data['compressed']['gzip']['filename'].endswith('.yaml.gz')
+
+        gzip_response = client.post(url + '?compression=gzip')
+        assert gzip_response.data['file_path'] == response.data['file_path'] + '.gz'
+
+        response = client.post(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_import_status(self, supplier_client):
+        client, user, supplier = supplier_client
+
+        yaml_data = """
+        categories:
+          - id: 1
+            name: Electronics
+        goods:
+          - id: SKU-STATUS-1
+            name: Product 1
+            price: 100
+            category: 1
+            quantity: 1
+          - id: SKU-STATUS-2
+            name: Product 2
+            price: 200
+            category: 1
+            quantity: 2
+        """
+        response = client.post(
+            reverse('supplier-products-import-products'), {'yaml_data': yaml_data}, format='json'
+        )
+        task_id = response.data['task_id']
+
+        url = reverse('supplier-products-import-status', kwargs={'task_id': task_id})
+        response = client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['status'] == 'finished'
+        assert response.data['total'] == 2
+        assert response.data['processed'] == 2
+        assert response.data['created'] == 2
+        assert response.data['result']['created'] == 2
+
+        # Другой поставщик не видит чужой импорт
+        other_user = UserFactory(user_type='supplier')
+        SupplierFactory(user=other_user)
+        client.force_authenticate(user=other_user)
+        response = client.get(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_import_products_from_file(self, supplier_client, settings):
+        client, user, supplier = supplier_client
+
+        yaml_file = SimpleUploadedFile('price.yaml', (
+            "goods:\n"
+            "  - id: SKU-FILE-1\n"
+            "    name: Product 1\n"
+            "    price: 100\n"
+            "    quantity: 1\n"
+        ).encode('utf-8'))
+        url = reverse('supplier-products-import-products')
+
+        with patch('shop.tasks.do_import.delay', wraps=do_import.delay) as delay:
+            response = client.post(url, {'file': yaml_file}, format='multipart')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert Product.objects.filter(sku='SKU-FILE-1', supplier=supplier).exists()
+
+        # Задаче передается только путь к сохраненному файлу
+        kwargs = delay.call_args.kwargs
+        assert 'yaml_data' not in kwargs
+        assert os.path.dirname(kwargs['filename']) == os.path.join(settings.MEDIA_ROOT, 'imports')
+        # После успешного импорта сохраненный файл удаляется
+        assert not os.path.exists(kwargs['filename'])
+
+    def test_import_products_duplicate_upload(self, supplier_client):
+        client, user, supplier = supplier_client
+
+        yaml_data = """
+        goods:
+          - id: SKU-DUP-1
+            name: Product 1
+            price: 100
+            quantity: 1
+        """
+        url = reverse('supplier-products-import-products')
+        first = client.post(url, {'yaml_data': yaml_data}, format='json')
+        assert 'duplicate' not in first.data
+
+        # Тот же файл повторно не импортируется
+        with patch('shop.tasks.do_import.delay') as delay:
+            response = client.post(url, {'yaml_data': yaml_data}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['duplicate'] is True
+        assert response.data['task_id'] == first.data['task_id']
+        delay.assert_not_called()
+
+        # С параметром force импорт запускается заново
+        response = client.post(url, {'yaml_data': yaml_data, 'force': True}, format='json')
+        assert 'duplicate' not in response.data
+        assert response.data['task_id'] != first.data['task_id']
+
+    def test_import_products_dry_run(self, supplier_client):
+        client, user, supplier = supplier_client
+        url = reverse('supplier-products-import-products')
+        yaml_data = "goods:\n  - id: SKU-DRY-1\n    name: Product 1\n    price: 100\n"
+
+        response = client.post(url, {'yaml_data': yaml_data, 'dry_run': True}, format='json')
+        status_response = client.get(
+            reverse('supplier-products-import-status', kwargs={'task_id': response.data['task_id']})
+        )
+        assert status_response.data['result']['dry_run']
+        assert status_response.data['result']['new'] == 1
+        assert not Product.objects.filter(sku='SKU-DRY-1').exists()
+
+        # Проверка не мешает импорту того же файла
+        response = client.post(url, {'yaml_data': yaml_data}, format='json')
+        assert 'duplicate' not in response.data
+        assert Product.objects.filter(sku='SKU-DRY-1').exists()
+
+    def test_import_products_csv_file(self, supplier_client, settings):
+        client, user, supplier = supplier_client
+        upload = SimpleUploadedFile(
+            'price.csv', 'id,name,price,quantity\nSKU-CSV-1,Product 1,100,2\n'.encode('utf-8'),
+            content_type='text/csv'
+        )
+
+        with patch('shop.tasks.do_import.delay', wraps=do_import.delay) as delay:
+            response = client.post(reverse('supplier-products-import-products'), {'file': upload}, format='multipart')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert Product.objects.get(sku='SKU-CSV-1').stock == 2
+        assert delay.call_args.kwargs['filename'].endswith('.csv')
+
+    def test_import_products_unknown_format(self, supplier_client):
+        client, user, supplier = supplier_client
+        response = client.post(
+            reverse('supplier-products-import-products'),
+            {'yaml_data': 'goods: []', 'format': 'xls'}, format='json'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_import_products_unknown_mode(self, supplier_client):
+        client, user, supplier = supplier_client
+        response = client.post(
+            reverse('supplier-products-import-products'),
+            {'yaml_data': 'goods: []', 'mode': 'merge'}, format='json'
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_import_status_pending(self, supplier_client):
+        client, user, supplier = supplier_client
+        url = reverse('supplier-products-import-status', kwargs={'task_id': 'unknown-task'})
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['status'] == 'pending'
@@ -0,0 +1,76 @@
+import json
+import os
+import pytest
+from django.core.management import call_command
+
+from shop.export_snapshot import MANIFEST_NAME, export_all_suppliers, export_supplier_snapshot
+from shop.tasks import export_all_suppliers as export_all_suppliers_task
+from shop.utils import export_products_to_yaml
+from .factories import SupplierFactory, ProductFactory
+
+
+@pytest.mark.django_db
+class TestExportSupplierSnapshot:
+    def test_writes_file_and_manifest_entry(self, tmp_path):
+        supplier = SupplierFactory(user__company_name='Магазин')
+        ProductFactory.create_batch(3, supplier=supplier)
+
+        entry = export_supplier_snapshot(supplier.pk, str(tmp_path))
+
+        path = tmp_path / f'{supplier.pk}_Магазин_products.yaml'
+        assert entry['file'] == path.name
+        assert entry['rows'] == 3
+        assert entry['size'] == path.stat().st_size
+        assert entry['seconds'] >= 0
+        assert path.read_text(encoding='utf-8') == export_products_to_yaml(supplier)
+        # Временные файлы не остаются
+        assert os.listdir(tmp_path) == [path.name]
+
+    def test_missing_supplier(self, tmp_path):
+        entry = export_supplier_snapshot(0, str(tmp_path))
+
+        assert 'error' in entry
+        assert os.listdir(tmp_path) == []
+
+    def test_task_writes_manifest(self, tmp_path):
+        suppliers = [SupplierFactory() for _ in range(3)]
+        for number, supplier in enumerate(suppliers):
+            ProductFactory.create_batch(number, supplier=supplier)
+
+        manifest = export_all_suppliers_task(str(tmp_path), [supplier.pk for supplier in suppliers] + [0])
+
+        assert manifest['suppliers'] == 4
+        assert manifest['rows'] == 0 + 1 + 2
+        assert manifest['errors'] == 1
+        assert [entry['supplier_id'] for entry in manifest['files']] == [supplier.pk for supplier in suppliers] + [0]
+        with open(tmp_path / MANIFEST_NAME, encoding='utf-8') as f:
+            assert json.load(f) == manifest
+
+
+# Процессы пула видят только зафиксированные данные
+@pytest.mark.django_db(transaction=True)
+class TestExportAllSuppliers:
+    def test_exports_in_process_pool(self, tmp_path):
+        suppliers = [SupplierFactory() for _ in range(4)]
+        for supplier in suppliers:
+            ProductFactory.create_batch(2, supplier=supplier)
+
+        manifest = export_all_suppliers(str(tmp_path), workers=2)
+
+        assert manifest['workers'] == 2
+        assert manifest['suppliers'] == 4
+        assert manifest['rows'] == 8
+        assert manifest['errors'] == 0
+        for entry in manifest['files']:
+            assert (tmp_path / entry['file']).stat().st_size == entry['size']
+        assert sorted(os.listdir(tmp_path)) == sorted([MANIFEST_NAME] + [entry['file'] for entry in manifest['files']])
+
+    def test_command(self, tmp_path, capsys):
+        supplier = SupplierFactory()
+        ProductFactory(supplier=supplier)
+
+        call_command('export_all_suppliers', '--output-dir', str(tmp_path), '--workers', '2')
+
+        manifest = json.loads((tmp_path / MANIFEST_NAME).read_text(encoding='utf-8'))
+        assert manifest['rows'] == 1
+        assert 'Манифест' in capsys.readouterr().out
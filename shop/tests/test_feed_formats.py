@@ -0,0 +1,136 @@
+import pytest
+
+from shop.feed_formats import detect_feed_format, iter_csv_price_list, iter_jsonl_price_list, iter_yml_price_list
+from shop.yaml_stream import open_price_list
+
+
+class TestDetectFeedFormat:
+    @pytest.mark.parametrize('filename, content_type, expected', [
+        ('price.csv', None, 'csv'),
+        ('price.JSONL', None, 'jsonl'),
+        ('price.ndjson', None, 'jsonl'),
+        ('price.yml', None, 'yaml'),
+        ('price.txt', 'text/csv; charset=utf-8', 'csv'),
+        ('price.csv', 'application/x-ndjson', 'jsonl'),
+        ('catalog.xml', None, 'yml'),
+        ('catalog', 'text/xml', 'yml'),
+        # Неизвестные тип и расширение считаются YAML
+        ('price.txt', 'application/octet-stream', 'yaml'),
+        (None, None, 'yaml'),
+    ])
+    def test_detect(self, filename, content_type, expected):
+        assert detect_feed_format(filename, content_type) == expected
+
+
+class TestCsvPriceList:
+    def test_maps_columns_to_goods_fields(self):
+        data = (
+            'id;category;name;price;quantity;Цвет;parameters\n'
+            '1;Смартфоны;Phone 1;100.50;5;черный;"{""Память (Гб)"": 64}"\n'
+            '2;Смартфоны;Phone 2;200;;;\n'
+            '3;Телевизоры;"TV; 55""";300;1;;\n'
+        )
+
+        assert list(iter_csv_price_list(data)) == [
+            ('categories', {'id': 'Смартфоны', 'name': 'Смартфоны'}),
+            ('goods', {
+                'id': '1', 'category': 'Смартфоны', 'name': 'Phone 1', 'price': '100.50', 'quantity': '5',
+                'parameters': {'Цвет': 'черный', 'Память (Гб)': 64},
+            }),
+            ('goods', {'id': '2', 'category': 'Смартфоны', 'name': 'Phone 2', 'price': '200'}),
+            ('categories', {'id': 'Телевизоры', 'name': 'Телевизоры'}),
+            ('goods', {'id': '3', 'category': 'Телевизоры', 'name': 'TV; 55"', 'price': '300', 'quantity': '1'}),
+        ]
+
+    def test_reads_file_with_bom(self, tmp_path):
+        path = tmp_path / 'price.csv'
+        path.write_text('id,name,price\nSKU-1,Product 1,100\n', encoding='utf-8-sig')
+
+        with open_price_list(filename=str(path)) as entries:
+            assert list(entries) == [('goods', {'id': 'SKU-1', 'name': 'Product 1', 'price': '100'})]
+
+
+class TestJsonlPriceList:
+    def test_reads_lines(self):
+        data = (
+            '{"id": 1, "category": "Смартфоны", "name": "Phone", "price": 100, "parameters": {"Цвет": "черный"}}\n'
+            '\n'
+            'not json\n'
+            '{"id": 2, "category": "Смартфоны", "name": "Phone 2", "price": 200}\n'
+        )
+
+        assert list(iter_jsonl_price_list(data)) == [
+            ('categories', {'id': 'Смартфоны', 'name': 'Смартфоны'}),
+            ('goods', {'id': 1, 'category': 'Смартфоны', 'name': 'Phone', 'price': 100,
+                       'parameters': {'Цвет': 'черный'}}),
+            # Строка, которая не является JSON, попадает в импорт как неверный товар
+            ('goods', 'not json'),
+            ('goods', {'id': 2, 'category': 'Смартфоны', 'name': 'Phone 2', 'price': 200}),
+        ]
+
+    def test_open_price_list_with_explicit_format(self):
+        with open_price_list('{"id": 1, "name": "Phone", "price": 100}', feed_format='jsonl') as entries:
+            assert list(entries) == [('goods', {'id': 1, 'name': 'Phone', 'price': 100})]
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            with open_price_list('data', feed_format='xls'):
+                pass
+
+
+YML_CATALOG = """<?xml version="1.0" encoding="windows-1251"?>
+<yml_catalog date="2019-11-01 17:22">
+  <shop>
+    <name>Связной</name>
+    <categories>
+      <category id="1">Смартфоны</category>
+      <category id="2" parentId="1">Аксессуары</category>
+    </categories>
+    <offers>
+      <offer id="4216292" available="true">
+        <price>110000</price>
+        <categoryId>1</categoryId>
+        <name>Смартфон Apple iPhone XS Max 512GB (золотистый)</name>
+        <model>iPhone XS Max</model>
+        <count>14</count>
+        <description>Флагман</description>
+        <param name="Диагональ" unit="дюйм">6.5</param>
+        <param name="Цвет">золотистый</param>
+      </offer>
+      <offer id="4216313" type="vendor.model" available="false">
+        <price>65000</price>
+        <categoryId>2</categoryId>
+        <typePrefix>Чехол</typePrefix>
+        <vendor>Apple</vendor>
+        <model>Leather Case</model>
+      </offer>
+    </offers>
+  </shop>
+</yml_catalog>
+"""
+
+
+class TestYmlPriceList:
+    def test_maps_categories_and_offers(self):
+        assert list(iter_yml_price_list(YML_CATALOG)) == [
+            ('categories', {'id': '1', 'name': 'Смартфоны'}),
+            ('categories', {'id': '2', 'name': 'Аксессуары'}),
+            ('goods', {
+                'id': '4216292', 'category': '1', 'model': 'iPhone XS Max',
+                'name': 'Смартфон Apple iPhone XS Max 512GB (золотистый)', 'price': '110000', 'quantity': '14',
+                'parameters': {'Диагональ (дюйм)': '6.5', 'Цвет': 'золотистый', 'description': 'Флагман'},
+            }),
+            ('goods', {
+                'id': '4216313', 'category': '2', 'model': 'Leather Case',
+                'name': 'Чехол Apple Leather Case', 'price': '65000', 'quantity': 0,
+            }),
+        ]
+
+    def test_reads_file_in_declared_encoding(self, tmp_path):
+        # Каталог с расширением .yml распознается по содержимому
+        path = tmp_path / 'catalog.yml'
+        path.write_bytes(YML_CATALOG.encode('cp1251'))
+
+        with open_price_list(filename=str(path)) as entries:
+            names = [value['name'] for section, value in entries if section == 'categories']
+        assert names == ['Смартфоны', 'Аксессуары']
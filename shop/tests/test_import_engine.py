@@ -0,0 +1,267 @@
+import datetime
+import json
+import pytest
+from unittest.mock import patch
+from django.contrib.postgres.search import SearchQuery
+from django.db import connection
+from freezegun import freeze_time
+from django.test.utils import CaptureQueriesContext
+
+from shop.import_engine import (
+    ProductImporter, deactivate_missing_products, product_fields_from_item, resolve_categories
+)
+from shop.import_errors import ImportErrorReport
+from shop.models import Product
+from .factories import SupplierFactory, ProductFactory
+
+
+def make_goods(count, prefix='SKU', price=100):
+    return [
+        {
+            'id': f'{prefix}-{i}',
+            'name': f'Product {i}',
+            'price': price,
+            'category': 1,
+            'quantity': i,
+            'parameters': {'Цвет': 'черный'}
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db
+class TestProductImporter:
+    def test_creates_and_updates_in_chunks(self):
+        supplier = SupplierFactory()
+        categories = resolve_categories([{'id': 1, 'name': 'Смартфоны'}])
+        ProductFactory(sku='SKU-0', supplier=supplier, price=1)
+
+        importer = ProductImporter(supplier, chunk_size=10)
+        importer.import_items(make_goods(25), categories)
+
+        assert importer.created == 24
+        assert importer.updated == 1
+        assert importer.errors == 0
+        assert Product.objects.filter(supplier=supplier).count() == 25
+
+        product = Product.objects.get(sku='SKU-0')
+        assert float(product.price) == 100
+        assert product.category.name == 'Смартфоны'
+        assert product.characteristics == {'Цвет': 'черный'}
+        assert product.description == 'Цвет: черный'
+
+    def test_chunk_uses_constant_number_of_queries(self):
+        supplier = SupplierFactory()
+        ProductFactory(sku='SKU-3', supplier=supplier)
+
+        importer = ProductImporter(supplier, chunk_size=1000)
+        with CaptureQueriesContext(connection) as queries:
+            importer.import_items(make_goods(200), {})
+
+        # SELECT существующих SKU и один INSERT ... ON CONFLICT (плюс savepoint)
+        assert len(queries) <= 4
+        assert importer.created == 199
+        assert importer.updated == 1
+
+    def test_duplicate_sku_in_chunk_counts_as_update(self):
+        supplier = SupplierFactory()
+        goods = make_goods(2) + [dict(make_goods(1)[0], price=150)]
+
+        importer = ProductImporter(supplier)
+        importer.import_items(goods, {})
+
+        assert importer.created == 2
+        assert importer.updated == 1
+        assert float(Product.objects.get(sku='SKU-0').price) == 150
+
+    def test_bad_rows_do_not_abort_chunk(self):
+        supplier = SupplierFactory()
+        goods = make_goods(3)
+        goods[1]['price'] = 'дорого'
+        goods[2]['quantity'] = -5
+
+        importer = ProductImporter(supplier)
+        importer.import_items(goods, {})
+
+        assert importer.created == 1
+        assert importer.errors == 2
+        assert Product.objects.filter(sku='SKU-0').exists()
+
+    def test_bad_rows_are_collected_in_error_report(self):
+        supplier = SupplierFactory()
+        goods = make_goods(4)
+        goods[1]['price'] = 'дорого'
+        goods[2]['quantity'] = 'много'
+
+        importer = ProductImporter(supplier, row_offset=10)
+        importer.import_items(goods + ['не товар'], {})
+
+        assert importer.result()['error_summary'] == {'invalid_value': 2, 'invalid_item': 1}
+        assert importer.error_report.errors[0]['row'] == 12
+        assert importer.error_report.errors[0]['sku'] == 'SKU-1'
+        assert importer.error_report.errors[0]['field'] == 'price'
+        assert importer.error_report.errors[1]['field'] == 'quantity'
+        assert importer.error_report.errors[2]['row'] == 15
+
+    def test_non_finite_price_is_row_error(self):
+        supplier = SupplierFactory()
+        goods = make_goods(5)
+        for item, price in zip(goods[1:], ['NaN', float('nan'), 'Infinity', float('-inf')]):
+            item['price'] = price
+
+        importer = ProductImporter(supplier)
+        importer.import_items(goods, {})
+
+        # Пропускаются только строки с такой ценой, остальные записываются
+        assert importer.created == 1
+        assert importer.errors == 4
+        assert {error['field'] for error in importer.error_report.errors} == {'price'}
+        assert Product.objects.filter(sku='SKU-0').exists()
+
+    def test_unexpected_item_types_are_row_errors(self):
+        supplier = SupplierFactory()
+        goods = make_goods(3)
+        goods[1]['category'] = [1]
+        goods[2]['parameters'] = {'Дата выпуска': datetime.date(2024, 1, 1), 512: 'ГБ'}
+
+        importer = ProductImporter(supplier)
+        importer.import_items(goods, {})
+
+        # Список вместо категории - ошибка строки, дата сохраняется строкой, как в частях импорта
+        assert (importer.created, importer.errors) == (2, 1)
+        assert importer.error_report.errors[0]['field'] == 'category'
+        assert Product.objects.get(sku='SKU-2').characteristics == {'Дата выпуска': '2024-01-01', '512': 'ГБ'}
+
+    def test_bulk_write_error_falls_back_to_rows(self):
+        supplier = SupplierFactory()
+
+        with patch.object(ProductImporter, '_write_chunk', side_effect=TypeError("unexpected value")):
+            importer = ProductImporter(supplier)
+            importer.import_items(make_goods(3), {})
+
+        assert (importer.created, importer.errors) == (3, 0)
+
+    def test_product_fields_skip_items_without_price(self):
+        assert product_fields_from_item({'id': 1, 'name': 'No price'}, {}) is None
+
+    def test_incremental_import_skips_unchanged_products(self):
+        supplier = SupplierFactory()
+        ProductImporter(supplier).import_items(make_goods(5), {})
+
+        goods = make_goods(6)
+        goods[0]['price'] = 500
+
+        importer = ProductImporter(supplier, incremental=True)
+        with CaptureQueriesContext(connection) as queries:
+            importer.import_items(goods, {})
+
+        assert importer.result() == {
+            "created": 1, "updated": 1, "errors": 0,
+            "new": 1, "changed": 1, "unchanged": 4,
+        }
+        assert float(Product.objects.get(sku='SKU-0').price) == 500
+        assert any('ON CONFLICT' in query['sql'] for query in queries)
+
+    def test_incremental_import_rewrites_products_edited_outside_import(self):
+        supplier = SupplierFactory()
+        ProductImporter(supplier).import_items(make_goods(2), {})
+
+        # Например, остаток уменьшился при оформлении заказа
+        product = Product.objects.get(sku='SKU-1')
+        product.stock = 0
+        product.save()
+
+        importer = ProductImporter(supplier, incremental=True)
+        importer.import_items(make_goods(2), {})
+
+        assert importer.unchanged == 1
+        assert importer.updated == 1
+        product.refresh_from_db()
+        assert product.stock == 1
+
+    def test_import_sets_updated_at_of_changed_products(self):
+        supplier = SupplierFactory()
+        with freeze_time('2026-01-01'):
+            ProductImporter(supplier).import_items(make_goods(3), {})
+
+        goods = make_goods(3)
+        goods[0]['price'] = 500
+        with freeze_time('2026-02-01'):
+            ProductImporter(supplier, incremental=True).import_items(goods, {})
+            deactivate_missing_products(supplier.id, {'SKU-0', 'SKU-1'})
+
+        updated_at = dict(Product.objects.filter(supplier=supplier).values_list('sku', 'updated_at__month'))
+        assert updated_at == {'SKU-0': 2, 'SKU-1': 1, 'SKU-2': 2}
+
+    def test_import_fills_search_vector(self):
+        supplier = SupplierFactory()
+        goods = make_goods(2)
+        goods[0]['name'] = 'Смартфон Galaxy'
+        ProductImporter(supplier).import_items(goods, {})
+
+        goods[0]['name'] = 'Планшет Galaxy'
+        ProductImporter(supplier).import_items(goods, {})
+
+        found = Product.objects.filter(search_vector=SearchQuery('планшеты', config='russian'))
+        assert list(found.values_list('sku', flat=True)) == ['SKU-0']
+        assert not Product.objects.filter(search_vector=SearchQuery('смартфон', config='russian')).exists()
+
+    def test_import_bumps_catalog_version_only_on_changes(self, django_capture_on_commit_callbacks):
+        supplier = SupplierFactory()
+        with django_capture_on_commit_callbacks(execute=True):
+            ProductImporter(supplier).import_items(make_goods(5), {})
+        supplier.refresh_from_db()
+        assert supplier.catalog_version == 1
+
+        # Повторный инкрементальный импорт ничего не меняет
+        with django_capture_on_commit_callbacks(execute=True):
+            ProductImporter(supplier, incremental=True).import_items(make_goods(5), {})
+        supplier.refresh_from_db()
+        assert supplier.catalog_version == 1
+
+
+@pytest.mark.django_db
+class TestDeactivateMissingProducts:
+    def test_deactivates_in_single_update(self, django_capture_on_commit_callbacks):
+        supplier = SupplierFactory()
+        kept = ProductFactory(sku='SKU-1', supplier=supplier)
+        missing = [ProductFactory(sku=f'SKU-OLD-{i}', supplier=supplier) for i in range(3)]
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            with CaptureQueriesContext(connection) as queries:
+                deactivated = deactivate_missing_products(supplier.id, {'SKU-1', 'SKU-NEW'})
+
+        assert deactivated == 3
+        assert len(queries) == 1
+        # Версия каталога увеличивается после фиксации транзакции
+        assert len(callbacks) == 1
+        kept.refresh_from_db()
+        assert kept.is_active
+        for product in missing:
+            product.refresh_from_db()
+            assert not product.is_active
+
+    def test_empty_sku_set_deactivates_nothing(self):
+        product = ProductFactory(sku='SKU-1')
+        assert deactivate_missing_products(product.supplier_id, set()) == 0
+        product.refresh_from_db()
+        assert product.is_active
+
+
+class TestImportErrorReport:
+    def test_keeps_at_most_limit_errors(self, tmp_path):
+        report = ImportErrorReport(limit=2)
+        for row in range(5):
+            report.add('Неверная цена', row=row, sku=f'SKU-{row}', field='price')
+        report.add('Ошибка базы данных', code='database_error')
+
+        assert report.total == 6
+        assert report.counts == {'invalid_value': 5, 'database_error': 1}
+
+        path = report.write(str(tmp_path / 'errors.jsonl'))
+        with open(path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        assert lines == [
+            {'row': 0, 'sku': 'SKU-0', 'field': 'price', 'code': 'invalid_value', 'reason': 'Неверная цена'},
+            {'row': 1, 'sku': 'SKU-1', 'field': 'price', 'code': 'invalid_value', 'reason': 'Неверная цена'},
+        ]
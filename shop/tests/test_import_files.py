@@ -0,0 +1,74 @@
+import hashlib
+import os
+import pytest
+import time
+
+from shop.import_files import (
+    CHUNKS_DIR, cleanup_import_files, imports_dir, release_import_file, start_import,
+    store_import_file, store_import_text
+)
+from shop.import_progress import get_import_progress
+from .factories import SupplierFactory
+
+
+class TestStoreImportFile:
+    def test_stores_file_under_content_hash(self):
+        path, digest = store_import_file([b'goods:\n', '  - id: 1\n'])
+
+        content = b'goods:\n  - id: 1\n'
+        assert digest == hashlib.sha256(content).hexdigest()
+        assert path == os.path.join(imports_dir(), f'{digest}.yaml')
+        with open(path, 'rb') as f:
+            assert f.read() == content
+
+    def test_identical_content_is_stored_once(self):
+        first_path, first_digest = store_import_text('goods: []\n')
+        second_path, second_digest = store_import_file([b'goods: []\n'])
+
+        assert (first_path, first_digest) == (second_path, second_digest)
+        # Временные файлы не остаются
+        assert os.listdir(imports_dir()) == [os.path.basename(first_path)]
+
+
+@pytest.mark.django_db
+class TestImportFileCleanup:
+    def test_successful_import_removes_stored_file(self):
+        supplier = SupplierFactory()
+        path, digest = store_import_text('goods:\n  - id: SKU-1\n    name: Product\n    price: 100\n')
+
+        task_id, duplicate = start_import(supplier, path, digest)
+
+        assert get_import_progress(task_id)['status'] == 'finished'
+        assert not os.path.exists(path)
+
+    def test_failed_import_keeps_stored_file(self):
+        supplier = SupplierFactory()
+        path, digest = store_import_text('goods: []\n')
+
+        start_import(supplier, path, digest, mode='merge')
+
+        # Файл неудачного импорта удалит cleanup_import_files
+        assert os.path.exists(path)
+
+    def test_files_not_started_by_start_import_are_kept(self, tmp_path):
+        path = tmp_path / 'feed.yaml'
+        path.write_text('goods: []\n', encoding='utf-8')
+
+        assert not release_import_file(str(path))
+        assert path.exists()
+
+    def test_removes_expired_files(self):
+        old_feed, _ = store_import_text('goods: []\n')
+        new_feed, _ = store_import_text('goods:\n  - id: 1\n')
+        old_report = os.path.join(imports_dir(), 'run-1.errors.jsonl')
+        open(old_report, 'w').close()
+        old_chunks = imports_dir(CHUNKS_DIR, 'run-1')
+        open(os.path.join(old_chunks, '000000.json'), 'w').close()
+
+        expired = time.time() - 7200
+        for path in (old_feed, old_report, old_chunks):
+            os.utime(path, (expired, expired))
+
+        assert cleanup_import_files(max_age=3600) == 3
+        assert sorted(os.listdir(imports_dir())) == sorted([os.path.basename(new_feed), CHUNKS_DIR])
+        assert os.listdir(imports_dir(CHUNKS_DIR)) == []
@@ -0,0 +1,60 @@
+from datetime import timedelta
+from django.utils import timezone
+from freezegun import freeze_time
+
+from shop.import_queue import SupplierImportQueue
+
+
+class TestSupplierImportQueue:
+    def test_one_import_per_supplier(self):
+        first = SupplierImportQueue(101, 'task-1')
+        second = SupplierImportQueue(101, 'task-2')
+
+        assert first.acquire()
+        assert not second.acquire()
+
+        # Импорт другого поставщика выполняется параллельно
+        assert SupplierImportQueue(102, 'task-3').acquire()
+
+        first.release()
+        assert second.acquire()
+        second.release()
+
+    def test_release_by_other_owner_keeps_lock(self):
+        first = SupplierImportQueue(103, 'task-1')
+        assert first.acquire()
+
+        SupplierImportQueue(103, 'task-2').release()
+        assert not SupplierImportQueue(103, 'task-3').acquire()
+        first.release()
+
+    def test_newer_import_supersedes_waiting_one(self):
+        waiting = SupplierImportQueue(104, 'task-1')
+        newer = SupplierImportQueue(104, 'task-2')
+
+        waiting.submit()
+        assert not waiting.is_superseded()
+
+        newer.submit()
+        assert waiting.is_superseded()
+        assert not newer.is_superseded()
+
+    def test_renew_extends_lock(self, settings):
+        settings.IMPORT_LOCK_TTL = 60
+        lock = SupplierImportQueue(105, 'task-1')
+        assert lock.acquire()
+
+        # Продление сдвигает срок блокировки от текущего момента
+        with freeze_time(timezone.now() + timedelta(seconds=50)):
+            assert lock.renew()
+        with freeze_time(timezone.now() + timedelta(seconds=100)):
+            assert not SupplierImportQueue(105, 'task-2').acquire()
+
+        # Истекшая блокировка, которую никто не занял, занимается заново
+        with freeze_time(timezone.now() + timedelta(seconds=300)):
+            assert lock.renew()
+            assert not SupplierImportQueue(105, 'task-2').acquire()
+
+    def test_renew_does_not_take_foreign_lock(self):
+        assert SupplierImportQueue(106, 'task-1').acquire()
+        assert not SupplierImportQueue(106, 'task-2').renew()
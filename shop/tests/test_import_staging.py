@@ -0,0 +1,106 @@
+import pytest
+from django.db import connection
+from freezegun import freeze_time
+from django.test.utils import CaptureQueriesContext
+
+from shop.import_engine import resolve_categories
+from shop.import_staging import (
+    ReplaceValidationError, StagingImporter, discard_staged_products, swap_staged_products
+)
+from shop.models import Product, StagedProduct
+from .factories import SupplierFactory, ProductFactory
+
+
+def stage(supplier, items, run_id='run-1'):
+    categories = resolve_categories([{'id': 1, 'name': 'Смартфоны'}])
+    importer = StagingImporter(supplier, run_id, chunk_size=2)
+    importer.import_items(items, categories)
+    return importer
+
+
+def item(sku, price=100, **kwargs):
+    return {'id': sku, 'name': f'Product {sku}', 'price': price, 'category': 1, 'quantity': 1, **kwargs}
+
+
+@pytest.mark.django_db
+class TestStagingImporter:
+    def test_does_not_touch_products(self):
+        supplier = SupplierFactory()
+        ProductFactory(sku='SKU-1', supplier=supplier, price=1)
+
+        importer = stage(supplier, [item('SKU-1'), item('SKU-2'), {'id': 'SKU-3', 'name': 'Bad', 'price': 'abc'}])
+
+        assert importer.result() == {"staged": 2, "errors": 1, "error_summary": {"invalid_value": 1}}
+        assert StagedProduct.objects.filter(run_id='run-1').count() == 2
+        assert float(Product.objects.get(sku='SKU-1').price) == 1
+        assert not Product.objects.filter(sku='SKU-2').exists()
+
+
+@pytest.mark.django_db
+class TestSwapStagedProducts:
+    def test_replaces_catalog(self):
+        supplier = SupplierFactory()
+        other = ProductFactory(sku='SKU-OTHER')
+        stage(supplier, [item('SKU-1'), item('SKU-2')], run_id='previous')
+        swap_staged_products(supplier.id, 'previous')
+        ProductFactory(sku='SKU-OLD', supplier=supplier)
+        ProductFactory(sku=None, supplier=supplier, name='Old without SKU')
+
+        # SKU-1 не изменился, у SKU-2 новая цена (повтор SKU: побеждает последняя строка)
+        stage(supplier, [
+            item('SKU-1'), item('SKU-2', price=150), item('SKU-3'), item('SKU-2', price=200),
+            {'name': 'New without SKU', 'price': 10},
+        ])
+        with CaptureQueriesContext(connection) as queries:
+            result = swap_staged_products(supplier.id, 'run-1')
+
+        assert result == {"created": 2, "updated": 1, "unchanged": 1, "deactivated": 2}
+        # Число запросов не зависит от размера каталога
+        assert len(queries) <= 10
+
+        active = set(Product.objects.filter(supplier=supplier, is_active=True).values_list('name', flat=True))
+        assert active == {'Product SKU-1', 'Product SKU-2', 'Product SKU-3', 'New without SKU'}
+        assert float(Product.objects.get(sku='SKU-2').price) == 200
+        assert Product.objects.get(sku='SKU-3').category.name == 'Смартфоны'
+        assert not Product.objects.get(sku='SKU-OLD').is_active
+        assert not Product.objects.get(name='Old without SKU').is_active
+        assert Product.objects.get(pk=other.pk).is_active
+        assert not StagedProduct.objects.exists()
+
+    def test_swap_sets_updated_at_of_changed_products(self):
+        supplier = SupplierFactory()
+        with freeze_time('2026-01-01'):
+            stage(supplier, [item('SKU-1'), item('SKU-2'), item('SKU-3')], run_id='previous')
+            swap_staged_products(supplier.id, 'previous')
+
+        stage(supplier, [item('SKU-1'), item('SKU-2', price=150)])
+        with freeze_time('2026-02-01'):
+            swap_staged_products(supplier.id, 'run-1')
+
+        updated_at = dict(Product.objects.filter(supplier=supplier).values_list('sku', 'updated_at__month'))
+        # Неизмененный товар сохраняет время изменения, измененный и деактивированный - получают новое
+        assert updated_at == {'SKU-1': 1, 'SKU-2': 2, 'SKU-3': 2}
+
+    @pytest.mark.parametrize('items', [
+        [],
+        [item('SKU-1'), {'id': 'SKU-2', 'name': 'Bad', 'price': 'abc'}],
+    ])
+    def test_invalid_catalog_is_not_swapped(self, items):
+        supplier = SupplierFactory()
+        ProductFactory(sku='SKU-OLD', supplier=supplier)
+        importer = stage(supplier, items)
+
+        with pytest.raises(ReplaceValidationError):
+            swap_staged_products(supplier.id, 'run-1', errors=importer.errors)
+
+        assert Product.objects.get(sku='SKU-OLD').is_active
+        assert not Product.objects.filter(sku='SKU-1').exists()
+        assert not StagedProduct.objects.exists()
+
+    def test_discard_staged_products(self):
+        supplier = SupplierFactory()
+        stage(supplier, [item('SKU-1')], run_id='crashed')
+        stage(supplier, [item('SKU-1')], run_id='current')
+
+        assert discard_staged_products(supplier.id, keep_run_id='current') == 1
+        assert list(StagedProduct.objects.values_list('run_id', flat=True)) == ['current']
@@ -0,0 +1,141 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from shop.feed_formats import iter_csv_price_list
+from shop.import_errors import ImportErrorReport
+from shop.import_validation import validate_price_list
+from shop.models import Category, Product
+from shop.yaml_stream import iter_price_list
+from .factories import SupplierFactory, ProductFactory, CategoryFactory
+
+
+YAML_FEED = """
+categories:
+  - id: 1
+    name: Смартфоны
+  - id: 2
+    name: Новая категория
+goods:
+  - id: SKU-1
+    category: 1
+    name: Product 1
+    price: 100
+    quantity: 5
+  - id: SKU-2
+    category: 1
+    name: Product 2
+    price: 200
+    quantity: 5
+  - id: SKU-3
+    category: 2
+    name: Product 3
+    price: 300
+  - id: SKU-4
+    category: 9
+    name: Product 4
+    price: 400
+  - id: SKU-5
+    name: Product 5
+    price: abc
+  - id: SKU-6
+    name: Product 6
+  - id: SKU-1
+    name: Product 1
+    price: 100
+  - id: SKU-7
+    name: Product 7
+    price: -1
+"""
+
+
+@pytest.mark.django_db
+class TestValidatePriceList:
+    def _existing_products(self, supplier):
+        category = CategoryFactory(name='Смартфоны')
+        # SKU-1 совпадает с прайс-листом, у SKU-2 изменилась цена
+        for sku, name, price in (('SKU-1', 'Product 1', 100), ('SKU-2', 'Product 2', 150)):
+            ProductFactory(sku=sku, supplier=supplier, name=name, price=price, stock=5, category=category,
+                           description='', characteristics={}, is_active=True)
+        ProductFactory(sku='SKU-OLD', supplier=supplier)
+
+    def test_returns_diff_summary(self):
+        supplier = SupplierFactory()
+        self._existing_products(supplier)
+        report = ImportErrorReport()
+
+        result = validate_price_list(supplier, iter_price_list(YAML_FEED), error_report=report)
+
+        assert result == {
+            "valid": False,
+            "total": 8,
+            "new": 1,
+            "changed": 1,
+            "unchanged": 1,
+            "invalid": 5,
+            "missing": 1,
+            "categories": {"new": 1, "existing": 1},
+            "error_summary": {
+                "unknown_category": 1, "invalid_value": 2, "missing_field": 1, "duplicate_sku": 1
+            },
+        }
+        assert [(error['row'], error['sku'], error['field']) for error in report.errors] == [
+            (4, 'SKU-4', 'category'), (5, 'SKU-5', 'price'), (6, 'SKU-6', 'price'),
+            (7, 'SKU-1', 'id'), (8, 'SKU-7', 'price'),
+        ]
+
+    def test_does_not_write(self):
+        supplier = SupplierFactory()
+        self._existing_products(supplier)
+        prices = dict(Product.objects.values_list('sku', 'price'))
+
+        validate_price_list(supplier, iter_price_list(YAML_FEED))
+
+        assert dict(Product.objects.values_list('sku', 'price')) == prices
+        assert not Category.objects.filter(name='Новая категория').exists()
+
+    def test_valid_feed(self):
+        supplier = SupplierFactory()
+        result = validate_price_list(supplier, iter_price_list(
+            "goods:\n  - id: SKU-1\n    name: Product 1\n    price: 100\n"
+        ))
+        assert result['valid']
+        assert result['new'] == 1
+        assert result['error_summary'] == {}
+
+    def test_non_finite_price_is_row_error(self):
+        supplier = SupplierFactory()
+        report = ImportErrorReport()
+        yaml_data = "goods:\n" + "".join(
+            f"  - id: SKU-{i}\n    name: Product {i}\n    price: {price}\n"
+            for i, price in enumerate(['100', '.nan', '.inf', 'NaN', '-Infinity'])
+        )
+
+        result = validate_price_list(supplier, iter_price_list(yaml_data), error_report=report)
+
+        # Ошибкой считается строка, а не проверка целиком
+        assert (result['new'], result['invalid']) == (1, 4)
+        assert result['error_summary'] == {'invalid_value': 4}
+        assert {error['field'] for error in report.errors} == {'price'}
+
+    def test_uses_one_query_per_chunk(self):
+        supplier = SupplierFactory()
+        yaml_data = "categories:\n  - id: 1\n    name: Смартфоны\ngoods:\n" + "".join(
+            f"  - id: SKU-{i}\n    category: 1\n    name: Product {i}\n    price: 100\n" for i in range(50)
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            result = validate_price_list(supplier, iter_price_list(yaml_data), chunk_size=10)
+
+        # Категории, пять пачек товаров и подсчет отсутствующих товаров
+        assert len(queries) == 7
+        assert result['new'] == 50
+
+    def test_csv_categories_between_goods(self):
+        supplier = SupplierFactory()
+        data = 'id,category,name,price\nSKU-1,Смартфоны,Phone,100\nSKU-2,Телевизоры,TV,200\n'
+
+        result = validate_price_list(supplier, iter_csv_price_list(data))
+
+        assert result['valid']
+        assert result['categories'] == {"new": 2, "existing": 0}
@@ -1,7 +1,10 @@
 import pytest
 from decimal import Decimal
 from django.contrib.auth import get_user_model
-from shop.models import Product
+from django.contrib.postgres.search import SearchQuery
+from django.core.cache import cache
+from django.db import DataError, IntegrityError, transaction
+from shop.models import CATEGORY_VERSION_KEY, Category, Product
 from .factories import (
     UserFactory, SupplierFactory, CategoryFactory, ProductFactory,
     DeliveryAddressFactory, OrderFactory, OrderItemFactory, CartItemFactory
@@ -34,6 +37,56 @@ class TestSupplierModel:
         assert supplier.user.is_supplier() is True
         assert str(supplier) == supplier.user.company_name or supplier.user.username
 
+    def test_catalog_version_bumps_on_product_write(self, django_capture_on_commit_callbacks):
+        supplier = SupplierFactory()
+        assert supplier.catalog_version == 0
+
+        with django_capture_on_commit_callbacks(execute=True):
+            product = ProductFactory(supplier=supplier)
+        with django_capture_on_commit_callbacks(execute=True):
+            product.stock = 5
+            product.save()
+        supplier.refresh_from_db()
+        assert supplier.catalog_version == 2
+
+        # Переименование категории меняет экспорт ее товаров
+        with django_capture_on_commit_callbacks(execute=True):
+            product.category.name = 'Новая категория'
+            product.category.save()
+        with django_capture_on_commit_callbacks(execute=True):
+            product.delete()
+        supplier.refresh_from_db()
+        assert supplier.catalog_version == 4
+
+    def test_catalog_version_bumps_on_queryset_delete(self, django_capture_on_commit_callbacks):
+        supplier = SupplierFactory()
+        other = SupplierFactory()
+        ProductFactory.create_batch(2, supplier=supplier)
+        category = CategoryFactory()
+        ProductFactory(supplier=other, category=category)
+
+        # Удаление через QuerySet, как в действии админки
+        with django_capture_on_commit_callbacks(execute=True):
+            Product.objects.filter(supplier=supplier).delete()
+        with django_capture_on_commit_callbacks(execute=True):
+            Category.objects.filter(pk=category.pk).delete()
+
+        supplier.refresh_from_db()
+        other.refresh_from_db()
+        assert supplier.catalog_version > 0
+        assert other.catalog_version > 0
+
+    def test_catalog_version_not_bumped_on_rollback(self, django_capture_on_commit_callbacks):
+        product = ProductFactory()
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                product.save()
+                transaction.set_rollback(True)
+
+        assert callbacks == []
+        product.supplier.refresh_from_db()
+        assert product.supplier.catalog_version == 0
+
 
 @pytest.mark.django_db
 class TestCategoryModel:
@@ -42,6 +95,56 @@ class TestCategoryModel:
         assert category.pk is not None
         assert str(category) == category.name
 
+    def test_name_is_unique(self):
+        CategoryFactory(name='Смартфоны')
+        with pytest.raises(IntegrityError):
+            with transaction.atomic():
+                Category.objects.create(name='Смартфоны')
+
+    def test_resolve_ids_uses_bulk_queries(self, django_assert_max_num_queries):
+        existing = CategoryFactory(name='Смартфоны')
+
+        # Один SELECT существующих, один INSERT ... ON CONFLICT и один SELECT новых
+        with django_assert_max_num_queries(3):
+            ids = Category.resolve_ids(['Смартфоны', 'Телевизоры', 'Аксессуары'])
+
+        assert ids['Смартфоны'] == existing.pk
+        assert set(ids) == {'Смартфоны', 'Телевизоры', 'Аксессуары'}
+        assert Category.objects.count() == 3
+
+    def test_resolve_ids_cache(self, django_assert_num_queries, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            ids = Category.resolve_ids(['Смартфоны'])
+
+        # После фиксации транзакции название берется из кэша
+        with django_assert_num_queries(0):
+            assert Category.resolve_ids(['Смартфоны']) == ids
+
+        # Создание категории сбрасывает кэш
+        CategoryFactory(name='Телевизоры')
+        with django_assert_num_queries(1):
+            assert Category.resolve_ids(['Смартфоны']) == ids
+
+    def test_resolve_ids_cache_after_queryset_delete(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            old_id = Category.resolve_ids(['Смартфоны'])['Смартфоны']
+            Category.objects.filter(name='Смартфоны').delete()
+
+        # Удаленная категория создается заново, а не берется из кэша
+        new_id = Category.resolve_ids(['Смартфоны'])['Смартфоны']
+        assert new_id != old_id
+        assert Category.objects.filter(pk=new_id).exists()
+
+    def test_resolve_ids_cache_changed_in_other_process(self, django_assert_num_queries,
+                                                        django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            ids = Category.resolve_ids(['Смартфоны'])
+
+        # Другой процесс изменил категории и сменил версию в общем кэше
+        cache.set(CATEGORY_VERSION_KEY, 'other-process')
+        with django_assert_num_queries(1):
+            assert Category.resolve_ids(['Смартфоны']) == ids
+
 
 @pytest.mark.django_db
 class TestProductModel:
@@ -53,6 +156,19 @@ class TestProductModel:
         assert product.stock == 100
         assert product.is_active is True
 
+    def test_search_vector_kept_current(self):
+        product = ProductFactory(name='Смартфон Apple', description='Черный корпус')
+        assert Product.objects.filter(search_vector=SearchQuery('смартфоны', config='russian')).exists()
+
+        product.name = 'Ноутбук Apple'
+        product.save()
+        assert not Product.objects.filter(search_vector=SearchQuery('смартфон', config='russian')).exists()
+        assert Product.objects.filter(search_vector=SearchQuery('ноутбук', config='russian')).exists()
+
+        # Пакетные запросы обновляют вектор так же, как save()
+        Product.objects.filter(pk=product.pk).update(description='Серебристый корпус')
+        assert Product.objects.filter(search_vector=SearchQuery('серебристый', config='russian')).exists()
+
     def test_product_to_dict(self):
         product = ProductFactory()
         product_dict = product.to_dict()
@@ -89,6 +205,14 @@ class TestProductModel:
         assert product.sku == product_data['sku']
         assert product.supplier == supplier
 
+    def test_product_from_dict_raises_database_error(self):
+        supplier = SupplierFactory()
+
+        # Ошибка записи не подменяется DoesNotExist
+        with pytest.raises(DataError):
+            Product.from_dict({'name': 'x' * 300, 'price': 10, 'sku': 'LONG-NAME'}, supplier)
+        assert not Product.objects.filter(sku='LONG-NAME').exists()
+
 
 @pytest.mark.django_db
 class TestDeliveryAddressModel:
@@ -0,0 +1,46 @@
+import pytest
+from django.core.management import call_command
+
+from shop.import_engine import ProductImporter
+from shop.models import Product
+from shop.price_list_generator import generate_goods, generate_price_list
+from shop.yaml_stream import open_price_list
+from .factories import SupplierFactory
+
+
+class TestGenerateGoods:
+    def test_same_parameters_give_same_goods(self):
+        assert list(generate_goods(20, 5)) == list(generate_goods(20, 5))
+
+    def test_revision_changes_only_share_of_goods(self):
+        base = list(generate_goods(100, 5))
+        changed = list(generate_goods(100, 5, changed=0.3, revision=1))
+
+        assert [item['id'] for item in base] == [item['id'] for item in changed]
+        differences = sum(1 for old, new in zip(base, changed) if old != new)
+        assert 0 < differences < 100
+
+    def test_duplicates_repeat_earlier_skus(self):
+        goods = list(generate_goods(100, 5, duplicates=0.5))
+        assert len({item['id'] for item in goods}) < 100
+
+    def test_price_list_shape(self):
+        data = generate_price_list(3, categories=2)
+        assert [category['id'] for category in data['categories']] == [1, 2]
+        assert {'id', 'category', 'name', 'price', 'quantity', 'parameters'} <= set(data['goods'][0])
+
+
+@pytest.mark.django_db
+class TestGeneratePriceListCommand:
+    def test_generated_file_imports(self, tmp_path):
+        path = tmp_path / 'price.yaml'
+        call_command('generate_price_list', str(path), goods=50, categories=3)
+
+        supplier = SupplierFactory()
+        importer = ProductImporter(supplier)
+        with open_price_list(filename=str(path)) as entries:
+            importer.import_price_list(entries)
+
+        assert importer.created == 50
+        assert importer.errors == 0
+        assert Product.objects.filter(supplier=supplier, category__name='Категория 1').exists()
@@ -0,0 +1,53 @@
+import pytest
+from unittest.mock import patch
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from shop.models import Product
+from shop.search import fuzzy_search, fuzzy_search_threshold
+
+
+def current_threshold():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT current_setting('pg_trgm.word_similarity_threshold', true)")
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestFuzzySearchThreshold:
+    def test_threshold_is_local_to_transaction(self, settings):
+        settings.SEARCH_FUZZY_THRESHOLD = 0.25
+
+        with patch('shop.search.trigram_available', return_value=True):
+            with fuzzy_search_threshold():
+                assert current_threshold() == '0.25'
+
+        # После транзакции порог не остается в соединении
+        assert current_threshold() != '0.25'
+
+    def test_threshold_not_set_without_pg_trgm(self):
+        with patch('shop.search.trigram_available', return_value=False):
+            with CaptureQueriesContext(connection) as queries:
+                with fuzzy_search_threshold():
+                    assert transaction.get_connection().in_atomic_block
+
+        assert not any('set_config' in query['sql'] for query in queries)
+
+
+@pytest.mark.django_db
+class TestFuzzySearch:
+    def test_filters_by_operator_and_threshold(self, settings):
+        settings.SEARCH_FUZZY_THRESHOLD = 0.4
+
+        with patch('shop.search.trigram_available', return_value=True):
+            sql = str(fuzzy_search(Product.objects.all(), 'iphnoe').query)
+
+        # Оператор %> отбирает по индексу, условие на сходство не зависит от порога сессии
+        assert '%>' in sql
+        assert 'WORD_SIMILARITY' in sql.upper() and '>= 0.4' in sql
+
+    def test_falls_back_to_full_text_search(self):
+        with patch('shop.search.trigram_available', return_value=False):
+            sql = str(fuzzy_search(Product.objects.all(), 'смартфоны').query)
+
+        assert '%>' not in sql
+        assert 'websearch_to_tsquery' in sql
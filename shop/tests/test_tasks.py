@@ -1,16 +1,31 @@
+import json
+import os
 import pytest
 from unittest.mock import patch, MagicMock
+from django.core.cache import cache
 
 from shop.tasks import (
     send_email, send_order_confirmation_email,
-    send_supplier_order_notification, do_import
+    send_supplier_order_notification, do_import, finalize_import, import_products_chunk
 )
+from shop.import_files import imports_dir
+from shop.import_progress import get_import_progress
+from shop.import_queue import SupplierImportQueue
 from .factories import (
     UserFactory, SupplierFactory, ProductFactory,
     OrderFactory, OrderItemFactory
 )
 
 
+YAML_ONE_PRODUCT = """
+goods:
+  - id: SKU-QUEUE-1
+    name: Product 1
+    price: 100
+    quantity: 1
+"""
+
+
 @pytest.mark.django_db
 class TestEmailTasks:
     @patch('shop.tasks.EmailMultiAlternatives')
@@ -121,3 +136,332 @@ class TestImportTask:
         assert product.supplier == supplier
         assert product.category.name == 'Electronics'
         assert product.characteristics == {'color': 'red', 'size': 'M'}
+
+    def test_do_import_in_parallel_chunks(self):
+        supplier = SupplierFactory()
+        goods = "\n".join(
+            f"""
+          - id: SKU-{i}
+            name: Product {i}
+            price: {100 + i}
+            category: 1
+            quantity: {i}"""
+            for i in range(5)
+        )
+        yaml_data = f"""
+        categories:
+          - id: 1
+            name: Electronics
+        goods:{goods}
+        """
+
+        # Пять товаров по два в подзадаче - три части
+        async_result = do_import.apply(args=(supplier.id,), kwargs={'yaml_data': yaml_data, 'chunk_size': 2})
+        result = async_result.get()
+
+        assert result == {"success": True, "created": 5, "updated": 0, "errors": 0, "total": 5}
+
+        # Прогресс частей складывается в прогресс исходной задачи
+        progress = get_import_progress(async_result.id)
+        assert progress['status'] == 'finished'
+        assert progress['processed'] == 5
+        assert progress['created'] == 5
+        assert progress['total'] == 5
+
+        # Файлы частей удаляются после сборки результата
+        assert os.listdir(imports_dir('chunks')) == []
+
+        from shop.models import Product, Category
+        assert Product.objects.filter(supplier=supplier).count() == 5
+        assert Category.objects.filter(name='Electronics').count() == 1
+        assert Product.objects.get(sku='SKU-4').category.name == 'Electronics'
+
+        # Повторный импорт при прямом вызове задачи обновляет товары
+        result = do_import(supplier.id, yaml_data=yaml_data, chunk_size=2)
+        assert result['created'] == 0
+        assert result['updated'] == 5
+
+    @pytest.mark.parametrize('chunk_size', [2, 100])
+    def test_do_import_sync_deactivates_missing_products(self, chunk_size):
+        from shop.models import Product
+
+        supplier = SupplierFactory()
+        ProductFactory(sku='SKU-OLD', supplier=supplier)
+        ProductFactory(sku=None, supplier=supplier)
+        ProductFactory(sku='SKU-OTHER')
+
+        yaml_data = "goods:\n" + "".join(
+            f"  - id: SKU-{i}\n    name: Product {i}\n    price: 100\n    quantity: 1\n"
+            for i in range(3)
+        )
+        result = do_import(supplier.id, yaml_data=yaml_data, chunk_size=chunk_size, mode='sync')
+
+        assert result['created'] == 3
+        assert result['deactivated'] == 1
+        assert not Product.objects.get(sku='SKU-OLD').is_active
+        # Товары без SKU и товары других поставщиков не затрагиваются
+        assert Product.objects.get(supplier=supplier, sku=None).is_active
+        assert Product.objects.get(sku='SKU-OTHER').is_active
+
+    def test_do_import_waits_for_running_import(self):
+        supplier = SupplierFactory()
+        running = SupplierImportQueue(supplier.id, 'running-task')
+        running.submit()
+        running.acquire()
+
+        # При прямом вызове задача не ждет очереди, а сразу возвращает ошибку
+        result = do_import(supplier.id, yaml_data=YAML_ONE_PRODUCT)
+        assert result == {"error": "Another import for this supplier is running"}
+
+        running.release()
+        assert do_import(supplier.id, yaml_data=YAML_ONE_PRODUCT)['created'] == 1
+
+    def test_do_import_superseded_by_newer_import(self):
+        supplier = SupplierFactory()
+        SupplierImportQueue(supplier.id, 'old-task').submit()
+        SupplierImportQueue(supplier.id, 'new-task').submit()
+
+        # Повторная попытка ожидающего импорта после постановки нового
+        async_result = do_import.apply(
+            args=(supplier.id,), kwargs={'yaml_data': YAML_ONE_PRODUCT}, task_id='old-task', retries=1
+        )
+
+        assert async_result.get() == {"error": "Superseded by a newer import"}
+        assert get_import_progress('old-task')['status'] == 'superseded'
+
+    @pytest.mark.parametrize('chunk_size', [2, 100])
+    def test_do_import_writes_error_report(self, chunk_size, settings):
+        supplier = SupplierFactory()
+        yaml_data = "goods:\n" + "".join(
+            f"  - id: SKU-ERR-{i}\n    name: Product {i}\n    price: {'abc' if i % 2 else 100}\n"
+            for i in range(5)
+        )
+
+        result = do_import(supplier.id, yaml_data=yaml_data, chunk_size=chunk_size)
+
+        assert result['created'] == 3
+        assert result['errors'] == 2
+        assert result['error_summary'] == {'invalid_value': 2}
+        assert result['error_report'].startswith(settings.MEDIA_URL)
+
+        path = os.path.join(settings.MEDIA_ROOT, result['error_report'][len(settings.MEDIA_URL):])
+        with open(path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        assert [(row['row'], row['sku'], row['field']) for row in rows] == [
+            (2, 'SKU-ERR-1', 'price'), (4, 'SKU-ERR-3', 'price')
+        ]
+
+    def test_do_import_dry_run(self, settings):
+        from shop.models import Product
+        supplier = SupplierFactory()
+        ProductFactory(sku='SKU-QUEUE-1', supplier=supplier, price=50)
+        yaml_data = YAML_ONE_PRODUCT + "  - id: SKU-DRY-2\n    name: Product 2\n    price: abc\n"
+
+        # Проверка не ждет очереди поставщика
+        running = SupplierImportQueue(supplier.id, 'running-task')
+        running.submit()
+        running.acquire()
+        result = do_import(supplier.id, yaml_data=yaml_data, dry_run=True)
+        running.release()
+
+        assert result['success']
+        assert result['dry_run']
+        assert not result['valid']
+        assert (result['new'], result['changed'], result['invalid']) == (0, 1, 1)
+        assert result['error_report'].startswith(settings.MEDIA_URL)
+
+        # Товары не записываются
+        assert float(Product.objects.get(sku='SKU-QUEUE-1').price) == 50
+        assert not Product.objects.filter(sku='SKU-DRY-2').exists()
+
+    @pytest.mark.parametrize('chunk_size', [2, 100])
+    def test_do_import_csv_file(self, chunk_size, tmp_path):
+        from shop.models import Product
+        supplier = SupplierFactory()
+        path = tmp_path / 'price.csv'
+        path.write_text(
+            'id,category,name,price,quantity,Цвет\n'
+            + ''.join(f'SKU-CSV-{i},Смартфоны,Product {i},{100 + i},{i},черный\n' for i in range(5))
+            + 'SKU-CSV-BAD,Смартфоны,Product bad,abc,1,\n',
+            encoding='utf-8'
+        )
+
+        result = do_import(supplier.id, filename=str(path), chunk_size=chunk_size)
+
+        assert result['created'] == 5
+        assert result['errors'] == 1
+        product = Product.objects.get(sku='SKU-CSV-3')
+        assert float(product.price) == 103
+        assert product.stock == 3
+        assert product.category.name == 'Смартфоны'
+        assert product.characteristics == {'Цвет': 'черный'}
+
+    @pytest.mark.parametrize('chunk_size', [2, 100])
+    def test_do_import_date_parameters(self, chunk_size):
+        from shop.models import Product
+        supplier = SupplierFactory()
+        yaml_data = "goods:\n" + "".join(
+            f"  - id: SKU-DATE-{i}\n    name: Product {i}\n    price: 100\n"
+            f"    parameters:\n      Дата выпуска: 2024-01-0{i + 1}\n"
+            for i in range(3)
+        )
+
+        # Небольшой и разбитый на части прайс-лист сохраняют дату одинаково
+        result = do_import(supplier.id, yaml_data=yaml_data, chunk_size=chunk_size)
+
+        assert (result['created'], result['errors']) == (3, 0)
+        assert Product.objects.get(sku='SKU-DATE-2').characteristics == {'Дата выпуска': '2024-01-03'}
+
+    def test_do_import_csv_file_with_late_categories(self, tmp_path):
+        from shop.models import Product
+        supplier = SupplierFactory()
+        path = tmp_path / 'price.csv'
+        path.write_text(
+            'id,category,name,price\n'
+            + ''.join(f'SKU-CSV-{i},Категория {i},Product {i},100\n' for i in range(6)),
+            encoding='utf-8'
+        )
+
+        # Категории последней части впервые встречаются после второй части
+        result = do_import(supplier.id, filename=str(path), chunk_size=2)
+
+        assert result['created'] == 6
+        categories = dict(Product.objects.filter(supplier=supplier).values_list('sku', 'category__name'))
+        assert categories == {f'SKU-CSV-{i}': f'Категория {i}' for i in range(6)}
+
+    @pytest.mark.parametrize('chunk_size', [2, 100])
+    def test_do_import_yml_file(self, chunk_size, tmp_path):
+        from shop.models import Product
+        supplier = SupplierFactory()
+        offers = ''.join(
+            f'<offer id="SKU-YML-{i}"><price>{100 + i}</price><categoryId>1</categoryId>'
+            f'<name>Product {i}</name><count>{i}</count><param name="Цвет">черный</param></offer>'
+            for i in range(5)
+        )
+        path = tmp_path / 'catalog.xml'
+        path.write_bytes((
+            '<?xml version="1.0" encoding="windows-1251"?><yml_catalog><shop>'
+            '<categories><category id="1">Смартфоны</category></categories>'
+            f'<offers>{offers}</offers></shop></yml_catalog>'
+        ).encode('cp1251'))
+
+        result = do_import(supplier.id, filename=str(path), chunk_size=chunk_size)
+
+        assert result['created'] == 5
+        product = Product.objects.get(sku='SKU-YML-4')
+        assert float(product.price) == 104
+        assert product.stock == 4
+        assert product.category.name == 'Смартфоны'
+        assert product.characteristics == {'Цвет': 'черный'}
+
+    def test_do_import_jsonl_string(self):
+        from shop.models import Product
+        supplier = SupplierFactory()
+        yaml_data = '{"id": "SKU-JSONL-1", "category": "Смартфоны", "name": "Product 1", "price": 100}\n'
+
+        result = do_import(supplier.id, yaml_data=yaml_data, feed_format='jsonl')
+
+        assert result['created'] == 1
+        assert Product.objects.get(sku='SKU-JSONL-1').category.name == 'Смартфоны'
+
+    @pytest.mark.parametrize('chunk_size', [2, 100])
+    def test_do_import_replace_mode(self, chunk_size):
+        from shop.models import Product, StagedProduct
+        supplier = SupplierFactory()
+        ProductFactory(sku='SKU-OLD', supplier=supplier)
+        ProductFactory(sku='SKU-KEEP', supplier=supplier, price=1)
+        yaml_data = "goods:\n" + "".join(
+            f"  - id: {sku}\n    name: {sku}\n    price: 100\n"
+            for sku in ('SKU-KEEP', 'SKU-NEW-1', 'SKU-NEW-2', 'SKU-NEW-3', 'SKU-NEW-4')
+        )
+
+        result = do_import(supplier.id, yaml_data=yaml_data, chunk_size=chunk_size, mode='replace')
+
+        assert result['success']
+        assert (result['created'], result['updated'], result['deactivated']) == (4, 1, 1)
+        assert result['total'] == 5
+        assert float(Product.objects.get(sku='SKU-KEEP').price) == 100
+        assert not Product.objects.get(sku='SKU-OLD').is_active
+        assert not StagedProduct.objects.exists()
+
+    def test_do_import_replace_mode_rejects_invalid_catalog(self):
+        from shop.models import Product, StagedProduct
+        supplier = SupplierFactory()
+        ProductFactory(sku='SKU-OLD', supplier=supplier)
+        yaml_data = "goods:\n  - id: SKU-NEW\n    name: New\n    price: abc\n"
+
+        result = do_import(supplier.id, yaml_data=yaml_data, mode='replace')
+
+        assert result['error'] == "Price list has no valid products, catalog was not replaced"
+        assert result['errors'] == 1
+        assert 'error_report' in result
+        assert Product.objects.get(sku='SKU-OLD').is_active
+        assert not StagedProduct.objects.exists()
+
+    def test_do_import_replace_mode_rejects_failed_chunk(self):
+        from shop.import_staging import StagingImporter
+        from shop.models import Product, StagedProduct
+        supplier = SupplierFactory()
+        ProductFactory(sku='SKU-OLD', supplier=supplier)
+        yaml_data = "goods:\n" + "".join(
+            f"  - id: SKU-NEW-{i}\n    name: New {i}\n    price: 100\n" for i in range(5)
+        )
+        import_items = StagingImporter.import_items
+
+        def fail_second_chunk(importer, items, categories_dict):
+            if importer.row_offset == 2:
+                raise RuntimeError("Worker lost")
+            return import_items(importer, items, categories_dict)
+
+        # Одна из трех частей упала - без ее товаров каталог неполон
+        with patch.object(StagingImporter, 'import_items', fail_second_chunk):
+            result = do_import(supplier.id, yaml_data=yaml_data, chunk_size=2, mode='replace')
+
+        assert result['error'] == "2 products were not loaded because an import chunk failed, catalog was not replaced"
+        assert result['errors'] == 2
+        assert result['error_summary'] == {'chunk_failed': 2}
+        assert Product.objects.get(sku='SKU-OLD').is_active
+        assert not Product.objects.filter(sku__startswith='SKU-NEW').exists()
+        assert not StagedProduct.objects.exists()
+
+    def test_do_import_unknown_mode(self):
+        supplier = SupplierFactory()
+        result = do_import(supplier.id, yaml_data="goods: []", mode='merge')
+        assert result == {"error": "Unknown import mode: merge"}
+
+    def test_failed_chunk_counts_its_rows(self):
+        supplier = SupplierFactory()
+
+        # Файл части не прочитался - ошибочными считаются все товары части
+        result = import_products_chunk(supplier.id, os.path.join(imports_dir(), 'missing.json'), [], row_count=3)
+
+        assert result == {"created": 0, "updated": 0, "errors": 3, "error_summary": {'chunk_failed': 3}}
+
+    def test_chunk_renews_supplier_lock(self):
+        supplier = SupplierFactory()
+        path = os.path.join(imports_dir(), 'chunk.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([{'id': 'SKU-LOCK-1', 'name': 'Product', 'price': 100}], f)
+
+        # Блокировка импорта истекла, пока часть ждала воркера
+        assert SupplierImportQueue(supplier.id, 'long-import').acquire()
+        cache.delete(f'import_lock:{supplier.id}')
+
+        result = import_products_chunk(supplier.id, path, [], lock=[supplier.id, 'long-import'])
+
+        assert result['created'] == 1
+        assert not SupplierImportQueue(supplier.id, 'next-import').acquire()
+
+    def test_finalize_import(self):
+        result = finalize_import([
+            {"created": 2, "updated": 1, "errors": 0},
+            {"created": 0, "updated": 3, "errors": 1},
+        ])
+        assert result == {"success": True, "created": 2, "updated": 4, "errors": 1, "total": 6}
+
+    def test_finalize_import_counts_unchanged_products_in_total(self):
+        result = finalize_import([
+            {"created": 1, "updated": 1, "unchanged": 3, "errors": 0},
+            {"created": 0, "updated": 0, "unchanged": 2, "errors": 0},
+        ])
+        assert result['total'] == 7
@@ -1,8 +1,19 @@
+import gzip
 import pytest
 import os
 import tempfile
-from unittest.mock import patch, MagicMock
-from shop.utils import export_products_to_yaml, export_products_to_file, import_products_from_yaml
+import yaml
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from freezegun import freeze_time
+from django.test.utils import CaptureQueriesContext
+from shop.models import Product, Supplier
+from shop.export_cache import (
+    available_compressions, export_etag, export_path, get_export_file, iter_export, negotiate_compression, zstandard
+)
+from shop.utils import export_products_to_yaml, export_products_to_file, import_products_from_yaml, iter_products_yaml
+from shop.yaml_backend import safe_dump, safe_load
 from .factories import SupplierFactory, ProductFactory, CategoryFactory
 
 
@@ -59,26 +70,200 @@ class TestExportUtils:
         # Удаляем временный файл
         os.unlink(temp_file.name)
 
-    @patch('shop.utils.export_products_to_yaml')
-    def test_export_products_to_file(self, mock_export):
-        # Настраиваем мок
-        mock_export.return_value = 'YAML content'
+    def test_iter_products_yaml_matches_full_dump(self):
+        supplier = SupplierFactory(user__company_name='Магазин')
+        phones = CategoryFactory(name='Смартфоны')
+        tvs = CategoryFactory(name='Телевизоры')
+        for i, category in enumerate([tvs, phones, None, phones, tvs]):
+            ProductFactory(
+                supplier=supplier, category=category, name=f'Товар {i // 2}', sku=f'SKU-{i}' if i % 2 else None,
+                price=100 + i, characteristics={'Цвет': 'черный'} if i % 2 else {}
+            )
+        # libyaml экранирует эти символы, а yaml.dump - нет
+        ProductFactory(supplier=supplier, name='Товар 😀', characteristics={'Смайл 😀': 'a\x85b'})
+        ProductFactory(category=phones)
 
-        # Создаем поставщика
+        # Документ, собранный целиком, как до потоковой выгрузки
+        products = Product.objects.filter(supplier=supplier).order_by('name', 'id')
+        categories = {}
+        for product in products:
+            if product.category and product.category.id not in categories:
+                categories[product.category.id] = product.category.name
+        goods = []
+        for product in products:
+            parameters = {'description': product.description}
+            parameters.update(product.characteristics or {})
+            goods.append({
+                'id': product.sku or str(product.id),
+                'category': product.category.id if product.category else None,
+                'name': product.name,
+                'price': float(product.price),
+                'quantity': product.stock,
+                'parameters': parameters,
+            })
+        expected = yaml.dump({
+            'shop': 'Магазин',
+            'categories': [{'id': cat_id, 'name': name} for cat_id, name in categories.items()],
+            'goods': goods,
+        }, allow_unicode=True, sort_keys=False)
+
+        chunks = list(iter_products_yaml(supplier, chunk_size=2))
+
+        assert ''.join(chunks) == expected
+        assert len(chunks) > 3
+
+    def test_iter_products_yaml_query_count(self):
+        supplier = SupplierFactory()
+        for i in range(30):
+            ProductFactory(supplier=supplier, category=CategoryFactory() if i % 3 else None)
+
+        supplier = Supplier.objects.get(pk=supplier.pk)
+        with CaptureQueriesContext(connection) as queries:
+            text = ''.join(iter_products_yaml(supplier, chunk_size=7))
+
+        # Пользователь поставщика, категории и товары, независимо от их количества
+        assert len(queries) == 3
+        assert text.count('\n- id:') == 30 + 20
+
+    def test_iter_products_yaml_empty(self):
+        supplier = SupplierFactory(user__company_name='Магазин')
+        assert ''.join(iter_products_yaml(supplier)) == safe_dump(
+            {'shop': 'Магазин', 'categories': [], 'goods': []}, allow_unicode=True, sort_keys=False
+        )
+
+    def test_export_products_to_file(self, settings):
         supplier = SupplierFactory(user__company_name='Test Company')
+        ProductFactory(supplier=supplier, sku='SKU-1')
 
-        # Экспортируем товары в файл
-        with patch('shop.utils.open', MagicMock()) as mock_open:
-            filename = export_products_to_file(supplier)
+        filename = export_products_to_file(supplier)
+
+        # Файл лежит в кэше экспорта текущей версии каталога
+        assert os.path.basename(filename) == 'Test_Company_products.yaml'
+        assert filename.startswith(os.path.join(settings.MEDIA_ROOT, 'exports', str(supplier.pk)))
+        with open(filename, encoding='utf-8') as f:
+            assert f.read() == export_products_to_yaml(supplier)
+
+    def test_export_file_cached_by_catalog_version(self):
+        supplier = SupplierFactory(user__company_name='Магазин')
+        ProductFactory(supplier=supplier, sku='SKU-1', name='Товар 1')
+        filename = get_export_file(supplier)
+        etag = export_etag(supplier)
+
+        # Пока версия каталога не менялась, запросов нет совсем
+        with CaptureQueriesContext(connection) as queries:
+            assert get_export_file(supplier) == filename
+            text = b''.join(iter_export(supplier)).decode('utf-8')
+        assert len(queries) == 0
+        assert text == export_products_to_yaml(supplier)
+
+        ProductFactory(supplier=supplier, sku='SKU-2', name='Товар 2')
+        Supplier.objects.filter(pk=supplier.pk).update(catalog_version=1)
+        supplier.refresh_from_db()
+
+        new_filename = get_export_file(supplier)
+        assert new_filename != filename
+        assert export_etag(supplier) != etag
+        # Файлы старых версий удаляются
+        assert not os.path.exists(filename)
+        with open(new_filename, encoding='utf-8') as f:
+            assert 'SKU-2' in f.read()
+
+    def test_export_cache_invalidated_by_queryset_delete(self, django_capture_on_commit_callbacks):
+        supplier = SupplierFactory()
+        ProductFactory(supplier=supplier, sku='SKU-1')
+        ProductFactory(supplier=supplier, sku='SKU-2')
+        etag = export_etag(supplier)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Product.objects.filter(sku='SKU-2').delete()
+        supplier.refresh_from_db()
+
+        assert export_etag(supplier) != etag
+        with open(get_export_file(supplier), encoding='utf-8') as f:
+            assert 'SKU-2' not in f.read()
+
+    def test_iter_export_stores_only_complete_file(self):
+        supplier = SupplierFactory()
+        ProductFactory.create_batch(3, supplier=supplier)
+
+        # Клиент оборвал соединение после первой части
+        chunks = iter_export(supplier)
+        next(chunks)
+        chunks.close()
+        # Недописанный временный файл удален и в кэш не попал
+        assert os.listdir(os.path.dirname(export_path(supplier))) == []
+
+        text = b''.join(iter_export(supplier)).decode('utf-8')
+        assert text == export_products_to_yaml(supplier)
+        assert sorted(os.listdir(os.path.dirname(export_path(supplier)))) == sorted(
+            os.path.basename(export_path(supplier, compression))
+            for compression in (None,) + available_compressions()
+        )
+
+    def test_compressed_exports_stored_next_to_file(self):
+        supplier = SupplierFactory()
+        ProductFactory.create_batch(3, supplier=supplier)
+
+        # Клиент получает gzip поток, а в кэш попадают все копии
+        compressed = b''.join(iter_export(supplier, 'gzip'))
+        text = export_products_to_yaml(supplier)
+        assert gzip.decompress(compressed).decode('utf-8') == text
+
+        filename = export_products_to_file(supplier)
+        with open(filename + '.gz', 'rb') as f:
+            assert f.read() == compressed
+        assert b''.join(iter_export(supplier, 'gzip')) == compressed
+
+    def test_zstd_export(self):
+        zstandard = pytest.importorskip('zstandard')
+        supplier = SupplierFactory()
+        ProductFactory.create_batch(3, supplier=supplier)
+
+        compressed = b''.join(iter_export(supplier, 'zstd'))
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(compressed).decode('utf-8') == \
+            export_products_to_yaml(supplier)
+        assert os.path.exists(export_path(supplier, 'zstd'))
+
+    def test_iter_products_yaml_since(self, settings):
+        settings.EXPORT_DELTA_OVERLAP = 60
+        supplier = SupplierFactory()
+        category = CategoryFactory(name='Смартфоны')
+        with freeze_time('2026-01-01 10:00'):
+            old = ProductFactory(supplier=supplier, sku='SKU-OLD')
+            changed = ProductFactory(supplier=supplier, sku='SKU-CHANGED', name='A', category=category)
+            hidden = ProductFactory(supplier=supplier, sku='SKU-HIDDEN', name='B', category=category)
+
+        with freeze_time('2026-01-02 10:00'):
+            changed.price = 1
+            changed.save()
+            Product.objects.filter(pk=hidden.pk).update(is_active=False, updated_at=timezone.now())
+
+        with freeze_time('2026-01-03 10:00'):
+            data = safe_load(''.join(iter_products_yaml(supplier, since=parse_datetime('2026-01-01T12:00:00Z'))))
 
-            # Проверяем, что функция export_products_to_yaml была вызвана
-            mock_export.assert_called_once_with(supplier)
+        assert data['since'] == '2026-01-01T12:00:00+00:00'
+        assert data['next_since'] == '2026-01-03T09:59:00+00:00'
+        assert data['categories'] == [{'id': category.id, 'name': 'Смартфоны'}]
+        assert [(item['id'], item['is_active']) for item in data['goods']] == [
+            ('SKU-CHANGED', True), ('SKU-HIDDEN', False)
+        ]
+        assert old.sku not in {item['id'] for item in data['goods']}
 
-            # Проверяем, что файл был открыт для записи
-            mock_open.assert_called_once()
+    @pytest.mark.parametrize('accept_encoding, compression, expected', [
+        ('', None, None),
+        ('gzip, deflate', None, 'gzip'),
+        ('gzip;q=0, deflate', None, None),
+        ('*', None, 'zstd' if zstandard else 'gzip'),
+        ('br', None, None),
+        ('gzip', 'none', None),
+        ('', 'GZIP', 'gzip'),
+    ])
+    def test_negotiate_compression(self, accept_encoding, compression, expected):
+        assert negotiate_compression(accept_encoding, compression) == expected
 
-            # Проверяем имя файла
-            assert 'Test_Company_products.yaml' in filename
+    def test_negotiate_unknown_compression(self):
+        with pytest.raises(ValueError):
+            negotiate_compression('', 'br')
 
 
 @pytest.mark.django_db
@@ -0,0 +1,102 @@
+import io
+import os
+import pytest
+import yaml
+from django.conf import settings
+
+from shop.yaml_backend import LIBYAML, SafeLoader, safe_dump, safe_load
+from shop.simple_import import simple_import_from_yaml
+from shop.yaml_stream import iter_price_list, open_price_list
+from .factories import SupplierFactory
+
+# Потоковое чтение должно работать и с C, и с Python загрузчиком
+LOADERS = [yaml.SafeLoader] + ([yaml.CSafeLoader] if LIBYAML else [])
+
+
+class TestIterPriceList:
+    @pytest.mark.parametrize('loader', LOADERS)
+    def test_matches_safe_load_for_sample_feed(self, loader):
+        path = os.path.join(settings.BASE_DIR, 'shop1.yaml')
+        with open(path, 'r', encoding='utf-8') as f:
+            expected = yaml.safe_load(f)
+
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = list(iter_price_list(f, loader))
+
+        assert entries[0] == ('shop', expected['shop'])
+        assert [v for k, v in entries if k == 'categories'] == expected['categories']
+        assert [v for k, v in entries if k == 'goods'] == expected['goods']
+
+    def test_yields_items_lazily(self):
+        def feed():
+            yield 'goods:\n'
+            for i in range(10):
+                yield f'  - id: {i}\n    name: Product {i}\n'
+
+        stream = io.StringIO(''.join(feed()))
+        entries = iter_price_list(stream)
+        assert next(entries) == ('goods', {'id': 0, 'name': 'Product 0'})
+
+    @pytest.mark.parametrize('loader', LOADERS)
+    def test_supports_anchors_and_merge_keys(self, loader):
+        data = """
+        goods:
+          - id: 1
+            parameters: &common
+              Цвет: черный
+          - id: 2
+            parameters:
+              <<: *common
+              Память: 128
+        """
+        goods = [v for k, v in iter_price_list(data, loader)]
+        assert goods[1]['parameters'] == {'Цвет': 'черный', 'Память': 128}
+
+    @pytest.mark.parametrize('loader', LOADERS)
+    def test_rejects_non_mapping_document(self, loader):
+        with pytest.raises(yaml.YAMLError):
+            list(iter_price_list('- just\n- a list\n', loader))
+
+    def test_empty_document(self):
+        assert list(iter_price_list('')) == []
+
+    def test_collects_keys_of_empty_sections(self):
+        keys = set()
+        assert list(iter_price_list('shop: Магазин\ngoods: []\n', keys=keys)) == [('shop', 'Магазин')]
+        assert keys == {'shop', 'goods'}
+
+    def test_open_price_list_requires_source(self):
+        with pytest.raises(ValueError):
+            with open_price_list():
+                pass
+
+
+@pytest.mark.django_db
+class TestSimpleImport:
+    def test_empty_goods_section(self, tmp_path):
+        supplier = SupplierFactory()
+        path = tmp_path / 'shop.yaml'
+
+        # Пустой раздел goods - корректный прайс-лист без товаров
+        path.write_text('shop: Магазин\ngoods: []\n', encoding='utf-8')
+        result = simple_import_from_yaml(supplier.user, filename=str(path))
+        assert (result['created'], result['updated']) == (0, 0)
+
+        path.write_text('shop: Магазин\n', encoding='utf-8')
+        assert simple_import_from_yaml(supplier.user, filename=str(path)) == {"error": "Неверный формат YAML файла"}
+
+
+class TestYamlBackend:
+    def test_uses_libyaml_when_available(self):
+        assert LIBYAML == yaml.__with_libyaml__
+        assert (SafeLoader is yaml.CSafeLoader) == LIBYAML
+
+    def test_dump_matches_pure_python_output(self):
+        data = {
+            'shop': 'Связной',
+            'goods': [{'id': '1', 'name': 'Смартфон "Apple": 64GB', 'price': 99.9,
+                       'parameters': {'description': 'Строка\nс переносом', 'Цвет': None}}],
+        }
+        dumped = safe_dump(data, allow_unicode=True, sort_keys=False)
+        assert dumped == yaml.dump(data, Dumper=yaml.SafeDumper, allow_unicode=True, sort_keys=False)
+        assert safe_load(dumped) == data
@@ -1,9 +1,23 @@
-import yaml
+import itertools
 import os
 import re
+import yaml
+from datetime import datetime, timedelta
 from django.conf import settings
-from typing import Optional, Tuple
-from .models import Product, Supplier, Category
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+from .models import Product, Supplier
+from .import_engine import ProductImporter, iter_chunks
+from .yaml_backend import LIBYAML, safe_dump
+from .yaml_stream import open_price_list
+
+# Количество товаров, которые экспорт читает из базы и выгружает в YAML за раз
+EXPORT_CHUNK_SIZE = 2000
+
+# Колонки товара, которые читает экспорт (в порядке полей кортежа в _export_item)
+EXPORT_FIELDS = ('id', 'sku', 'category_id', 'name', 'price', 'stock', 'description', 'characteristics', 'is_active')
 
 
 def export_products_to_yaml(supplier: Supplier, filename: Optional[str] = None) -> str:
@@ -17,85 +31,133 @@ def export_products_to_yaml(supplier: Supplier, filename: Optional[str] = None)
     Returns:
         str: YAML строка, если filename=None
     """
-    products = Product.objects.filter(supplier=supplier)
+    if filename:
+        with open(filename, 'w', encoding='utf-8') as f:
+            for chunk in iter_products_yaml(supplier):
+                f.write(chunk)
+        count = Product.objects.filter(supplier=supplier).count()
+        return f"Экспортировано {count} товаров в {filename}"
+    else:
+        return ''.join(iter_products_yaml(supplier))
 
-    # Создаем структуру данных для экспорта
-    data = {
-        'shop': supplier.user.company_name or supplier.user.username,
-        'categories': [],
-        'goods': []
-    }
 
-    # Добавляем категории
-    categories = {}
-    for product in products:
-        if product.category and product.category.id not in categories:
-            categories[product.category.id] = product.category.name
-
-    for cat_id, cat_name in categories.items():
-        data['categories'].append({
-            'id': cat_id,
-            'name': cat_name
-        })
-
-    # Добавляем товары
-    for product in products:
-        # Добавляем характеристики, если они есть
-        parameters = {'description': product.description}
-        if hasattr(product, 'characteristics') and product.characteristics:
-            parameters.update(product.characteristics)
-
-        product_data = {
-            'id': product.sku or str(product.id),
-            'category': product.category.id if product.category else None,
-            'name': product.name,
-            'price': float(product.price),
-            'quantity': product.stock,
-            'parameters': parameters
-        }
-        data['goods'].append(product_data)
-
-    yaml_data = yaml.dump(data, allow_unicode=True, sort_keys=False)
+def iter_products_yaml(supplier: Supplier, chunk_size: int = EXPORT_CHUNK_SIZE,
+                       since: Optional[datetime] = None) -> Iterator[str]:
+    """
+    Потоково выгружает товары поставщика в YAML
 
-    if filename:
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(yaml_data)
-        return f"Экспортировано {len(data['goods'])} товаров в {filename}"
+    Текст совпадает с выгрузкой прайс-листа целиком, но строится частями:
+    название магазина отдается до первого запроса, категории - одним
+    запросом с JOIN, а товары - одним запросом values_list, который
+    читается курсором на стороне сервера пачками по chunk_size строк.
+    Объекты моделей не создаются, поэтому память не зависит
+    от количества товаров, а число запросов - от количества категорий.
+
+    Если задан since, выгружаются только товары, измененные (в том числе
+    деактивированные) после этого момента, - по индексу (supplier,
+    updated_at). У таких товаров есть поле is_active, а в заголовке
+    документа - since и next_since, который нужно передать следующей
+    выгрузке изменений.
+
+    Args:
+        supplier: объект Supplier
+        chunk_size: количество товаров, читаемых и выгружаемых за раз
+        since: момент, изменения после которого нужно выгрузить
+
+    Yields:
+        str: часть YAML документа
+    """
+    header = {'shop': supplier.user.company_name or supplier.user.username}
+    products = Product.objects.filter(supplier=supplier)
+    if since is not None:
+        # Товары из еще не зафиксированных транзакций могут получить время
+        # изменения раньше начала выгрузки, поэтому next_since берется с запасом
+        next_since = max(since, timezone.now() - timedelta(seconds=settings.EXPORT_DELTA_OVERLAP))
+        header.update(since=since.isoformat(), next_since=next_since.isoformat())
+        products = products.filter(updated_at__gt=since)
+    yield _dump(header)
+
+    # Категории в порядке первого появления в списке товаров:
+    # берем первый товар каждой категории в том же порядке, что и goods
+    first_products = products.filter(category__isnull=False).annotate(
+        position=Window(RowNumber(), partition_by=[F('category_id')], order_by=[F('name').asc(), F('id').asc()])
+    )
+    categories = [
+        {'id': cat_id, 'name': cat_name}
+        for cat_id, cat_name in (
+            first_products.filter(position=1).order_by('name', 'id').values_list('category_id', 'category__name')
+        )
+    ]
+    if categories:
+        yield 'categories:\n'
+        yield _dump(categories)
     else:
-        return yaml_data
+        yield _dump({'categories': []})
+
+    goods = products.order_by('name', 'id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    chunks = iter_chunks((_export_item(row, delta=since is not None) for row in goods), chunk_size)
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
+        yield _dump({'goods': []})
+        return
+
+    yield 'goods:\n'
+    for chunk in itertools.chain([first_chunk], chunks):
+        yield _dump(chunk)
+
+
+def _export_item(row: Tuple[Any, ...], delta: bool = False) -> Dict[str, Any]:
+    pk, sku, category_id, name, price, stock, description, characteristics, is_active = row
+
+    # Добавляем характеристики, если они есть
+    parameters = {'description': description}
+    if characteristics:
+        parameters.update(characteristics)
+
+    item = {
+        'id': sku or str(pk),
+        'category': category_id,
+        'name': name,
+        'price': float(price),
+        'quantity': stock,
+        'parameters': parameters
+    }
+    # В выгрузке изменений деактивированные товары нужно отличать от остальных
+    if delta:
+        item['is_active'] = is_active
+    return item
+
+
+def _dump(data: Any) -> str:
+    # Элементы списка верхнего уровня выгружаются так же, как внутри
+    # раздела документа, поэтому части складываются в тот же текст
+    text = safe_dump(data, allow_unicode=True, sort_keys=False)
+    # libyaml экранирует символы вне BMP (эмодзи) и NEL, которые yaml.dump
+    # выгружает как есть. Экранирование дает обратную косую черту, поэтому
+    # только такие части выгружаются медленным выгрузчиком на Python
+    if LIBYAML and '\\' in text:
+        text = safe_dump(data, Dumper=yaml.SafeDumper, allow_unicode=True, sort_keys=False)
+    return text
 
 
 def export_products_to_file(supplier: Supplier) -> str:
     """
     Экспортирует товары поставщика в YAML файл в директории media/exports
 
+    Файл кэшируется по версии каталога поставщика (см. export_cache):
+    пока товары не менялись, повторный экспорт возвращает готовый файл.
+    Рядом с ним сохраняются сжатые копии с расширениями .gz и .zst.
+
     Args:
         supplier: объект Supplier
 
     Returns:
         str: путь к созданному файлу
     """
-    # Используем директорию media, которая должна быть доступна для записи
-    export_dir = os.path.join(settings.MEDIA_ROOT, 'exports')
+    from .export_cache import get_export_file
 
     try:
-        # Создаем директорию для экспорта, если ее нет
-        os.makedirs(export_dir, exist_ok=True)
-
-        # Создаем безопасное имя файла из названия компании
-    # или имени пользователя
-        company_name = supplier.user.company_name or supplier.user.username
-        safe_filename = re.sub(r'[^\w\-_\.]', '_', company_name)
-        filename = os.path.join(export_dir, f"{safe_filename}_products.yaml")
-
-        # Получаем данные для экспорта
-        yaml_data = export_products_to_yaml(supplier)
-
-        # Записываем данные в файл
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(yaml_data)
-
-        return filename
+        return get_export_file(supplier)
     except Exception as e:
         # В случае ошибки используем временную директорию
         import tempfile
@@ -127,103 +189,8 @@ def import_products_from_yaml(supplier: Supplier, yaml_data: Optional[str] = Non
         tuple: (количество созданных товаров,
                 количество обновленных товаров)
     """
-    if yaml_data is None and filename:
-        with open(filename, 'r', encoding='utf-8') as f:
-            yaml_data = f.read()
-
-    if not yaml_data:
-        raise ValueError("Необходимо указать yaml_data или filename")
-
-    data = yaml.safe_load(yaml_data)
-
-    created_count = 0
-    updated_count = 0
-
-    # Создаем словарь категорий
-    categories_dict = {}
-    if 'categories' in data:
-        for cat_data in data['categories']:
-            cat_name = cat_data.get('name', 'Без категории')
-            cat_id = cat_data.get('id')
-            if cat_id and cat_name:
-                category, _ = Category.objects.get_or_create(name=cat_name)
-                categories_dict[cat_id] = category
-
-    # Импортируем товары
-    if 'goods' in data:
-        for item in data['goods']:
-            try:
-                # Получаем основные данные
-                name = item.get('name')
-                price = item.get('price')
-
-                if not name or not price:
-                    continue
-
-                # Получаем категорию
-                category = None
-                cat_id = item.get('category')
-                if cat_id and cat_id in categories_dict:
-                    category = categories_dict[cat_id]
-
-                # Получаем описание и характеристики
-                description = ""
-                characteristics = {}
-                if 'parameters' in item and isinstance(item['parameters'], dict):
-                    # Сохраняем описание отдельно
-                    if 'description' in item['parameters']:
-                        description = item['parameters']['description']
-                        # Удаляем описание из характеристик
-                        parameters = item['parameters'].copy()
-                        parameters.pop('description', None)
-                        characteristics = parameters
-                    else:
-                        # Если нет отдельного описания,
-                        # создаем его из параметров
-                        params = []
-                        for key, value in item['parameters'].items():
-                            params.append(f"{key}: {value}")
-                        description = "\n".join(params)
-                        characteristics = item['parameters']
-
-                # Получаем или создаем SKU
-                sku = str(item.get('id', ''))
-
-                # Проверяем, существует ли товар с таким SKU
-                if sku:
-                    product, created = Product.objects.update_or_create(
-                        sku=sku,
-                        defaults={
-                            'name': name,
-                            'description': description,
-                            'price': price,
-                            'supplier': supplier,
-                            'category': category,
-                            'stock': item.get('quantity', 0),
-                            'is_active': True,
-                            'characteristics': characteristics
-                        }
-                    )
-
-                    if created:
-                        created_count += 1
-                    else:
-                        updated_count += 1
-                else:
-                    # Создаем новый товар без SKU
-                    Product.objects.create(
-                        name=name,
-                        description=description,
-                        price=price,
-                        supplier=supplier,
-                        category=category,
-                        stock=item.get('quantity', 0),
-                        is_active=True,
-                        characteristics=characteristics
-                    )
-                    created_count += 1
-            except Exception as e:
-                print(f"Ошибка при импорте товара: {e}")
-                continue
-
-    return created_count, updated_count
+    importer = ProductImporter(supplier)
+    with open_price_list(yaml_data, filename) as entries:
+        importer.import_price_list(entries)
+
+    return importer.created, importer.updated
@@ -1,3 +1,4 @@
+from contextlib import nullcontext
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -9,11 +10,14 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.core.mail import send_mail
 from django.conf import settings
-from django.db.models import Q, Prefetch
+from django.core.cache import cache
+from django.db.models import Prefetch
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from django.views.decorators.vary import vary_on_cookie
 from .models import Product, Order, OrderItem, Supplier, CartItem, DeliveryAddress
+from .facets import attribute_filters, facet_counts, facets_cache_key, filter_by_attributes
+from .search import SEARCH_MODE_FUZZY, full_text_search, fuzzy_search, fuzzy_search_threshold
 from .serializers import (
     RegisterSerializer, LoginSerializer, UserSerializer, ProductSerializer, OrderSerializer,
     PasswordResetRequestSerializer, PasswordResetConfirmSerializer, CartItemSerializer
@@ -172,7 +176,8 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     @method_decorator(cache_page(60*15))  # Кэширование на 15 минут
     @method_decorator(vary_on_cookie)
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        with self._search_scope():
+            return super().list(request, *args, **kwargs)
 
     @method_decorator(cache_page(60*60))  # Кэширование на 1 час
     def retrieve(self, request, *args, **kwargs):
@@ -186,25 +191,55 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         if category:
             queryset = queryset.filter(category__id=category)
 
-        # Поиск по названию или описанию
+        # Фильтрация по характеристикам: ?attr.<характеристика>=<значение>
+        queryset = filter_by_attributes(queryset, attribute_filters(self.request.query_params))
+
+        # Поиск: полнотекстовый по названию и описанию или нечеткий
+        # по названию (search_mode=fuzzy), оба выполняются по GIN индексам
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
+            if self.request.query_params.get('search_mode') == SEARCH_MODE_FUZZY:
+                queryset = fuzzy_search(queryset, search)
+            else:
+                queryset = full_text_search(queryset, search)
 
         # Сортировка
         ordering = self.request.query_params.get('ordering', None)
-        if ordering:
-            if ordering == 'price':
-                queryset = queryset.order_by('price')
-            elif ordering == '-price':
-                queryset = queryset.order_by('-price')
-            elif ordering == 'name':
-                queryset = queryset.order_by('name')
+        if ordering == 'price':
+            queryset = queryset.order_by('price')
+        elif ordering == '-price':
+            queryset = queryset.order_by('-price')
+        elif ordering == 'name':
+            queryset = queryset.order_by('name')
+        elif search:
+            # Без явной сортировки результаты поиска упорядочены по релевантности
+            queryset = queryset.order_by('-rank', 'name', 'id')
 
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Количество товаров по значениям характеристик для текущих фильтров
+
+        Принимает те же фильтры, что и список товаров. Результат кэшируется
+        по набору фильтров на settings.PRODUCT_FACETS_CACHE_TTL секунд.
+        """
+        key = facets_cache_key(request.query_params)
+        facets = cache.get(key)
+        if facets is None:
+            with self._search_scope():
+                facets = facet_counts(self.get_queryset())
+            cache.set(key, facets, settings.PRODUCT_FACETS_CACHE_TTL)
+        return Response({'facets': facets})
+
+    def _search_scope(self):
+        # Порог нечеткого поиска действует только в транзакции запроса
+        params = self.request.query_params
+        if params.get('search') and params.get('search_mode') == SEARCH_MODE_FUZZY:
+            return fuzzy_search_threshold()
+        return nullcontext()
+
 
 class SupplierViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
@@ -281,52 +316,166 @@ class SupplierViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def import_products(self, request):
         """
-        Импорт товаров из YAML файла через Celery
+        Импорт товаров из файла YAML, CSV или JSON Lines через Celery
         """
-        from .tasks import do_import
+        from .feed_formats import FEED_EXTENSIONS, detect_feed_format
+        from .import_engine import IMPORT_MODES
+        from .import_files import start_import, store_import_file, store_import_text
 
         try:
             supplier = Supplier.objects.get(user=self.request.user)
 
-            # Получаем YAML данные из запроса
+            # Прайс-лист можно передать файлом или строкой в yaml_data
+            yaml_file = request.FILES.get('file')
             yaml_data = request.data.get('yaml_data')
 
-            if not yaml_data:
+            if not yaml_file and not yaml_data:
                 return Response({"error": "YAML data is required"}, status=status.HTTP_400_BAD_REQUEST)
 
+            # Формат задается параметром format или определяется по типу и расширению файла
+            feed_format = request.data.get('format')
+            if feed_format and feed_format not in FEED_EXTENSIONS:
+                return Response(
+                    {"error": f"Unknown price list format: {feed_format}"}, status=status.HTTP_400_BAD_REQUEST
+                )
+            if not feed_format and yaml_file:
+                feed_format = detect_feed_format(yaml_file.name, yaml_file.content_type)
+            extension = FEED_EXTENSIONS[feed_format or 'yaml']
+
+            # Сохраняем прайс-лист в MEDIA_ROOT/imports, задаче передаем только путь;
+            # по расширению сохраненного файла задача определяет его формат
+            if yaml_file:
+                file_path, digest = store_import_file(yaml_file.chunks(), extension)
+            else:
+                file_path, digest = store_import_text(yaml_data, extension)
+
+            # Инкрементальный режим перезаписывает только изменившиеся товары
+            incremental = str(request.data.get('incremental', '')).lower() in ('1', 'true')
+            force = str(request.data.get('force', '')).lower() in ('1', 'true')
+
+            # Режим sync деактивирует товары, которых нет в прайс-листе
+            mode = request.data.get('mode', 'update')
+            if mode not in IMPORT_MODES:
+                return Response({"error": f"Unknown import mode: {mode}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Режим проверки ничего не записывает, а возвращает сводку изменений
+            dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true')
+
             # Запускаем задачу импорта асинхронно
-            task = do_import.delay(supplier.id, yaml_data=yaml_data)
+            task_id, duplicate = start_import(
+                supplier, file_path, digest, force=force, incremental=incremental, mode=mode, dry_run=dry_run
+            )
+
+            if duplicate:
+                return Response({
+                    "message": "This file has already been imported",
+                    "task_id": task_id,
+                    "duplicate": True
+                })
 
             return Response({
                 "message": "Import task started",
-                "task_id": task.id
+                "task_id": task_id
             })
         except Supplier.DoesNotExist:
             return Response({"error": "Supplier profile not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'], url_path=r'import_status/(?P<task_id>[^/.]+)')
+    def import_status(self, request, task_id=None):
+        """
+        Прогресс задачи импорта товаров
+        """
+        from .import_progress import get_import_progress
+
+        progress = get_import_progress(task_id)
+
+        # Задача еще не начала выполняться
+        if progress is None:
+            return Response({"task_id": task_id, "status": "pending"})
+
+        if not request.user.is_staff:
+            try:
+                supplier = Supplier.objects.get(user=self.request.user)
+            except Supplier.DoesNotExist:
+                return Response({"error": "Supplier profile not found"}, status=status.HTTP_404_NOT_FOUND)
+            if progress.get('supplier_id') != supplier.id:
+                return Response({"error": "Import task not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({"task_id": task_id, **progress})
+
     @action(detail=False, methods=['get'])
     def export_products(self, request):
         """
         Экспорт товаров в YAML формат
+
+        YAML отдается потоково: первые байты уходят сразу,
+        а память не зависит от количества товаров. Выгрузка кэшируется
+        по версии каталога и отдается с ETag: если каталог не менялся,
+        запрос с совпадающим If-None-Match получает ответ 304.
+
+        Выгрузка сжимается gzip или zstd по заголовку Accept-Encoding
+        (Content-Encoding ответа) или по параметру compression
+        (сжатый файл .yaml.gz или .yaml.zst).
+
+        Параметр since (ISO 8601) выгружает только товары, измененные
+        или деактивированные после этого момента.
         """
-        from .utils import export_products_to_yaml
-        from django.http import HttpResponse
-        import re
+        from .export_cache import (
+            COMPRESSION_CONTENT_TYPES, export_etag, export_filename, iter_export, iter_export_since,
+            negotiate_compression
+        )
+        from django.http import StreamingHttpResponse
+        from django.utils import timezone
+        from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+        from django.utils.dateparse import parse_datetime
 
         try:
-            supplier = Supplier.objects.get(user=self.request.user)
-            yaml_data = export_products_to_yaml(supplier)
+            supplier = Supplier.objects.select_related('user').get(user=self.request.user)
 
-            # Создаем безопасное имя файла из названия компании
-            # или имени пользователя
-            company_name = supplier.user.company_name or supplier.user.username
-            safe_filename = re.sub(r'[^\w\-_\.]', '_', company_name)
-            filename = f"{safe_filename}_products.yaml"
+            requested = request.query_params.get('compression')
+            try:
+                compression = negotiate_compression(request.META.get('HTTP_ACCEPT_ENCODING', ''), requested)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            response = HttpResponse(yaml_data, content_type='application/x-yaml')
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            since = request.query_params.get('since')
+            if since is not None:
+                try:
+                    since = parse_datetime(since)
+                except ValueError:
+                    since = None
+                if since is None:
+                    return Response({"error": "Invalid since, expected ISO 8601 datetime"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                if timezone.is_naive(since):
+                    since = timezone.make_aware(since)
+                # Выгрузка изменений не кэшируется и отдается без ETag
+                response = None
+                content = iter_export_since(supplier, since, compression)
+            else:
+                etag = export_etag(supplier, compression)
+                response = get_conditional_response(request, etag=etag)
+                content = iter_export(supplier, compression)
+
+            if response is None:
+                if compression and requested is not None:
+                    # Явно запрошенный сжатый файл скачивается как есть
+                    response = StreamingHttpResponse(content, content_type=COMPRESSION_CONTENT_TYPES[compression])
+                    filename = export_filename(supplier, compression)
+                else:
+                    response = StreamingHttpResponse(content, content_type='application/x-yaml')
+                    if compression:
+                        response['Content-Encoding'] = compression
+                    filename = export_filename(supplier)
+                response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            if since is None:
+                response['ETag'] = etag
+            if requested is None:
+                patch_vary_headers(response, ('Accept-Encoding',))
+            # Клиент может хранить выгрузку, но должен проверять ее актуальность
+            patch_cache_control(response, private=True, no_cache=True)
             return response
         except Supplier.DoesNotExist:
             return Response({"error": "Supplier profile not found"}, status=status.HTTP_404_NOT_FOUND)
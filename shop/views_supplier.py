@@ -15,16 +15,51 @@ class SupplierExportViewSet(viewsets.ViewSet):
     def export_to_file(self, request: Request) -> Response:
         """
         Экспорт товаров в YAML файл на сервере
+
+        Файл кэшируется по версии каталога, а в ответе передается ETag.
+        Если каталог не менялся и If-None-Match совпадает с ETag,
+        возвращается 304 без повторного экспорта.
+
+        Рядом с YAML файлом хранятся его сжатые копии (gzip, zstd),
+        они перечислены в поле compressed. Параметр compression
+        выбирает, какой из файлов вернуть в основных полях ответа.
         """
         from .utils import export_products_to_file
+        from .export_cache import COMPRESSION_SUFFIXES, export_etag, export_path, negotiate_compression
         import os
         from django.conf import settings
+        from django.http import HttpResponseNotModified
+        from django.utils.cache import parse_etags
 
         try:
-            supplier = Supplier.objects.get(user=request.user)
+            supplier = Supplier.objects.select_related('user').get(user=request.user)
+
+            try:
+                compression = negotiate_compression(compression=request.query_params.get('compression', ''))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            etag = export_etag(supplier, compression)
+            if (etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+                    and os.path.exists(export_path(supplier, compression))):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                return response
 
             # Экспортируем товары
             filename = export_products_to_file(supplier)
+            # Сжатые копии лежат рядом и отличаются расширением
+            compressed = {
+                encoding: filename + suffix
+                for encoding, suffix in COMPRESSION_SUFFIXES.items()
+                if os.path.exists(filename + suffix)
+            }
+            if compression:
+                if compression not in compressed:
+                    return Response({
+                        "error": f"Compressed export '{compression}' was not created"
+                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                filename = compressed[compression]
 
             # Проверяем, что файл действительно создан
             if not os.path.exists(filename):
@@ -40,12 +75,15 @@ class SupplierExportViewSet(viewsets.ViewSet):
             products_count = supplier.products.count()
 
             # Создаем URL для доступа к файлу, если он в директории media
-            file_url = None
-            if filename.startswith(settings.MEDIA_ROOT):
-                relative_path = os.path.relpath(filename, settings.MEDIA_ROOT)
-                file_url = request.build_absolute_uri(settings.MEDIA_URL + relative_path)
+            def media_url(path):
+                if not path.startswith(settings.MEDIA_ROOT):
+                    return None
+                relative_path = os.path.relpath(path, settings.MEDIA_ROOT)
+                return request.build_absolute_uri(settings.MEDIA_URL + relative_path)
 
-            return Response({
+            file_url = media_url(filename)
+
+            response = Response({
                 "success": True,
                 "message": f"Товары успешно экспортированы в файл",
                 "filename": os.path.basename(filename),
@@ -53,8 +91,19 @@ class SupplierExportViewSet(viewsets.ViewSet):
                 "file_url": file_url,
                 "file_size": file_size,
                 "products_count": products_count,
-                "supplier": supplier.user.company_name or supplier.user.username
+                "supplier": supplier.user.company_name or supplier.user.username,
+                "catalog_version": supplier.catalog_version,
+                "compressed": {
+                    encoding: {
+                        "filename": os.path.basename(path),
+                        "file_url": media_url(path),
+                        "file_size": os.path.getsize(path),
+                    }
+                    for encoding, path in compressed.items()
+                }
             })
+            response['ETag'] = etag
+            return response
         except Supplier.DoesNotExist:
             return Response({"error": "Supplier profile not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
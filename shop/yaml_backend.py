@@ -0,0 +1,41 @@
+from typing import Any, IO, Optional, Union
+import yaml
+
+# Если PyYAML собран с libyaml, используем C реализацию - она в разы быстрее
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+# True, если используются загрузчик и выгрузчик на libyaml
+LIBYAML = SafeLoader is not yaml.SafeLoader
+
+
+def safe_load(stream: Union[str, bytes, IO], Loader: Any = SafeLoader) -> Any:
+    """
+    Загружает YAML документ безопасным загрузчиком
+
+    Args:
+        stream: строка или открытый файл
+        Loader: класс загрузчика (по умолчанию C реализация, если доступна)
+
+    Returns:
+        Загруженные данные
+    """
+    return yaml.load(stream, Loader=Loader)
+
+
+def safe_dump(data: Any, stream: Optional[IO] = None, Dumper: Any = SafeDumper, **kwargs: Any) -> Optional[str]:
+    """
+    Выгружает данные в YAML безопасным выгрузчиком
+
+    Args:
+        data: данные для выгрузки
+        stream: открытый файл (если None, возвращает строку)
+        Dumper: класс выгрузчика (по умолчанию C реализация, если доступна)
+        kwargs: параметры yaml.dump (allow_unicode, sort_keys и т.д.)
+
+    Returns:
+        str: YAML строка, если stream=None
+    """
+    return yaml.dump(data, stream, Dumper=Dumper, **kwargs)
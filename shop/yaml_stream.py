@@ -0,0 +1,172 @@
+from contextlib import contextmanager
+from typing import Any, Dict, IO, Iterator, Optional, Set, Tuple, Union
+import yaml
+from yaml.events import (
+    AliasEvent, ScalarEvent, SequenceStartEvent, SequenceEndEvent,
+    MappingStartEvent, MappingEndEvent, StreamEndEvent
+)
+from yaml.nodes import Node, ScalarNode, SequenceNode, MappingNode
+from .feed_formats import (
+    BINARY_FORMATS, detect_feed_format, iter_csv_price_list, iter_jsonl_price_list, iter_yml_price_list
+)
+from .yaml_backend import SafeLoader
+
+# Разделы прайс-листа, элементы которых отдаются по одному
+STREAMED_SECTIONS = ('categories', 'goods')
+
+
+def iter_price_list(source: Union[str, IO], Loader: Any = SafeLoader,
+                    keys: Optional[Set[str]] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Потоково читает прайс-лист в формате shop1.yaml
+
+    Файл разбирается по событиям YAML, поэтому в памяти одновременно
+    находится только один элемент. Для разделов categories и goods
+    отдается каждый элемент списка, для остальных ключей - значение целиком.
+
+    Args:
+        source: строка с YAML данными или открытый файл
+        Loader: класс загрузчика (по умолчанию C реализация, если доступна)
+        keys: множество, в которое добавляются ключи верхнего уровня файла,
+              в том числе разделов с пустым списком
+
+    Yields:
+        tuple: (название раздела, элемент или значение)
+
+    Raises:
+        yaml.YAMLError: если файл не является корректным YAML словарем
+    """
+    loader = Loader(source)
+    anchors: Dict[str, Node] = {}
+    try:
+        loader.get_event()  # StreamStartEvent
+        if loader.check_event(StreamEndEvent):
+            return
+        loader.get_event()  # DocumentStartEvent
+
+        if not loader.check_event(MappingStartEvent):
+            raise yaml.YAMLError("Неверный формат YAML файла: ожидается словарь")
+        loader.get_event()
+
+        while not loader.check_event(MappingEndEvent):
+            key = _construct(loader, _compose(loader, anchors))
+            if keys is not None:
+                keys.add(key)
+            if key in STREAMED_SECTIONS and loader.check_event(SequenceStartEvent):
+                loader.get_event()
+                while not loader.check_event(SequenceEndEvent):
+                    yield key, _construct(loader, _compose(loader, anchors))
+                loader.get_event()
+            else:
+                yield key, _construct(loader, _compose(loader, anchors))
+    finally:
+        loader.dispose()
+
+
+# Функции потокового чтения прайс-листа по форматам из FEED_FORMATS
+PARSERS = {
+    'yaml': iter_price_list,
+    'csv': iter_csv_price_list,
+    'jsonl': iter_jsonl_price_list,
+    'yml': iter_yml_price_list,
+}
+
+
+@contextmanager
+def open_price_list(yaml_data: Optional[str] = None, filename: Optional[str] = None,
+                    feed_format: Optional[str] = None) -> Iterator[Iterator[Tuple[str, Any]]]:
+    """
+    Открывает прайс-лист из строки или файла для потокового чтения
+
+    Args:
+        yaml_data: строка с данными прайс-листа (если None, читает из filename)
+        filename: путь к файлу для чтения (если yaml_data=None)
+        feed_format: формат из FEED_FORMATS (по умолчанию определяется
+                     по расширению filename и началу данных, иначе YAML)
+
+    Raises:
+        ValueError: если не указаны ни yaml_data, ни filename или формат неизвестен
+    """
+    if not feed_format:
+        feed_format = detect_feed_format(filename)
+        # Каталоги YML часто сохраняют с расширением .yml, как YAML
+        if feed_format == 'yaml' and _starts_with_xml(yaml_data, filename):
+            feed_format = 'yml'
+    if feed_format not in PARSERS:
+        raise ValueError(f"Неизвестный формат прайс-листа: {feed_format}")
+    parse = PARSERS[feed_format]
+
+    if yaml_data is None and filename and feed_format in BINARY_FORMATS:
+        with open(filename, 'rb') as f:
+            yield parse(f)
+    elif yaml_data is None and filename:
+        # newline='' нужен модулю csv для полей с переводами строк
+        with open(filename, 'r', encoding='utf-8-sig', newline='') as f:
+            yield parse(f)
+    elif yaml_data:
+        yield parse(yaml_data)
+    else:
+        raise ValueError("Необходимо указать yaml_data или filename")
+
+
+def _starts_with_xml(yaml_data: Optional[str], filename: Optional[str]) -> bool:
+    if yaml_data is None and filename:
+        try:
+            with open(filename, 'rb') as f:
+                head = f.read(1024)
+        except OSError:
+            return False
+        return head.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<')
+    return bool(yaml_data) and yaml_data.lstrip('\ufeff \t\r\n').startswith('<')
+
+
+def _construct(loader: Any, node: Node) -> Any:
+    data = loader.construct_object(node, deep=True)
+    # Сбрасываем кэш построенных объектов, чтобы не копить весь файл
+    loader.constructed_objects = {}
+    return data
+
+
+def _compose(loader: Any, anchors: Dict[str, Node]) -> Node:
+    event = loader.get_event()
+
+    if isinstance(event, AliasEvent):
+        if event.anchor not in anchors:
+            raise yaml.composer.ComposerError(
+                None, None, f"found undefined alias {event.anchor!r}", event.start_mark
+            )
+        return anchors[event.anchor]
+
+    if isinstance(event, ScalarEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(ScalarNode, event.value, event.implicit)
+        node = ScalarNode(tag, event.value, event.start_mark, event.end_mark, style=event.style)
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+        return node
+
+    if isinstance(event, SequenceStartEvent):
+        tag = event.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(SequenceNode, None, event.implicit)
+        node = SequenceNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+        if event.anchor is not None:
+            anchors[event.anchor] = node
+        while not loader.check_event(SequenceEndEvent):
+            node.value.append(_compose(loader, anchors))
+        node.end_mark = loader.get_event().end_mark
+        return node
+
+    tag = event.tag
+    if tag is None or tag == '!':
+        tag = loader.resolve(MappingNode, None, event.implicit)
+    node = MappingNode(tag, [], event.start_mark, None, flow_style=event.flow_style)
+    if event.anchor is not None:
+        anchors[event.anchor] = node
+    while not loader.check_event(MappingEndEvent):
+        key_node = _compose(loader, anchors)
+        value_node = _compose(loader, anchors)
+        node.value.append((key_node, value_node))
+    node.end_mark = loader.get_event().end_mark
+    return node